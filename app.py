@@ -4,8 +4,12 @@ import streamlit as st
 import os
 from modules.components.session_state import init_session_state
 from modules.pages.label_page import labeling_interface
-from modules.pages.download_page import download_interface
 from modules.utils.data_loader import DataLoader
+from modules.utils.dataset_catalog import data_dirs_from_env, load_catalog, find_dataset, scanning_datasets
+from modules.utils.gold import with_gold_posts
+from modules.utils.perf import span, is_enabled, export_prometheus_file
+from modules.utils.warmup import start_warm_up
+from modules.components.perf_panel import display_perf_panel
 
 # Configure the page
 st.set_page_config(
@@ -14,15 +18,30 @@ st.set_page_config(
     layout="wide"
 )
 
-# Set paths relative to the script location
+# Set paths relative to the script location (overridable for benchmarks and deployments);
+# LABELER_DATA_DIR may list several directories, separated like PATH entries
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(SCRIPT_DIR, "data/final_files")
-OUTPUT_DIR = os.path.join(SCRIPT_DIR, "labeled_data")
+DATA_DIRS = data_dirs_from_env(os.path.join(SCRIPT_DIR, "data/final_files"))
+OUTPUT_DIR = os.environ.get("LABELER_OUTPUT_DIR", os.path.join(SCRIPT_DIR, "labeled_data"))
+
+# Prometheus text file with the rerun timings (only written when profiling is enabled)
+METRICS_FILE = os.environ.get("LABELER_METRICS_FILE", os.path.join(OUTPUT_DIR, "metrics.prom"))
 
 # Create output directory if it doesn't exist
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Load the datasets in the background once per process
+start_warm_up(DATA_DIRS, OUTPUT_DIR)
+
 def main():
+    with span("app.rerun"):
+        render_app()
+
+    if is_enabled():
+        export_prometheus_file(METRICS_FILE)
+
+
+def render_app():
     st.title("StackOverflow Question Labeler")
 
     # Initialize session state
@@ -38,11 +57,19 @@ def main():
             st.warning("Please enter your name before starting.")
             return
 
-        # Select dataset
-        dataset_option = st.selectbox(
-            "Select Dataset",
-            ["Faiz_FJ", "FJ_only"]
-        )
+        # Select dataset, from the catalog of the data directories
+        catalog = load_catalog(DATA_DIRS)
+        scanning = scanning_datasets(DATA_DIRS)
+        if scanning:
+            st.info(f"Reading {', '.join(os.path.basename(path) for path in scanning)}; "
+                    "listed once read, refresh to check.")
+        if not catalog:
+            if not scanning:
+                st.error(f"No datasets found in {os.pathsep.join(DATA_DIRS)}")
+            return
+        dataset_option = st.selectbox("Select Dataset", [info.name for info in catalog])
+        dataset_info = find_dataset(catalog, dataset_option)
+        st.caption(f"{dataset_info.records} posts, models: {', '.join(dataset_info.models)}")
 
         # Tab selection
         tab_options = ["Label", "Download Data"]
@@ -53,27 +80,38 @@ def main():
 
         # Load dataset based on selection (only if on Label tab)
         if st.session_state.active_tab == "Label":
-            # Initialize the DataLoader
-            loader = DataLoader(data_dir=DATA_DIR)
-            dataset = loader.load_file(f"{dataset_option}.json")
+            # Render bundles of the selected dataset, compiled once per file
+            # version and streamed in the background up to the current post;
+            # gold posts are spread through the annotator's order. The view
+            # is built once per run and shared with the labeling interface.
+            loader = DataLoader(data_dir=dataset_info.data_dir)
+            dataset = loader.get_render_bundles(dataset_info.filename, wait_for=st.session_state.current_index)
+            dataset = with_gold_posts(dataset, dataset_info, annotator_name)
 
             # Navigation
-            setup_navigation(dataset, annotator_name, dataset_option)
+            with span("app.navigation"):
+                setup_navigation(dataset, annotator_name, dataset_option)
+
+        display_perf_panel()
 
     # Main content
     if st.session_state.active_tab == "Label":
         # Labeling interface
-        labeling_interface(annotator_name, dataset_option, DATA_DIR, OUTPUT_DIR)
+        labeling_interface(annotator_name, dataset_info, dataset, OUTPUT_DIR)
     else:
-        # Download interface
-        download_interface(annotator_name, OUTPUT_DIR)
+        # Download interface (loaded on first use)
+        from modules.pages.download_page import download_interface
+        with span("download_page.render"):
+            download_interface(annotator_name, OUTPUT_DIR)
 
 
 def setup_navigation(dataset, annotator_name, dataset_option):
-    from modules.utils.file_utils import is_post_labeled
-
     st.header("Navigation")
 
+    # The dataset may have fewer posts than the index kept in the session
+    if dataset and st.session_state.current_index >= len(dataset):
+        st.session_state.current_index = len(dataset) - 1
+
     # Navigation buttons
     col1, col2 = st.columns(2)
     with col1:
@@ -99,21 +137,25 @@ def setup_navigation(dataset, annotator_name, dataset_option):
     )
 
     if new_index != st.session_state.current_index:
+        # Jumping elsewhere makes the prefetched neighbors useless
+        st.session_state.prefetcher.cancel()
         st.session_state.previous_index = st.session_state.current_index
         st.session_state.current_index = new_index
         st.session_state.question_key += 1
 
     # Progress
     if dataset:
-        st.progress((st.session_state.current_index + 1) / len(dataset))
-        st.write(f"Question {st.session_state.current_index + 1} of {len(dataset)}")
+        # Posts keep being appended while a large file is still loading
+        total = len(dataset)
+        loading = "" if dataset.complete else "+ (still loading)"
+        st.progress(min((st.session_state.current_index + 1) / total, 1.0))
+        st.write(f"Question {st.session_state.current_index + 1} of {total}{loading}")
 
         # Show completed count
-        labeled_count = 0
-        for item in dataset:
-            if is_post_labeled(item.get('post_id'), annotator_name, dataset_option, OUTPUT_DIR):
-                labeled_count += 1
-        st.write(f"You've labeled {labeled_count} of {len(dataset)} questions")
+        labeled_count = st.session_state.label_cache.labeled_count(
+            dataset.post_ids[:total], annotator_name, dataset_option, OUTPUT_DIR
+        )
+        st.write(f"You've labeled {labeled_count} of {total}{loading} questions")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+# benchmarks/annotator_bench.py
+#
+# Headless benchmark simulating several annotators labeling concurrently.
+#
+# Each simulated annotator drives its own session of app.py through
+# Streamlit's app-testing API: it enters its name, jumps to a question,
+# answers the evaluation widgets one rerun at a time and submits. Images
+# are served by a local stand-in HTTP server, and labels are written to a
+# temporary output directory shared by all annotators.
+#
+# The app-testing API keeps a process-wide runtime per test run, so each
+# annotator runs in its own worker process.
+#
+# Usage:
+#   python -m benchmarks.annotator_bench --annotators 4 --posts 3
+#   python -m benchmarks.annotator_bench --dataset synthetic --synthetic-size 10000
+
+import argparse
+import io
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.synthetic_data import SyntheticDatasetGenerator
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_DATA_DIR = os.path.join(ROOT_DIR, "data", "final_files")
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+
+# Dataset files the app offers in its dataset selector
+DATASET_FILES = ("Faiz_FJ.json", "FJ_only.json")
+
+# Radio questions answered for every response (see modules/utils/rubric.py)
+ANSWERED_FIELDS = ("correct", "consistent", "comprehensive", "concise", "usefulness")
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    """Serves images from a directory, or a placeholder PNG for unknown paths"""
+
+    image_dir = None
+    placeholder = b""
+
+    def do_GET(self):
+        body = self.placeholder
+        if self.image_dir:
+            path = os.path.join(self.image_dir, os.path.basename(self.path))
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    body = f.read()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_image_server(image_dir=None, width=800, height=450):
+    """Start a local HTTP server standing in for the image host
+
+    Args:
+        image_dir (str, optional): Directory with the images to serve. Defaults to None.
+
+    Returns:
+        tuple: (server, base_url)
+    """
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (240, 240, 240)).save(buffer, format="PNG")
+    _ImageHandler.placeholder = buffer.getvalue()
+    _ImageHandler.image_dir = image_dir
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def prepare_data_dir(dataset, synthetic_size, image_base_url, work_dir):
+    """Create the data directory used by the benchmarked app
+
+    Real datasets are copied with their image links pointed at the local
+    image server. Synthetic datasets are built by SyntheticDatasetGenerator.
+
+    Returns:
+        str: Path of the data directory
+    """
+    if dataset == "synthetic":
+        generator = SyntheticDatasetGenerator(seed=0, image_base_url=image_base_url)
+        return generator.generate(work_dir, synthetic_size)["data_dir"]
+
+    data_dir = os.path.join(work_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+
+    for filename in DATASET_FILES:
+        with open(os.path.join(REAL_DATA_DIR, filename), 'r', encoding='utf-8') as f:
+            records = json.load(f)
+
+        for record in records:
+            record["image_link"] = f"{image_base_url}/{record['post_id']}.png"
+
+        with open(os.path.join(data_dir, filename), 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+
+    return data_dir
+
+
+class AnnotatorStats:
+    """Timings collected by one simulated annotator"""
+
+    def __init__(self):
+        self.rerun_seconds = []
+        self.saves = 0
+        self.session_bytes = 0
+        self.errors = []
+
+
+def _rss_bytes():
+    """Peak resident memory of this process, or 0 where it cannot be read"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _timed_run(element, stats):
+    """Run the app after a widget change and record the rerun latency"""
+    start = time.perf_counter()
+    app = element.run()
+    stats.rerun_seconds.append(time.perf_counter() - start)
+    if app.exception:
+        stats.errors.append(str(app.exception[0].value))
+    return app
+
+
+def simulate_annotator(name, dataset_option, post_indices, seed, timeout):
+    """Label a sequence of posts as one annotator
+
+    Returns:
+        dict: The collected timings (a plain dict, so it can cross processes)
+    """
+    sys.path.insert(0, ROOT_DIR)
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    stats = AnnotatorStats()
+
+    baseline_memory = _rss_bytes()
+
+    start = time.perf_counter()
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+    stats.rerun_seconds.append(time.perf_counter() - start)
+
+    app = _timed_run(app.sidebar.text_input[0].input(name), stats)
+    app = _timed_run(app.sidebar.selectbox[0].select(dataset_option), stats)
+
+    for index in post_indices:
+        # Navigate with "Go to question #"
+        app = _timed_run(app.sidebar.number_input[0].set_value(index), stats)
+
+        # Extract image text when the dataset asks for it
+        for text_area in app.text_area:
+            if text_area.key and text_area.key.endswith("_related_text"):
+                app = _timed_run(text_area.input(f"text {index}"), stats)
+                break
+
+        for model in app.radio(key="active_model").options:
+            app = _timed_run(app.radio(key="active_model").set_value(model), stats)
+            pattern = re.compile(rf"_({'|'.join(ANSWERED_FIELDS)})_{re.escape(model)}_(True|False)$")
+
+            keys = [radio.key for radio in app.radio if radio.key and pattern.search(radio.key)]
+            for key in keys:
+                radio = app.radio(key=key)
+                app = _timed_run(radio.set_value(rng.choice(radio.options)), stats)
+
+                # Answer the follow-up question when one appeared
+                followup_key = key.replace("_correct_", "_correct_issues_").replace("_concise_", "_conciseness_issues_")
+                followups = [ms for ms in app.multiselect if ms.key == followup_key]
+                if followups:
+                    app = _timed_run(followups[0].set_value([rng.choice(followups[0].options)]), stats)
+
+        submit = [button for button in app.button if button.label == "Submit All Evaluations"]
+        if submit:
+            app = _timed_run(submit[0].click(), stats)
+            stats.saves += 1
+
+    # Peak memory growth of the worker, i.e. the session plus the caches it filled
+    stats.session_bytes = _rss_bytes() - baseline_memory
+
+    return vars(stats)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_benchmark(annotators, posts, dataset, synthetic_size, dataset_option, timeout, keep):
+    """Run the benchmark and return the report as a dict"""
+    work_dir = tempfile.mkdtemp(prefix="labeler_bench_")
+    server, image_base_url = start_image_server(os.path.join(work_dir, "data", "images"))
+
+    try:
+        data_dir = prepare_data_dir(dataset, synthetic_size, image_base_url, work_dir)
+        output_dir = os.path.join(work_dir, "labeled_data")
+        os.environ["LABELER_DATA_DIR"] = data_dir
+        os.environ["LABELER_OUTPUT_DIR"] = output_dir
+
+        with open(os.path.join(data_dir, f"{dataset_option}.json"), 'r', encoding='utf-8') as f:
+            dataset_size = len(json.load(f))
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=annotators) as pool:
+            futures = []
+            for i in range(annotators):
+                rng = random.Random(i)
+                post_indices = rng.sample(range(dataset_size), min(posts, dataset_size))
+                futures.append(pool.submit(simulate_annotator, f"bench{i}", dataset_option, post_indices, i, timeout))
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+
+        reruns = [seconds for stats in results for seconds in stats["rerun_seconds"]]
+        saves = sum(stats["saves"] for stats in results)
+        label_bytes = sum(
+            os.path.getsize(os.path.join(output_dir, f))
+            for f in os.listdir(output_dir) if f.endswith("_labels.json")
+        ) if os.path.isdir(output_dir) else 0
+
+        return {
+            "dataset": dataset,
+            "dataset_option": dataset_option,
+            "dataset_size": dataset_size,
+            "annotators": annotators,
+            "posts_per_annotator": posts,
+            "elapsed_s": round(elapsed, 2),
+            "reruns": len(reruns),
+            "rerun_p50_ms": round(1000 * percentile(reruns, 0.50), 1),
+            "rerun_p95_ms": round(1000 * percentile(reruns, 0.95), 1),
+            "rerun_p99_ms": round(1000 * percentile(reruns, 0.99), 1),
+            "rerun_mean_ms": round(1000 * statistics.fmean(reruns), 1) if reruns else 0.0,
+            "saves": saves,
+            "saves_per_s": round(saves / elapsed, 3) if elapsed else 0.0,
+            "memory_per_session_kb": round(statistics.fmean(stats["session_bytes"] for stats in results) / 1024, 1),
+            "label_bytes_total": label_bytes,
+            "label_bytes_per_save": round(label_bytes / saves, 1) if saves else 0.0,
+            "errors": [error for stats in results for error in stats["errors"]][:10],
+        }
+    finally:
+        server.shutdown()
+        if keep:
+            print(f"Benchmark files kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the labeler with simulated concurrent annotators")
+    parser.add_argument("--annotators", type=int, default=4, help="number of concurrent annotators")
+    parser.add_argument("--posts", type=int, default=3, help="posts labeled by each annotator")
+    parser.add_argument("--dataset", choices=["real", "synthetic"], default="real")
+    parser.add_argument("--synthetic-size", type=int, default=10_000, help="posts in the synthetic dataset")
+    parser.add_argument("--dataset-option", choices=["Faiz_FJ", "FJ_only"], default="FJ_only")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary data and label files")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.annotators, args.posts, args.dataset, args.synthetic_size,
+                           args.dataset_option, args.timeout, args.keep)
+
+    for key, value in report.items():
+        print(f"{key:>24}: {value}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# benchmarks/startup_bench.py
+#
+# Measures how long a fresh app process takes to become useful.
+#
+# Each repetition starts a new Python process that imports the app's
+# modules, renders the first page through Streamlit's app-testing API,
+# enters an annotator name to render the first question, and waits for the
+# startup warm-up to finish. The parent reports the median of each phase.
+#
+# Usage:
+#   python -m benchmarks.startup_bench --runs 5
+#   python -m benchmarks.startup_bench --data-dir /tmp/synthetic --json startup.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+
+# Dependencies that should only be imported when a page needs them
+HEAVY_MODULES = ("PIL", "requests", "pandas")
+
+# Modules imported by app.py at startup
+APP_MODULES = (
+    "modules.components.session_state",
+    "modules.pages.label_page",
+    "modules.utils.data_loader",
+    "modules.utils.perf",
+    "modules.utils.warmup",
+    "modules.components.perf_panel",
+)
+
+
+def measure_startup(timeout):
+    """Measure the startup phases in the current (fresh) process
+
+    Returns:
+        dict: Seconds spent in each phase and the heavy modules loaded by the imports
+    """
+    import importlib
+    started = time.perf_counter()
+
+    import streamlit  # noqa: F401
+    streamlit_imported = time.perf_counter()
+    # Streamlit loads some of them itself; only the ones added by the app count
+    preloaded = set(sys.modules)
+
+    for name in APP_MODULES:
+        importlib.import_module(name)
+    modules_imported = time.perf_counter()
+    heavy_loaded = [name for name in HEAVY_MODULES if name in sys.modules and name not in preloaded]
+
+    from streamlit.testing.v1 import AppTest
+    from modules.utils import warmup
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    first_render = time.perf_counter()
+
+    at.text_input[0].input("startup_bench").run()
+    first_question = time.perf_counter()
+
+    warmup._done.wait(timeout)
+    warm_up_done = time.perf_counter()
+
+    return {
+        "streamlit_import_s": streamlit_imported - started,
+        "app_import_s": modules_imported - streamlit_imported,
+        "first_render_s": first_render - modules_imported,
+        "first_question_s": first_question - first_render,
+        "warm_up_done_s": warm_up_done - started,
+        "heavy_modules_at_import": heavy_loaded,
+        "errors": [str(e.value) for e in at.exception],
+    }
+
+
+def run_child(data_dir, output_dir, timeout):
+    """Run one measurement in a new process
+
+    Returns:
+        dict: The child's measurements plus the total wall time of the process
+    """
+    env = dict(os.environ)
+    env["LABELER_OUTPUT_DIR"] = output_dir
+    if data_dir:
+        env["LABELER_DATA_DIR"] = data_dir
+
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_bench", "--child", "--timeout", str(timeout)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_total_s"] = time.perf_counter() - started
+    return result
+
+
+def run_benchmark(runs, data_dir=None, timeout=120):
+    """Measure cold starts of the app
+
+    Args:
+        runs (int): Number of fresh processes to start
+        data_dir (str, optional): Dataset directory (LABELER_DATA_DIR). Defaults to the app's.
+        timeout (float, optional): Seconds allowed per render. Defaults to 120.
+
+    Returns:
+        dict: Median milliseconds of each phase
+    """
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as output_dir:
+        results = [run_child(data_dir, output_dir, timeout) for _ in range(runs)]
+
+    report = {"runs": runs}
+    for key in ("process_total_s", "streamlit_import_s", "app_import_s", "first_render_s",
+                "first_question_s", "warm_up_done_s"):
+        report[key.replace("_s", "_ms")] = round(1000 * statistics.median(r[key] for r in results), 1)
+    report["heavy_modules_at_import"] = results[0]["heavy_modules_at_import"]
+    report["errors"] = [error for r in results for error in r["errors"]][:10]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app's cold start")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh processes to measure")
+    parser.add_argument("--data-dir", help="directory with the dataset files (LABELER_DATA_DIR)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per render")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_startup(args.timeout)))
+        return
+
+    report = run_benchmark(args.runs, args.data_dir, args.timeout)
+
+    for key, value in report.items():
+        print(f"{key:>24}: {value}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+# benchmarks/synthetic_data.py
+#
+# Generates synthetic datasets and label files for scale testing.
+#
+# Records follow the schema of data/final_files/Faiz_FJ.json and
+# FJ_only.json. Text sizes, tags, scores and the share of empty model
+# responses are sampled from the real files, and images are written to a
+# local directory so they can be served without network access. Output is
+# streamed record by record, so million-record files do not need to fit
+# in memory.
+#
+# Usage:
+#   python -m benchmarks.synthetic_data --out /tmp/synthetic --posts 100000 --annotators 20
+
+import argparse
+import json
+import os
+import random
+import re
+from datetime import datetime, timedelta
+from modules.utils.rubric import EVALUATION_RUBRIC
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_DATA_DIR = os.path.join(ROOT_DIR, "data", "final_files")
+
+# Layouts of the real dataset files
+LAYOUTS = {
+    "Faiz_FJ": {"analysis_result": False, "related_text": True},
+    "FJ_only": {"analysis_result": True, "related_text": False},
+}
+
+MODELS = ("GPT", "Gemini", "Llama")
+
+# Used when the real data files are not available
+FALLBACK_WORDS = ("error", "function", "value", "python", "list", "code", "return", "image", "file", "data",
+                  "using", "when", "class", "method", "object", "output", "running", "version", "install")
+FALLBACK_TAGS = ("python", "javascript", "java", "reactjs", "pandas", "typescript", "css", "html", "android", "c#")
+
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]{1,14}")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+class RealDataProfile:
+    """Distributions sampled from the real dataset files"""
+
+    def __init__(self, data_dir=REAL_DATA_DIR):
+        self.body_lengths = []
+        self.answer_lengths = []
+        self.title_lengths = []
+        self.response_lengths = {}
+        self.empty_response_rate = {}
+        self.scores = []
+        self.tags = []
+        self.words = set()
+
+        records = []
+        for layout in LAYOUTS:
+            path = os.path.join(data_dir, f"{layout}.json")
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    records.extend(json.load(f))
+
+        response_counts = {}
+        for record in records:
+            self.body_lengths.append(len(record.get("body") or ""))
+            self.title_lengths.append(len(record.get("title") or ""))
+            answer = record.get("accepted_answer")
+            if isinstance(answer, dict):
+                self.answer_lengths.append(len(answer.get("body") or ""))
+            if isinstance(record.get("score"), int):
+                self.scores.append(record["score"])
+            if isinstance(record.get("tags"), list):
+                self.tags.extend(record["tags"])
+            self.words.update(WORD_PATTERN.findall(TAG_PATTERN.sub(" ", record.get("body") or ""))[:200])
+
+            for key, value in record.items():
+                if not key.endswith("_image_response"):
+                    continue
+                total, empty = response_counts.get(key, (0, 0))
+                response_counts[key] = (total + 1, empty + (0 if value else 1))
+                if value:
+                    self.response_lengths.setdefault(key, []).append(len(value))
+
+        self.empty_response_rate = {key: empty / total for key, (total, empty) in response_counts.items()}
+        self.words = sorted(self.words) or list(FALLBACK_WORDS)
+        self.tags = self.tags or list(FALLBACK_TAGS)
+        self.body_lengths = self.body_lengths or [1500]
+        self.answer_lengths = self.answer_lengths or [1200]
+        self.title_lengths = self.title_lengths or [70]
+        self.scores = self.scores or [0]
+
+
+class SyntheticDatasetGenerator:
+    """Generate records, images and label files with the real data schema"""
+
+    def __init__(self, seed=0, profile=None, image_base_url="http://127.0.0.1:8000", image_pool=50,
+                 repr_fields=False):
+        self.rng = random.Random(seed)
+        self.profile = profile or RealDataProfile()
+        self.image_base_url = image_base_url.rstrip("/")
+        self.image_pool = image_pool
+        self.repr_fields = repr_fields
+        self.start_date = datetime(2019, 1, 1)
+
+    def _words(self, length):
+        """Random text of roughly the given length in characters"""
+        words = []
+        size = 0
+        while size < length:
+            word = self.rng.choice(self.profile.words)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)
+
+    def _html(self, length):
+        """HTML body of roughly the given length, mixing paragraphs and code"""
+        parts = []
+        size = 0
+        while size < length:
+            chunk = self._words(self.rng.randint(80, 400))
+            if self.rng.random() < 0.3:
+                chunk = chunk.replace(" ", "\n", 3)
+                part = f"<pre><code>{chunk}</code></pre>"
+            else:
+                part = f"<p>{chunk}</p>"
+            parts.append(part)
+            size += len(part) + 1
+        return "\n".join(parts)
+
+    def _markdown(self, length):
+        """Model-style markdown response of roughly the given length"""
+        parts = []
+        size = 0
+        while size < length:
+            if self.rng.random() < 0.25:
+                part = f"```python\n{self._words(self.rng.randint(60, 300)).replace(' ', chr(10), 4)}\n```"
+            else:
+                part = self._words(self.rng.randint(100, 500))
+            parts.append(part)
+            size += len(part) + 2
+        return "\n\n".join(parts)
+
+    def image_name(self, post_id):
+        """Name of the pooled image used by a post"""
+        return f"image_{post_id % self.image_pool:04d}.png"
+
+    def make_record(self, post_id, layout="Faiz_FJ"):
+        """Create one dataset record
+
+        Args:
+            post_id (int): ID of the post
+            layout (str, optional): "Faiz_FJ" or "FJ_only". Defaults to "Faiz_FJ".
+
+        Returns:
+            dict: The record
+        """
+        rng = self.rng
+        profile = self.profile
+        created = self.start_date + timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 5))
+        title = self._words(rng.choice(profile.title_lengths)).capitalize() + "?"
+        tags = rng.sample(profile.tags, k=min(len(profile.tags), rng.randint(1, 5)))
+        accepted_answer = {"answer_id": post_id + 1, "body": self._html(rng.choice(profile.answer_lengths))}
+
+        record = {
+            "post_id": post_id,
+            "title": title,
+            "body": self._html(rng.choice(profile.body_lengths)),
+            "image_link": f"{self.image_base_url}/{self.image_name(post_id)}",
+            "link": f"https://stackoverflow.com/questions/{post_id}",
+            "creation_date": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "closed_date": None if layout == "Faiz_FJ" else "1969-12-31 19:00:00",
+            "closed_reason": "Not specified",
+            "score": rng.choice(profile.scores),
+            "tags": repr(tags) if self.repr_fields else tags,
+            "month": created.strftime("%B %Y"),
+            "accepted_answer": repr(accepted_answer) if self.repr_fields else accepted_answer,
+        }
+        if LAYOUTS[layout]["analysis_result"]:
+            record["analysis_result"] = "YES"
+
+        for model in MODELS:
+            for modality in ("with", "without"):
+                key = f"{model}_{modality}_image_response"
+                if rng.random() < profile.empty_response_rate.get(key, 0.0):
+                    record[key] = ""
+                else:
+                    lengths = profile.response_lengths.get(key) or [1800]
+                    record[key] = self._markdown(rng.choice(lengths))
+
+        return record
+
+    def make_label(self, record, annotator, layout="Faiz_FJ"):
+        """Create a submitted label for a record with random answers
+
+        Args:
+            record (dict): The dataset record
+            annotator (str): Name of the annotator
+            layout (str, optional): "Faiz_FJ" or "FJ_only". Defaults to "Faiz_FJ".
+
+        Returns:
+            dict: The label, in the format written by save_labeled_data
+        """
+        rng = self.rng
+        label = {
+            "post_id": record["post_id"],
+            "timestamp": datetime.now().isoformat(),
+        }
+        if LAYOUTS[layout]["related_text"]:
+            label["related_text"] = self._words(rng.randint(0, 200))
+
+        for model in MODELS:
+            for modality in ("with", "without"):
+                values = []
+                for field in EVALUATION_RUBRIC.fields:
+                    if field.widget == "yes_no":
+                        values.append(rng.random() < 0.7)
+                    elif field.widget == "multiselect":
+                        values.append(rng.sample(field.options, k=rng.randint(0, len(field.options))))
+                    elif field.widget == "rating":
+                        values.append(rng.choice(field.options))
+                    else:
+                        values.append(self._words(rng.randint(0, 120)) if rng.random() < 0.2 else "")
+                # Changed answers were set explicitly, about half of the kept defaults too
+                touched = sum(1 << field.index for field in EVALUATION_RUBRIC.fields
+                              if values[field.index] != field.default or rng.random() < 0.5)
+                label[f"{model}_{modality}_image_evaluation"] = EVALUATION_RUBRIC.build(values, touched)
+
+        label.update({
+            "annotator": annotator,
+            "dataset": layout,
+            "title": record["title"],
+            "timestamp": datetime.now().isoformat(),
+        })
+        return label
+
+    def write_images(self, image_dir, width=800, height=450):
+        """Write the pooled images to a directory
+
+        Args:
+            image_dir (str): Directory for the PNG files
+        """
+        from PIL import Image, ImageDraw
+
+        os.makedirs(image_dir, exist_ok=True)
+        for i in range(self.image_pool):
+            image = Image.new("RGB", (width, height), (250, 250, 250))
+            draw = ImageDraw.Draw(image)
+            for line in range(12):
+                draw.text((20, 20 + 32 * line), self._words(60), fill=(30, 30, 30))
+            image.save(os.path.join(image_dir, f"image_{i:04d}.png"))
+
+    def write_dataset(self, path, posts, layout="Faiz_FJ", first_post_id=10_000_000):
+        """Stream a dataset file to disk
+
+        Args:
+            path (str): Output file path
+            posts (int): Number of records
+            layout (str, optional): "Faiz_FJ" or "FJ_only". Defaults to "Faiz_FJ".
+            first_post_id (int, optional): ID of the first post. Defaults to 10,000,000.
+
+        Returns:
+            list: (post_id, title) for every record, used to build label files
+        """
+        index = []
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("[\n")
+            for i in range(posts):
+                record = self.make_record(first_post_id + i, layout)
+                if i:
+                    f.write(",\n")
+                f.write(json.dumps(record, ensure_ascii=False))
+                index.append((record["post_id"], record["title"]))
+            f.write("\n]\n")
+        return index
+
+    def write_labels(self, output_dir, index, annotators, coverage, layout="Faiz_FJ"):
+        """Write one label file per annotator
+
+        Args:
+            output_dir (str): Directory for the label files
+            index (list): (post_id, title) pairs from write_dataset
+            annotators (int): Number of annotators
+            coverage (float): Share of the posts labeled by each annotator
+            layout (str, optional): "Faiz_FJ" or "FJ_only". Defaults to "Faiz_FJ".
+
+        Returns:
+            list: Paths of the label files
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for a in range(annotators):
+            annotator = f"annotator{a:03d}"
+            path = os.path.join(output_dir, f"{annotator}_{layout}_labels.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("[\n")
+                first = True
+                for post_id, title in index:
+                    if self.rng.random() >= coverage:
+                        continue
+                    label = self.make_label({"post_id": post_id, "title": title}, annotator, layout)
+                    if not first:
+                        f.write(",\n")
+                    f.write(json.dumps(label, ensure_ascii=False))
+                    first = False
+                f.write("\n]\n")
+            paths.append(path)
+        return paths
+
+    def generate(self, out_dir, posts, annotators=0, coverage=0.1, layouts=tuple(LAYOUTS)):
+        """Generate datasets, images and label files under one directory
+
+        The layout is <out_dir>/data/<layout>.json, <out_dir>/data/images/
+        and <out_dir>/labeled_data/.
+
+        Returns:
+            dict: Paths of the generated data directory, image directory and label directory
+        """
+        data_dir = os.path.join(out_dir, "data")
+        image_dir = os.path.join(data_dir, "images")
+        label_dir = os.path.join(out_dir, "labeled_data")
+        os.makedirs(data_dir, exist_ok=True)
+
+        self.write_images(image_dir)
+        for layout in layouts:
+            index = self.write_dataset(os.path.join(data_dir, f"{layout}.json"), posts, layout)
+            if annotators:
+                self.write_labels(label_dir, index, annotators, coverage, layout)
+
+        return {"data_dir": data_dir, "image_dir": image_dir, "label_dir": label_dir}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic datasets and label files")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--posts", type=int, default=10_000, help="records per dataset file")
+    parser.add_argument("--annotators", type=int, default=0, help="annotators to create label files for")
+    parser.add_argument("--coverage", type=float, default=0.1, help="share of posts each annotator labels")
+    parser.add_argument("--layout", choices=list(LAYOUTS), action="append",
+                        help="dataset layout to generate (default: all)")
+    parser.add_argument("--image-base-url", default="http://127.0.0.1:8000/images",
+                        help="URL the images will be served from")
+    parser.add_argument("--image-pool", type=int, default=50, help="number of distinct images")
+    parser.add_argument("--repr-fields", action="store_true",
+                        help="write tags and accepted_answer as Python repr strings, as in raw exports")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = SyntheticDatasetGenerator(seed=args.seed, image_base_url=args.image_base_url,
+                                          image_pool=args.image_pool, repr_fields=args.repr_fields)
+    paths = generator.generate(args.out, args.posts, args.annotators, args.coverage,
+                               tuple(args.layout or LAYOUTS))
+
+    for name, path in paths.items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# deploy/run_workers.py
+#
+# Runs several app processes that share their labels through one SQLite
+# database, for serving more annotators than a single Streamlit process can.
+#
+# Every worker is a plain `streamlit run app.py` on its own port with
+# LABELER_STORAGE=sqlite. Sessions are held in the memory of one worker, so
+# the load balancer in front must be sticky (see deploy/nginx.conf). Labels,
+# autosaved drafts and background tasks live in the database, so an
+# annotator routed to another worker continues where they left off.
+#
+# Usage:
+#   python -m deploy.run_workers --workers 4 --base-port 8501
+#   python -m deploy.run_workers --workers 4 --db /srv/labeler/labels.sqlite3
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+
+
+def worker_command(port):
+    """Command line starting one app worker"""
+    return [
+        sys.executable, "-m", "streamlit", "run", APP_PATH,
+        "--server.port", str(port),
+        "--server.address", "127.0.0.1",
+        "--server.headless", "true",
+        # The proxy serves every worker under the same origin
+        "--server.enableCORS", "false",
+        "--server.enableXsrfProtection", "false",
+        "--browser.gatherUsageStats", "false",
+    ]
+
+
+def worker_env(db_path, port, output_dir=None, data_dir=None):
+    """Environment of one app worker, sharing the label database with the others
+
+    Every worker writes its own metrics file, labelled with its port, since
+    the timings are kept per process.
+    """
+    env = dict(os.environ)
+    env["LABELER_STORAGE"] = "sqlite"
+    env["LABELER_DB_PATH"] = db_path
+    if output_dir:
+        env["LABELER_OUTPUT_DIR"] = output_dir
+    if data_dir:
+        env["LABELER_DATA_DIR"] = data_dir
+    env["LABELER_WORKER"] = str(port)
+    metrics_dir = output_dir or os.environ.get("LABELER_OUTPUT_DIR") or os.path.join(ROOT_DIR, "labeled_data")
+    metrics_file, extension = os.path.splitext(os.environ.get("LABELER_METRICS_FILE") or
+                                               os.path.join(metrics_dir, "metrics.prom"))
+    env["LABELER_METRICS_FILE"] = f"{metrics_file}-{port}{extension}"
+    return env
+
+
+def run_workers(workers, base_port, db_path, output_dir=None, data_dir=None):
+    """Start the workers and restart any that exit until interrupted
+
+    Args:
+        workers (int): Number of app processes
+        base_port (int): Port of the first worker, the others follow
+        db_path (str): Path of the shared SQLite database
+        output_dir (str, optional): Output directory for label files. Defaults to None.
+        data_dir (str, optional): Directory with the dataset files. Defaults to None.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    ports = [base_port + i for i in range(workers)]
+    envs = {port: worker_env(db_path, port, output_dir, data_dir) for port in ports}
+    processes = {port: subprocess.Popen(worker_command(port), env=envs[port], cwd=ROOT_DIR) for port in ports}
+    print(f"Started {workers} workers on ports {ports[0]}-{ports[-1]} sharing {db_path}")
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+    try:
+        while not stopping:
+            time.sleep(1)
+            for port, process in processes.items():
+                if process.poll() is not None:
+                    print(f"Worker on port {port} exited with code {process.returncode}, restarting")
+                    processes[port] = subprocess.Popen(worker_command(port), env=envs[port], cwd=ROOT_DIR)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several app workers sharing one label database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="number of app processes")
+    parser.add_argument("--base-port", type=int, default=8501, help="port of the first worker")
+    parser.add_argument("--db", default=os.path.join(ROOT_DIR, "labeled_data", "labels.sqlite3"),
+                        help="path of the shared SQLite database")
+    parser.add_argument("--output-dir", help="directory for label files (LABELER_OUTPUT_DIR)")
+    parser.add_argument("--data-dir", help="directory with the dataset files (LABELER_DATA_DIR)")
+    args = parser.parse_args()
+
+    run_workers(args.workers, args.base_port, args.db, args.output_dir, args.data_dir)
+
+
+if __name__ == "__main__":
+    main()
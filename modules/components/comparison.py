@@ -0,0 +1,103 @@
+# modules/components/comparison.py
+
+import streamlit as st
+from modules.components.display import display_question_details, display_response_stats, render_prepared_html
+from modules.components.evaluation_form import render_evaluation_form
+from modules.utils.text_diff import highlight_word_diff
+
+# What can be compared side by side
+COMPARISON_MODES = ["With vs. without image", "Two models"]
+
+# Keeps long responses in a scrollable box so both sides stay aligned
+RESPONSE_BOX_STYLE = "white-space: pre-wrap; max-height: 480px; overflow-y: auto; padding: 0.5rem; border: 1px solid #ddd; border-radius: 0.25rem;"
+
+
+def _select_sides(models):
+    """Let the annotator pick the two responses to compare
+
+    Args:
+        models (list): Names of the evaluated models
+
+    Returns:
+        list: Two (model_name, with_image) pairs, or None if the selection is invalid
+    """
+    mode = st.radio("Compare", COMPARISON_MODES, horizontal=True, key="comparison_mode")
+
+    if mode == COMPARISON_MODES[0]:
+        model = st.selectbox("Model", models, key="comparison_model")
+        return [(model, False), (model, True)]
+
+    if len(models) < 2:
+        st.info("This dataset has only one model to compare.")
+        return None
+
+    col1, col2 = st.columns(2)
+    with col1:
+        left = st.selectbox("Left model", models, index=0, key="comparison_left_model")
+    with col2:
+        right = st.selectbox("Right model", models, index=1, key="comparison_right_model")
+    modality = st.radio("Responses", ["Without Image", "With Image"], horizontal=True, key="comparison_modality")
+
+    if left == right:
+        st.warning("Pick two different models to compare.")
+        return None
+
+    with_image = modality == "With Image"
+    return [(left, with_image), (right, with_image)]
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _highlighted_pair(source, index, post_id, sides, _question):
+    """Highlight the differences between two responses of a post
+
+    The source file, post index and post id are only used as the cache key,
+    so the responses are read and diffed once per post and pair of sides
+    instead of on every rerun.
+    """
+    return highlight_word_diff(*(_question.response(model, with_image) for model, with_image in sides))
+
+
+def comparison_interface(current_question, models, question_key):
+    """Evaluate two responses side by side
+
+    The question and accepted answer are shown once, followed by the two
+    responses with their differences highlighted and a compact evaluation
+    form under each. Answers are stored in the same evaluation structure
+    as the one-response-at-a-time layout.
+
+    Args:
+        current_question (RenderBundle): Render bundle of the question
+        models (list): Names of the evaluated models
+        question_key (str): Unique key for this question
+    """
+    sides = _select_sides(models)
+    if not sides:
+        return
+
+    # Display the question once for both responses
+    with st.expander("Question and Accepted Answer", expanded=True):
+        show_image = any(with_image for _, with_image in sides)
+        display_question_details(current_question, show_image=show_image)
+
+        st.subheader("Accepted Answer")
+        render_prepared_html(current_question.accepted_answer)
+
+    highlight = st.toggle("Highlight differences", value=True, key="comparison_highlight")
+
+    if highlight:
+        highlighted = _highlighted_pair(current_question.bundles.source, current_question.index,
+                                        current_question.post_id, tuple(sides), current_question)
+    else:
+        highlighted = (None, None)
+
+    columns = st.columns(2)
+    for column, (model_name, with_image), response_html in zip(columns, sides, highlighted):
+        with column:
+            st.subheader(f"{model_name} ({'With' if with_image else 'Without'} Image)")
+            display_response_stats(current_question, model_name, with_image)
+            if response_html is not None:
+                st.markdown(f'<div style="{RESPONSE_BOX_STYLE}">{response_html}</div>', unsafe_allow_html=True)
+            else:
+                render_prepared_html(current_question.response_html(model_name, with_image))
+
+            render_evaluation_form(model_name, question_key, with_image, compact=True)
@@ -7,7 +7,7 @@ def image_text_extraction_section(current_question, current_post_id, question_ke
     """Handle the image text extraction section
 
     Args:
-        current_question (dict): The question data
+        current_question (RenderBundle): Render bundle of the question
         current_post_id (str): ID of the post
         question_key (str): Unique key for this question
 
@@ -43,11 +43,13 @@ def image_text_extraction_section(current_question, current_post_id, question_ke
     return related_text
 
 
-def are_evaluations_complete(dataset_option):
+def are_evaluations_complete(models, image_extraction=False):
     """Check if all required evaluations are complete
 
     Args:
-        dataset_option (str): Dataset being used
+        models (list): Names of the evaluated models
+        image_extraction (bool, optional): Whether the dataset asks for the
+            image text extraction. Defaults to False.
 
     Returns:
         bool: True if all evaluations are complete, False otherwise
@@ -55,15 +57,15 @@ def are_evaluations_complete(dataset_option):
     eval_data = st.session_state.current_evaluation
 
     # Check if all models have both with and without image evaluations
-    for model in ["GPT", "Gemini", "Llama"]:
+    for model in models:
         with_image_key = f"{model}_with_image_evaluation"
         without_image_key = f"{model}_without_image_evaluation"
 
         if with_image_key not in eval_data or without_image_key not in eval_data:
             return False
 
-    # Check if related_text is present for Faiz_FJ dataset
-    if dataset_option == "Faiz_FJ" and "related_text" not in eval_data:
+    # Check if related_text is present when the dataset asks for it
+    if image_extraction and "related_text" not in eval_data:
         return False
 
     return True
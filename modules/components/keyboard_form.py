@@ -0,0 +1,147 @@
+# modules/components/keyboard_form.py
+
+import os
+import streamlit as st
+import streamlit.components.v1 as components
+from modules.components.display import display_question_details, display_response_stats, render_prepared_html
+from modules.utils.rubric import EVALUATION_RUBRIC, TOUCHED_KEY
+
+# The form is a static HTML component, so no frontend build is needed
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keyboard_form_frontend")
+_keyboard_form = components.declare_component("keyboard_form", path=_FRONTEND_DIR)
+
+KEYBOARD_HELP = (
+    "**Keys:** `y`/`n` answer, `1`-`5` rate or toggle an option, `j`/`k` or arrows move between questions, "
+    "`e` edit notes (`Esc` to leave), `Enter` save section, `]`/`[` save and go to next/previous response, "
+    "`Ctrl+Enter` save and submit the post."
+)
+
+
+def _field_specs(model_name):
+    """Describe the rubric questions for the component
+
+    Args:
+        model_name (str): Name of the model (GPT, Gemini, Llama)
+
+    Returns:
+        list: One JSON-serializable dict per question, in render order
+    """
+    return [
+        {
+            "name": field.name,
+            "widget": field.widget,
+            "heading": field.heading.format(model=model_name) if field.heading else None,
+            "prompt": field.prompt,
+            "label": field.label.format(model=model_name),
+            "options": field.options,
+            "depth": field.depth,
+            "parent": field.parent.index if field.parent else -1,
+            "show_if": field.show_if,
+        }
+        for field in EVALUATION_RUBRIC.fields
+    ]
+
+
+def _coerce_values(submitted, model_data):
+    """Turn the answers sent by the component into a compact rubric state
+
+    Unknown or malformed answers fall back to the stored value.
+
+    Args:
+        submitted (dict): Answers keyed by question name
+        model_data (dict): The stored evaluation for this response
+
+    Returns:
+        list: Answers in field order
+    """
+    values = []
+    for field in EVALUATION_RUBRIC.fields:
+        value = submitted.get(field.name, field.get(model_data))
+        if field.widget == "yes_no":
+            value = value if isinstance(value, bool) else field.get(model_data)
+        elif field.widget == "multiselect":
+            value = [option for option in value if option in field.options] if isinstance(value, list) else []
+        elif field.widget == "rating":
+            value = value if value in field.options else field.get(model_data)
+        else:
+            value = value if isinstance(value, str) else ""
+        values.append(value)
+    return values
+
+
+def keyboard_interface(current_question, models, question_key):
+    """Evaluate responses with a keyboard-driven form
+
+    Answers are collected in the browser and sent back once per section
+    (one model response), instead of triggering a rerun for every click.
+
+    Args:
+        current_question (RenderBundle): Render bundle of the question
+        models (list): Names of the evaluated models
+        question_key (str): Unique key for this question
+
+    Returns:
+        bool: True if the annotator asked to submit the whole post
+    """
+    # Every model response is one section, visited in order
+    sections = [(model, with_image) for model in models for with_image in (False, True)]
+    # The position is reset whenever the annotator moves to another post
+    position_key, section_index = st.session_state.get("keyboard_position", (None, 0))
+    section_index = min(section_index, len(sections) - 1) if position_key == question_key else 0
+    model_name, with_image = sections[section_index]
+    model_key = f"{model_name}_{'with' if with_image else 'without'}_image_evaluation"
+
+    st.caption(KEYBOARD_HELP)
+    st.progress((section_index + 1) / len(sections))
+    st.write(f"Response {section_index + 1} of {len(sections)}: "
+             f"**{model_name} ({'With' if with_image else 'Without'} Image)**")
+
+    with st.expander("Question and Accepted Answer", expanded=False):
+        display_question_details(current_question, show_image=with_image)
+
+        st.subheader("Accepted Answer")
+        render_prepared_html(current_question.accepted_answer)
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        display_response_stats(current_question, model_name, with_image)
+        render_prepared_html(current_question.response_html(model_name, with_image))
+
+    model_data = st.session_state.current_evaluation.get(model_key, {})
+    with col2:
+        result = _keyboard_form(
+            fields=_field_specs(model_name),
+            values=dict(zip((field.name for field in EVALUATION_RUBRIC.fields), EVALUATION_RUBRIC.read(model_data))),
+            revision=f"{question_key}:{model_key}",
+            key=f"keyboard_{question_key}",
+            default=None,
+        )
+
+    # The component keeps returning its last value, so each update is applied once
+    if not result or result.get("nonce") == st.session_state.get("keyboard_nonce"):
+        return False
+    st.session_state.keyboard_nonce = result.get("nonce")
+
+    # Answers sent for a section that is no longer shown are ignored
+    if result.get("revision") != f"{question_key}:{model_key}":
+        return False
+
+    values = _coerce_values(result.get("values", {}), model_data)
+    # Every key press counts, so keeping a preset answer on purpose is recorded too
+    touched = model_data.get(TOUCHED_KEY, 0)
+    for name in result.get("touched") or []:
+        field = EVALUATION_RUBRIC.by_name.get(name)
+        if field is not None:
+            touched |= 1 << field.index
+    st.session_state.current_evaluation[model_key] = EVALUATION_RUBRIC.build(values, touched)
+    post_id = st.session_state.current_evaluation["post_id"]
+    st.session_state.post_evaluations[post_id] = st.session_state.current_evaluation
+
+    action = result.get("action")
+    if action == "submit":
+        return True
+    if action in ("next", "prev"):
+        step = 1 if action == "next" else -1
+        st.session_state.keyboard_position = (question_key, max(0, min(len(sections) - 1, section_index + step)))
+        st.rerun()
+    return False
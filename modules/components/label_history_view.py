@@ -0,0 +1,42 @@
+# modules/components/label_history_view.py
+
+import streamlit as st
+from modules.utils.storage import get_label_store
+from modules.utils.label_history import reconstruct, describe_delta
+
+
+def display_label_history(post_id, annotator_name, dataset_option, output_dir):
+    """Display the saved versions of the annotator's label for a post
+
+    The history is only read when the annotator asks for it.
+
+    Args:
+        post_id (str): ID of the post
+        annotator_name (str): Name of the annotator
+        dataset_option (str): Dataset being used
+        output_dir (str): Directory containing the labeled data
+    """
+    if not st.toggle("Show label history", key=f"label_history_{post_id}"):
+        return
+
+    entries = get_label_store(output_dir).label_history(post_id, annotator_name, dataset_option)
+    if not entries:
+        st.info("No history recorded for this label yet.")
+        return
+
+    with st.expander(f"Label history ({len(entries)} versions)", expanded=True):
+        for entry in reversed(entries):
+            st.write(f"**Version {entry['version'] + 1}** — saved {entry.get('saved_at', 'unknown')}")
+            if "base" in entry:
+                st.write("First saved version")
+            else:
+                for line in describe_delta(entry["delta"]):
+                    st.write(f"- {line}")
+
+        version = st.selectbox(
+            "View version",
+            [entry["version"] for entry in reversed(entries)],
+            format_func=lambda v: f"Version {v + 1}",
+            key=f"label_history_version_{post_id}"
+        )
+        st.json(reconstruct(entries, version), expanded=False)
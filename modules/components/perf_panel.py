@@ -0,0 +1,41 @@
+# modules/components/perf_panel.py
+
+import streamlit as st
+from modules.utils.perf import PROCESS_METRICS, get_session_metrics, is_enabled
+
+
+def _summary_rows(registry):
+    """Format registry summaries as table rows"""
+    rows = []
+    for name, summary in registry.summaries():
+        rows.append({
+            "Span": name,
+            "Calls": summary["count"],
+            "Mean (ms)": round(summary["mean_ms"], 1),
+            "p50 (ms)": round(summary["p50_ms"], 1),
+            "p95 (ms)": round(summary["p95_ms"], 1),
+            "Max (ms)": round(summary["max_ms"], 1),
+        })
+    return rows
+
+
+def display_perf_panel():
+    """Display the rerun timing panel in the sidebar
+
+    Only shown when profiling is enabled with LABELER_PROFILE=1.
+    """
+    if not is_enabled():
+        return
+
+    with st.expander("Performance", expanded=False):
+        scope = st.radio("Scope", ["This session", "All sessions"], horizontal=True, key="perf_scope")
+        registry = get_session_metrics() if scope == "This session" else PROCESS_METRICS
+
+        rows = _summary_rows(registry)
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.write("No timings recorded yet.")
+
+        if st.button("Reset", key="perf_reset"):
+            registry.reset()
@@ -1,7 +1,12 @@
 # modules/components/session_state.py
 
+import copy
 import streamlit as st
 from datetime import datetime
+from modules.utils.rubric import EVALUATION_RUBRIC
+from modules.utils.prefetch import NeighborPrefetcher
+from modules.utils.label_cache import SessionLabelCache
+from modules.utils.annotation_timing import AnnotationTimer
 
 
 def init_session_state():
@@ -30,9 +35,42 @@ def init_session_state():
     if 'post_evaluations' not in st.session_state:
         st.session_state.post_evaluations = {}
 
+    # Confirmation shown after a submission
+    if 'submit_message' not in st.session_state:
+        st.session_state.submit_message = None
 
-def ensure_post_evaluation(post_id, dataset_option):
-    """Ensure post_id exists in session state"""
+    # Downloads the annotator asked to build, keyed by download name
+    if 'prepared_downloads' not in st.session_state:
+        st.session_state.prepared_downloads = {}
+
+    # Background preparation of the posts around the current one
+    if 'prefetcher' not in st.session_state:
+        st.session_state.prefetcher = NeighborPrefetcher()
+
+    # Saved labels of the annotator, indexed by post id
+    if 'label_cache' not in st.session_state:
+        st.session_state.label_cache = SessionLabelCache()
+
+    # Last autosaved draft, so unchanged drafts are not written again
+    if 'saved_draft' not in st.session_state:
+        st.session_state.saved_draft = None
+
+    # Timing of the posts and sections the annotator works on
+    if 'annotation_timer' not in st.session_state:
+        st.session_state.annotation_timer = AnnotationTimer()
+
+
+def ensure_post_evaluation(post_id, models, initial=None, image_extraction=False):
+    """Ensure post_id exists in session state
+
+    Args:
+        post_id (str): ID of the post
+        models (list): Names of the evaluated models
+        initial (dict, optional): Autosaved draft or saved label to prefill the
+            answers from. Defaults to None.
+        image_extraction (bool, optional): Whether the dataset asks for the
+            image text extraction (see DatasetInfo). Defaults to False.
+    """
     if post_id not in st.session_state.post_evaluations:
         # Initialize with template structure
         template = {
@@ -40,33 +78,20 @@ def ensure_post_evaluation(post_id, dataset_option):
             "timestamp": datetime.now().isoformat(),
         }
 
-        # Add related_text field only for Faiz_FJ dataset
-        if dataset_option == "Faiz_FJ":
+        # Add related_text field only for datasets with image text extraction
+        if image_extraction:
             template["related_text"] = ""
 
         # Add evaluation fields for all models with separate with/without image evaluations
-        for model in ["GPT", "Gemini", "Llama"]:
-            # Create entry for with_image evaluation
-            template[f"{model}_with_image_evaluation"] = {
-                "correctness": {"is_correct": True, "issues": []},
-                "consistency": {"is_consistent": True, "issues": []},
-                "is_comprehensive": True,
-                "conciseness": {"is_concise": True, "issues": []},
-                "usefulness_rating": 3,
-                "code_issues": {"has_issues": False, "types": [], "non_functional_types": []},
-                "notes": ""
-            }
-
-            # Create entry for without_image evaluation
-            template[f"{model}_without_image_evaluation"] = {
-                "correctness": {"is_correct": True, "issues": []},
-                "consistency": {"is_consistent": True, "issues": []},
-                "is_comprehensive": True,
-                "conciseness": {"is_concise": True, "issues": []},
-                "usefulness_rating": 3,
-                "code_issues": {"has_issues": False, "types": [], "non_functional_types": []},
-                "notes": ""
-            }
+        for model in models:
+            template[f"{model}_with_image_evaluation"] = EVALUATION_RUBRIC.default_evaluation()
+            template[f"{model}_without_image_evaluation"] = EVALUATION_RUBRIC.default_evaluation()
+
+        # Prefill the answers; copied so form edits never touch the cached label
+        if initial:
+            for key in template:
+                if key in initial and key not in ("post_id", "timestamp"):
+                    template[key] = copy.deepcopy(initial[key])
 
         st.session_state.post_evaluations[post_id] = template
 
@@ -2,13 +2,64 @@
 
 import streamlit as st
 import os
-import json
 from modules.utils.file_utils import get_labeled_files
+from modules.utils.archive_utils import files_signature, gzip_file, zip_files, gzip_combined_records
+
+# Per-file download formats: label -> (compressed, file suffix, mime type)
+FILE_FORMATS = {
+    "Gzip (.json.gz)": (True, ".gz", "application/gzip"),
+    "Plain JSON (.json)": (False, "", "application/json"),
+}
+
+# Combined download formats: label -> (kind, file suffix, mime type)
+BUNDLE_FORMATS = {
+    "ZIP of all files (.zip)": ("zip", ".zip", "application/zip"),
+    "Combined JSON (.json.gz)": ("json", ".json.gz", "application/gzip"),
+    "Combined JSONL (.jsonl.gz)": ("jsonl", ".jsonl.gz", "application/gzip"),
+}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _file_payload(file_path, compressed, signature):
+    """Read (and optionally compress) a single label file
+
+    The signature argument is only used as part of the cache key, so a file
+    is re-read only after it changes on disk.
+    """
+    if compressed:
+        return gzip_file(file_path)
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _bundle_payload(kind, signature):
+    """Build the combined download for every file in the signature"""
+    file_paths = [entry[0] for entry in signature]
+    if kind == "zip":
+        return zip_files(file_paths)
+    return gzip_combined_records(file_paths, jsonl=(kind == "jsonl"))
+
+
+def _prepare_button(label, download_key, signature):
+    """Show a button that marks a download as requested
+
+    Returns:
+        bool: True if the download was requested for this exact signature
+    """
+    prepared = st.session_state.prepared_downloads
+    if st.button(label, key=f"prepare_{download_key}"):
+        prepared[download_key] = signature
+    return prepared.get(download_key) == signature
 
 
 def download_interface(annotator_name, output_dir):
     """Handle the download interface
 
+    Downloads are only built once the annotator asks for them, and the
+    results are cached by file modification time so reruns of this tab
+    do not re-read or re-compress anything.
+
     Args:
         annotator_name (str): Name of the annotator
         output_dir (str): Directory containing the labeled data
@@ -26,9 +77,15 @@ def download_interface(annotator_name, output_dir):
     # Display each file with a download button
     st.subheader("Your Labeled Files")
 
+    file_format = st.radio("File format", list(FILE_FORMATS), horizontal=True, key="download_file_format")
+    compressed, suffix, mime = FILE_FORMATS[file_format]
+
     for file_path in files:
         filename = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path) / 1024  # KB
+        signature = files_signature([file_path])
+        if not signature:
+            continue
+        file_size = signature[0][2] / 1024  # KB
 
         # Format the file information
         col1, col2 = st.columns([3, 1])
@@ -38,14 +95,14 @@ def download_interface(annotator_name, output_dir):
             st.write(f"Size: {file_size:.2f} KB")
 
         with col2:
-            with open(file_path, "r", encoding='utf-8') as f:
-                file_content = f.read()
+            download_key = f"{filename}{suffix}"
+            if _prepare_button("Prepare Download", download_key, signature):
                 st.download_button(
                     label="Download",
-                    data=file_content,
-                    file_name=filename,
-                    mime="application/json",
-                    key=f"download_{filename}"
+                    data=_file_payload(file_path, compressed, signature),
+                    file_name=f"{filename}{suffix}",
+                    mime=mime,
+                    key=f"download_{download_key}"
                 )
 
     # Combine all files option
@@ -53,27 +110,19 @@ def download_interface(annotator_name, output_dir):
         st.subheader("Download All Labels")
         st.write("Combine all your labeled data into a single file:")
 
-        all_data = []
-        for file_path in files:
-            try:
-                with open(file_path, "r", encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        all_data.extend(data)
-                    else:
-                        all_data.append(data)
-            except Exception as e:
-                st.error(f"Error reading file {file_path}: {e}")
-
-        if all_data:
-            combined_filename = f"{annotator_name}_all_labels.json"
-            combined_data = json.dumps(all_data, indent=2, ensure_ascii=False)
+        bundle_format = st.radio("Bundle format", list(BUNDLE_FORMATS), horizontal=True, key="download_bundle_format")
+        kind, suffix, mime = BUNDLE_FORMATS[bundle_format]
+        signature = files_signature(files)
+
+        if _prepare_button("Prepare Combined Download", f"all_{kind}", signature):
+            with st.spinner("Building archive..."):
+                payload = _bundle_payload(kind, signature)
             st.download_button(
                 label="Download All Labeled Data",
-                data=combined_data,
-                file_name=combined_filename,
-                mime="application/json",
-                key="download_all"
+                data=payload,
+                file_name=f"{annotator_name}_all_labels{suffix}",
+                mime=mime,
+                key=f"download_all_{kind}"
             )
 
     # Instructions for submitting
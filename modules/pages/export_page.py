@@ -2,7 +2,14 @@
 
 import streamlit as st
 import os
+import time
+from datetime import datetime
 from modules.utils.data_exporter import DataExporter
+from modules.utils.annotation_timing import EVENTS_DIR, load_events, summarize_events
+from modules.utils.archive_utils import files_signature
+from modules.utils.dataset_catalog import data_dirs_from_env
+from modules.utils.default_bias import untouched_summary
+from modules.utils.export_jobs import submit_export, list_exports, resume_exports
 
 # Configure the page
 st.set_page_config(
@@ -13,14 +20,143 @@ st.set_page_config(
 
 # Set paths relative to script location
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-OUTPUT_DIR = os.path.join(SCRIPT_DIR, "labeled_data")
+OUTPUT_DIR = os.environ.get("LABELER_OUTPUT_DIR", os.path.join(SCRIPT_DIR, "labeled_data"))
+DATA_DIRS = data_dirs_from_env(os.path.join(SCRIPT_DIR, "..", "..", "data", "final_files"))
+
+# Joined export formats: label -> file format
+JOINED_FORMATS = {
+    "CSV": "csv",
+    "Parquet": "parquet",
+}
+
+# Names of the export jobs and mime types of their files
+EXPORT_LABELS = {"merge": "Merged JSON", "csv": "CSV", "joined": "Joined data"}
+MIME_TYPES = {
+    ".json": "application/json",
+    ".csv": "text/csv",
+    ".parquet": "application/vnd.apache.parquet",
+}
+
+# Seconds between refreshes of the job list while one of this session's exports runs
+POLL_SECONDS = 1
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _export_payload(file_path, signature):
+    """Read an exported file for its download button
+
+    The signature argument is only used as part of the cache key, so a file
+    is re-read only after it changes on disk.
+    """
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _timing_summary(output_dir, signature):
+    """Throughput per annotator, re-read only when an event log changes"""
+    return summarize_events(load_events(output_dir))
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _gold_accuracy(output_dir, signature):
+    """Gold post accuracy per annotator, re-scored only when a label file changes"""
+    return DataExporter(output_dir=output_dir).gold_accuracy(DATA_DIRS)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _default_bias(output_dir, signature):
+    """Preset answers left untouched per annotator, re-read only when a label file changes"""
+    return untouched_summary(DataExporter(output_dir=output_dir).touched_masks(DATA_DIRS))
+
+
+def _start_export(label, export, **options):
+    """Queue an export job and remember it in the session
+
+    Used as a button callback, so the job is queued before the page renders
+    and the notice appears above the export buttons.
+    """
+    task_id = submit_export(OUTPUT_DIR, export, **options)
+    st.session_state.setdefault("export_jobs", []).append(task_id)
+    st.session_state.export_notice = f"{label} started as export #{task_id}, see Export Jobs below."
+
+
+def _start_joined_export():
+    joined_format = st.session_state.joined_format
+    _start_export(f"Joined {joined_format} export", "joined",
+                  file_format=JOINED_FORMATS[joined_format], data_dirs=DATA_DIRS)
+
+
+def _start_custom_export():
+    export_format = st.session_state.custom_export_format
+    _start_export(f"{export_format} export", "merge" if export_format == "JSON" else "csv",
+                  output_filename=st.session_state.custom_filename or None)
+
+
+def _show_jobs(jobs, own_jobs):
+    """Show the export job history and the progress of this session's jobs
+
+    Returns:
+        bool: True if an export started in this session is still running
+    """
+    st.dataframe([
+        {
+            "Job": job["id"],
+            "Export": EXPORT_LABELS.get(job["payload"]["export"], job["payload"]["export"]),
+            "Status": job["status"],
+            "Progress": f"{job['progress']:.0%}",
+            "Started": datetime.fromtimestamp(job["created_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "File": os.path.basename((job["result"] or {}).get("path", "")),
+            "Error": (job["result"] or {}).get("error", ""),
+        }
+        for job in jobs
+    ])
+
+    running = [job for job in jobs if job["id"] in own_jobs and job["status"] in ("queued", "running")]
+    for job in running:
+        st.progress(job["progress"], text=f"Export #{job['id']} {job['status']}")
+    return bool(running)
+
+
+def export_jobs_section():
+    """Show the recent export jobs and the download of a finished one
+
+    While an export started in this session runs, the page reruns every
+    POLL_SECONDS to refresh the job list; each run returns right away, so
+    the script thread is never held for the length of an export. Queued
+    exports left behind by another app worker are started here.
+    """
+    jobs = list_exports(OUTPUT_DIR)
+    if not jobs:
+        return
+
+    if any(job["status"] in ("queued", "running") for job in jobs):
+        resume_exports(OUTPUT_DIR)
+
+    st.subheader("Export Jobs")
+    running = _show_jobs(jobs, set(st.session_state.get("export_jobs", [])))
+
+    finished = [job for job in jobs if job["status"] == "done" and os.path.exists(job["result"]["path"])]
+    if finished:
+        downloads = {f"#{job['id']} {os.path.basename(job['result']['path'])}": job for job in finished}
+        path = downloads[st.selectbox("Download a finished export", list(downloads))]["result"]["path"]
+        st.download_button(
+            label="Download Export",
+            data=_export_payload(path, files_signature([path])),
+            file_name=os.path.basename(path),
+            mime=MIME_TYPES.get(os.path.splitext(path)[1], "application/octet-stream")
+        )
+
+    if running:
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
 
 def main():
     st.title("Labeled Data Export Tool")
 
     # Initialize exporter
     exporter = DataExporter(output_dir=OUTPUT_DIR)
-    labeled_files = exporter.get_all_labeled_files()
+    labeled_files = exporter.list_labeled_files()
 
     st.write(f"Found {len(labeled_files)} labeled data files")
 
@@ -29,88 +165,98 @@ def main():
         st.subheader("Available Data Files")
 
         # Display file information
-        files_df = []
-        for file_path in labeled_files:
-            file_name = os.path.basename(file_path)
-            file_size = os.path.getsize(file_path) / 1024  # KB
-            file_modified = os.path.getmtime(file_path)
-
-            files_df.append({
+        st.dataframe([
+            {
                 "Filename": file_name,
-                "Size (KB)": f"{file_size:.2f}",
+                "Size (KB)": f"{file_size / 1024:.2f}",
                 "Last Modified": file_modified
-            })
-
-        st.dataframe(files_df)
+            }
+            for file_name, file_size, file_modified in labeled_files
+        ])
 
-        # Export options
+        # Export options; exports run in the background so the page stays usable
         st.subheader("Export Options")
 
+        if st.session_state.get("export_notice"):
+            st.success(st.session_state.pop("export_notice"))
+
         col1, col2 = st.columns(2)
 
         with col1:
-            if st.button("Merge All Files"):
-                merged_file = exporter.merge_all_files()
-                if merged_file:
-                    st.success(f"Files merged successfully: {os.path.basename(merged_file)}")
-
-                    # Provide download link
-                    with open(merged_file, 'r') as f:
-                        st.download_button(
-                            label="Download Merged JSON",
-                            data=f,
-                            file_name=os.path.basename(merged_file),
-                            mime="application/json"
-                        )
+            st.button("Merge All Files", on_click=_start_export, args=("Merge", "merge"))
 
         with col2:
-            if st.button("Export to CSV"):
-                csv_file = exporter.export_to_csv()
-                if csv_file:
-                    st.success(f"Data exported to CSV: {os.path.basename(csv_file)}")
-
-                    # Provide download link
-                    with open(csv_file, 'r') as f:
-                        st.download_button(
-                            label="Download CSV",
-                            data=f,
-                            file_name=os.path.basename(csv_file),
-                            mime="text/csv"
-                        )
+            st.button("Export to CSV", on_click=_start_export, args=("CSV export", "csv"))
+
+        # Labels joined with the questions they label
+        st.subheader("Export with Question Data")
+        st.write("One row per label with the question's tags, score, creation date, month and response lengths.")
+
+        st.radio("Joined export format", list(JOINED_FORMATS), horizontal=True, key="joined_format")
+        st.button("Export Joined Data", on_click=_start_joined_export)
 
         # Custom filename export
         st.subheader("Custom Export")
 
-        custom_filename = st.text_input("Custom filename (optional)")
-        export_format = st.radio("Export format", ["JSON", "CSV"])
-
-        if st.button("Export with Custom Filename"):
-            if export_format == "JSON":
-                custom_file = exporter.merge_all_files(custom_filename if custom_filename else None)
-                if custom_file:
-                    st.success(f"Data exported to JSON: {os.path.basename(custom_file)}")
-
-                    with open(custom_file, 'r') as f:
-                        st.download_button(
-                            label="Download Custom JSON",
-                            data=f,
-                            file_name=os.path.basename(custom_file),
-                            mime="application/json"
-                        )
-            else:
-                custom_file = exporter.export_to_csv(custom_filename if custom_filename else None)
-                if custom_file:
-                    st.success(f"Data exported to CSV: {os.path.basename(custom_file)}")
-
-                    with open(custom_file, 'r') as f:
-                        st.download_button(
-                            label="Download Custom CSV",
-                            data=f,
-                            file_name=os.path.basename(custom_file),
-                            mime="text/csv"
-                        )
+        st.text_input("Custom filename (optional)", key="custom_filename")
+        st.radio("Export format", ["JSON", "CSV"], key="custom_export_format")
+        st.button("Export with Custom Filename", on_click=_start_custom_export)
     else:
         st.warning("No labeled data files found. Please label some data first.")
 
+    # Time spent per post, from the annotators' timing events
+    events_dir = os.path.join(OUTPUT_DIR, EVENTS_DIR)
+    event_logs = [os.path.join(events_dir, name) for name in os.listdir(events_dir)] if os.path.isdir(events_dir) else []
+    timing = _timing_summary(OUTPUT_DIR, files_signature(event_logs))
+    if timing:
+        st.subheader("Annotator Throughput")
+        st.dataframe([
+            {
+                "Annotator": annotator,
+                "Posts submitted": stats["posts_submitted"],
+                "Hours": stats["hours"],
+                "Posts per hour": stats["posts_per_hour"],
+                "Median s per post": stats["seconds_per_post"].get("median_s"),
+                "P90 s per post": stats["seconds_per_post"].get("p90_s"),
+            }
+            for annotator, stats in timing.items()
+        ])
+
+    # Answers on the gold posts, the attention checks spread through the datasets
+    gold = _gold_accuracy(OUTPUT_DIR, tuple(labeled_files))
+    if gold:
+        st.subheader("Gold Post Accuracy")
+        st.dataframe([
+            {
+                "Annotator": annotator,
+                "Dataset": dataset,
+                "Gold posts": accuracy["posts"],
+                "All correct": accuracy["passed"],
+                "Correct answers": f"{accuracy['accuracy']:.0%}",
+            }
+            for (annotator, dataset), accuracy in gold.items()
+        ])
+
+    # Annotators who mostly kept the preset answers of the evaluation form
+    bias = _default_bias(OUTPUT_DIR, tuple(labeled_files))
+    if bias["annotators"]:
+        st.subheader("Untouched Preset Answers")
+        st.dataframe([
+            {
+                "Annotator": annotator,
+                "Evaluations": stats["evaluations"],
+                "Untouched answers": f"{stats['untouched_rate']:.0%}",
+                "All default": f"{stats['all_default_rate']:.0%}",
+                "Flagged": stats["flagged"],
+            }
+            for annotator, stats in bias["annotators"].items()
+        ])
+        if bias["posts"]:
+            st.write(f"{len(bias['posts'])} posts were mostly left at their preset answers")
+            st.dataframe(bias["posts"])
+
+    # Last, as it reruns the page while the exports of this session run
+    export_jobs_section()
+
 if __name__ == "__main__":
     main()
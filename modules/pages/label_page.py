@@ -2,14 +2,22 @@
 
 import streamlit as st
 import os
+import json
 from datetime import datetime
-from modules.utils.data_loader import DataLoader
-from modules.utils.file_utils import save_labeled_data, is_post_labeled
+from modules.utils.file_utils import save_labeled_data
+from modules.utils.storage import get_label_store
 from modules.components.session_state import ensure_post_evaluation
 from modules.components.display import display_question_details, display_evaluation_preview
 from modules.components.evaluation_form import model_evaluation_tabs
+from modules.components.comparison import comparison_interface
+from modules.components.keyboard_form import keyboard_interface
+from modules.components.label_history_view import display_label_history
+from modules.utils.perf import span
 from modules.components.image_extraction import image_text_extraction_section, are_evaluations_complete
 
+# Ways of laying out the model evaluations
+EVALUATION_LAYOUTS = ["One response at a time", "Side by side", "Keyboard"]
+
 
 def add_tab_navigation(tab_names, current_tab_index=0):
     """Add duplicate tab navigation at the bottom of each tab for easier access
@@ -42,182 +50,251 @@ def add_tab_navigation(tab_names, current_tab_index=0):
     st.info("⚠️ Note: These buttons serve as visual reminders of the tabs at the top. Please scroll to the top to switch tabs.")
 
 
-def labeling_interface(annotator_name, dataset_option, data_dir, output_dir):
-    """Handle the labeling interface
+def autosave_draft(post_id, annotator_name, dataset_option, output_dir):
+    """Save the unsubmitted evaluation of the current post to the label store
+
+    With the shared SQLite backend this lets an annotator continue on another
+    app worker; drafts are only written when they changed.
 
     Args:
+        post_id (str): ID of the post
         annotator_name (str): Name of the annotator
         dataset_option (str): Dataset being used
-        data_dir (str): Directory containing the data files
         output_dir (str): Directory for saving labeled data
     """
-    # Load dataset based on selection
-    loader = DataLoader(data_dir=data_dir)
-    dataset = loader.load_file(f"{dataset_option}.json")
+    store = get_label_store(output_dir)
+    if store.backend != "sqlite":
+        return
 
-    if not dataset:
-        st.warning(f"No data found or unable to load the data file: {data_dir}/{dataset_option}.json")
+    draft = json.dumps(st.session_state.current_evaluation, sort_keys=True, ensure_ascii=False)
+    if draft == st.session_state.saved_draft:
         return
 
-    # Get current question
-    current_question = dataset[st.session_state.current_index]
-    current_post_id = current_question.get("post_id")
+    store.save_draft(annotator_name, dataset_option, post_id, st.session_state.current_evaluation)
+    st.session_state.saved_draft = draft
 
-    # Check if this post has already been labeled
-    already_labeled = is_post_labeled(current_post_id, annotator_name, dataset_option, output_dir)
 
-    # Setup session state for this post
-    ensure_post_evaluation(current_post_id, dataset_option)
+def submit_evaluation(current_question, annotator_name, dataset_option, output_dir, dataset_size):
+    """Save the current evaluation and move on to the next question
 
-    # Display warning if already labeled
-    if already_labeled:
-        st.warning(f"⚠️ You have already labeled this question. Your new submission will overwrite the previous one.")
+    Used as the submit button's callback, so the next question is rendered
+    by the rerun the click already triggers instead of an extra one.
 
-    # Define tab names based on dataset
-    if dataset_option == "Faiz_FJ":
-        tab_names = ["Image Text Extraction", "GPT Evaluation", "Gemini Evaluation", "Llama Evaluation", "Submit All"]
-    else:  # FJ_only.json
-        tab_names = ["GPT Evaluation", "Gemini Evaluation", "Llama Evaluation", "Submit All"]
+    Args:
+        current_question (RenderBundle): Render bundle of the question
+        annotator_name (str): Name of the annotator
+        dataset_option (str): Dataset being used
+        output_dir (str): Directory for saving labeled data
+        dataset_size (int): Number of questions in the dataset
+    """
+    # Create submission object
+    evaluation_data = st.session_state.current_evaluation.copy()
+    evaluation_data.update({
+        "annotator": annotator_name,
+        "dataset": dataset_option,
+        "title": current_question.title,
+        "timestamp": datetime.now().isoformat(),
+    })
+    if current_question.gold:
+        evaluation_data["gold"] = True
 
-    # Create tabs for each section and a submit tab
-    tabs = st.tabs(tab_names)
+    # Save to file
+    saved_file = save_labeled_data(evaluation_data, annotator_name, dataset_option, output_dir)
+    st.session_state.label_cache.remember(evaluation_data, annotator_name, dataset_option, output_dir)
+    st.session_state.annotation_timer.submit(current_question.post_id, annotator_name, dataset_option, output_dir)
 
-    if dataset_option == "Faiz_FJ":
-        # Tab 1: Image Text Extraction
-        with tabs[0]:
-            display_question_details(current_question, current_post_id, show_image=True)
-            question_key = f"img_extraction_{st.session_state.current_index}_{st.session_state.question_key}"
-            image_text_extraction_section(current_question, current_post_id, question_key)
+    # Show success message on the next render
+    st.session_state.submit_message = f"All evaluations submitted successfully and saved to {saved_file}"
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 0)
+    # Clear current evaluation for this post
+    st.session_state.current_evaluation = {}
+    st.session_state.saved_draft = None
 
-        # Tab 2-4: Model Evaluations
-        with tabs[1]:
-            model_evaluation_tabs("GPT", current_question, f"gpt_{st.session_state.current_index}_{st.session_state.question_key}")
+    # Increment the question key to force form reset
+    st.session_state.question_key += 1
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 1)
+    # Move to next question if available
+    if st.session_state.current_index < dataset_size - 1:
+        st.session_state.previous_index = st.session_state.current_index
+        st.session_state.current_index += 1
 
-        with tabs[2]:
-            model_evaluation_tabs("Gemini", current_question, f"gemini_{st.session_state.current_index}_{st.session_state.question_key}")
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 2)
+def submit_section(current_question, annotator_name, dataset_option, output_dir, dataset, models, image_extraction=False):
+    """Display the evaluation preview and the submit button
 
-        with tabs[3]:
-            model_evaluation_tabs("Llama", current_question, f"llama_{st.session_state.current_index}_{st.session_state.question_key}")
+    Args:
+        current_question (RenderBundle): Render bundle of the question
+        annotator_name (str): Name of the annotator
+        dataset_option (str): Dataset being used
+        output_dir (str): Directory for saving labeled data
+        dataset (RenderBundles): Render bundles of the dataset
+        models (list): Names of the evaluated models
+        image_extraction (bool, optional): Whether the dataset asks for the image text extraction
+    """
+    st.header("Submit All Evaluations")
+    st.info("Review all your evaluations before submitting. Make sure you have completed all the sections.")
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 3)
+    # Display preview of all evaluations
+    display_evaluation_preview(models)
 
-        # Tab 5: Submit All
-        with tabs[4]:
-            st.header("Submit All Evaluations")
-            st.info("Review all your evaluations before submitting. Make sure you have completed all the sections.")
+    # Check if all sections are completed
+    all_complete = are_evaluations_complete(models, image_extraction)
 
-            # Display preview of all evaluations
-            display_evaluation_preview()
+    if not all_complete:
+        st.warning("⚠️ Please complete all evaluation sections before submitting.")
 
-            # Check if all sections are completed
-            all_complete = are_evaluations_complete(dataset_option)
+    # Submit button
+    st.button(
+        "Submit All Evaluations",
+        disabled=not all_complete,
+        on_click=submit_evaluation,
+        args=(current_question, annotator_name, dataset_option, output_dir, len(dataset))
+    )
 
-            if not all_complete:
-                st.warning("⚠️ Please complete all evaluation sections before submitting.")
 
-            # Submit button
-            if st.button("Submit All Evaluations", disabled=not all_complete):
-                # Create submission object
-                evaluation_data = st.session_state.current_evaluation.copy()
-                evaluation_data.update({
-                    "annotator": annotator_name,
-                    "dataset": dataset_option,
-                    "title": current_question.get("title"),
-                    "timestamp": datetime.now().isoformat(),
-                })
+def model_evaluation_section(current_question, models):
+    """Display the evaluation of the models
 
-                # Save to file
-                saved_file = save_labeled_data(evaluation_data, annotator_name, dataset_option, output_dir)
+    Responses are evaluated either one model at a time, or side by side
+    with the question shown once. Only the selected responses are rendered,
+    so the cost of a rerun stays the same however many models the dataset
+    contains.
 
-                # Show success message
-                st.success(f"All evaluations submitted successfully and saved to {saved_file}")
+    Args:
+        current_question (RenderBundle): Render bundle of the question
+        models (list): Names of the evaluated models
 
-                # Clear current evaluation for this post
-                st.session_state.current_evaluation = {}
+    Returns:
+        bool: True if the annotator submitted the post from the keyboard layout
+    """
+    layout = st.radio("Layout", EVALUATION_LAYOUTS, horizontal=True, key="evaluation_layout")
 
-                # Increment the question key to force form reset
-                st.session_state.question_key += 1
+    if layout == "Side by side":
+        question_key = f"cmp_{st.session_state.current_index}_{st.session_state.question_key}"
+        comparison_interface(current_question, models, question_key)
+        return False
 
-                # Move to next question if available
-                if st.session_state.current_index < len(dataset) - 1:
-                    st.session_state.previous_index = st.session_state.current_index
-                    st.session_state.current_index += 1
-                    st.rerun()
+    if layout == "Keyboard":
+        question_key = f"kbd_{st.session_state.current_index}_{st.session_state.question_key}"
+        return keyboard_interface(current_question, models, question_key)
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 4)
-    else:  # FJ_only.json
-        # Tab 1-3: Model Evaluations
-        with tabs[0]:
-            model_evaluation_tabs("GPT", current_question, f"gpt_{st.session_state.current_index}_{st.session_state.question_key}")
+    model_name = st.radio("Model to evaluate", models, horizontal=True, key="active_model")
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 0)
+    question_key = f"{model_name.lower()}_{st.session_state.current_index}_{st.session_state.question_key}"
+    model_evaluation_tabs(model_name, current_question, question_key)
+    return False
 
-        with tabs[1]:
-            model_evaluation_tabs("Gemini", current_question, f"gemini_{st.session_state.current_index}_{st.session_state.question_key}")
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 1)
+def labeling_interface(annotator_name, dataset_info, dataset, output_dir):
+    """Handle the labeling interface
 
-        with tabs[2]:
-            model_evaluation_tabs("Llama", current_question, f"llama_{st.session_state.current_index}_{st.session_state.question_key}")
+    Args:
+        annotator_name (str): Name of the annotator
+        dataset_info (DatasetInfo): Catalog entry of the dataset being used
+        dataset (RenderBundles or GoldInjectedBundles): The posts in navigation order
+        output_dir (str): Directory for saving labeled data
+    """
+    dataset_option = dataset_info.name
+    file_path = os.path.join(dataset_info.data_dir, dataset_info.filename)
 
-            # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 2)
+    # The navigation may have moved past the posts loaded so far
+    dataset.wait_for(st.session_state.current_index)
 
-        # Tab 4: Submit All
-        with tabs[3]:
-            st.header("Submit All Evaluations")
-            st.info("Review all your evaluations before submitting. Make sure you have completed all the sections.")
+    if dataset.error:
+        st.error(f"Unable to load all of {file_path}: {dataset.error}")
 
-            # Display preview of all evaluations
-            display_evaluation_preview()
+    if not dataset:
+        st.warning(f"No data found or unable to load the data file: {file_path}")
+        return
 
-            # Check if all sections are completed
-            all_complete = are_evaluations_complete(dataset_option)
+    # The dataset may have fewer posts than the index kept in the session
+    if st.session_state.current_index >= len(dataset):
+        st.session_state.current_index = len(dataset) - 1
+
+    # Records rejected by validation never reach the page
+    report = dataset.validation
+    if report is not None and report.rejected:
+        with st.expander(f"⚠️ {report.summary()}", expanded=False):
+            for error in report.errors:
+                st.write(error)
+
+    # Show the result of the last submission
+    if st.session_state.submit_message:
+        st.success(st.session_state.submit_message)
+        st.session_state.submit_message = None
+
+    # Models evaluated in this dataset, discovered from its response columns
+    models = list(dataset.models)
+    if not models:
+        st.warning(f"No model responses to evaluate in {file_path}")
+        return
 
-            if not all_complete:
-                st.warning("⚠️ Please complete all evaluation sections before submitting.")
+    # Get current question
+    current_question = dataset[st.session_state.current_index]
+    current_post_id = current_question.post_id
 
-            # Submit button
-            if st.button("Submit All Evaluations", disabled=not all_complete):
-                # Create submission object
-                evaluation_data = st.session_state.current_evaluation.copy()
-                evaluation_data.update({
-                    "annotator": annotator_name,
-                    "dataset": dataset_option,
-                    "title": current_question.get("title"),
-                    "timestamp": datetime.now().isoformat(),
-                })
+    # Start preparing the neighboring posts while this one renders
+    st.session_state.prefetcher.schedule(dataset, st.session_state.current_index)
 
-                # Save to file
-                saved_file = save_labeled_data(evaluation_data, annotator_name, dataset_option, output_dir)
+    # Check if this post has already been labeled
+    saved_label = st.session_state.label_cache.get(current_post_id, annotator_name, dataset_option, output_dir)
+    already_labeled = saved_label is not None
 
-                # Show success message
-                st.success(f"All evaluations submitted successfully and saved to {saved_file}")
+    # Setup session state for this post, resuming an autosaved draft or
+    # prefilling the saved answers
+    initial = None
+    if current_post_id not in st.session_state.post_evaluations:
+        initial = get_label_store(output_dir).load_draft(annotator_name, dataset_option, current_post_id) or saved_label
+    ensure_post_evaluation(current_post_id, models, initial, dataset_info.image_extraction)
 
-                # Clear current evaluation for this post
-                st.session_state.current_evaluation = {}
+    # Display warning if already labeled
+    if already_labeled:
+        st.warning(f"⚠️ You have already labeled this question. Your saved answers are filled in and a new submission will overwrite them.")
+        display_label_history(current_post_id, annotator_name, dataset_option, output_dir)
 
-                # Increment the question key to force form reset
-                st.session_state.question_key += 1
+    # Define tab names based on dataset
+    has_image_extraction = dataset_info.image_extraction
+    tab_names = ["Model Evaluations", "Submit All"]
+    if has_image_extraction:
+        tab_names.insert(0, "Image Text Extraction")
 
-                # Move to next question if available
-                if st.session_state.current_index < len(dataset) - 1:
-                    st.session_state.previous_index = st.session_state.current_index
-                    st.session_state.current_index += 1
-                    st.rerun()
+    # Create tabs for each section and a submit tab
+    tabs = st.tabs(tab_names)
+    tab_index = 0
+
+    if has_image_extraction:
+        # Image Text Extraction
+        with tabs[tab_index], span("label_page.tab.image_extraction"):
+            display_question_details(current_question, show_image=True)
+            question_key = f"img_extraction_{st.session_state.current_index}_{st.session_state.question_key}"
+            image_text_extraction_section(current_question, current_post_id, question_key)
 
             # Add tab navigation at bottom with correct tab index
-            add_tab_navigation(tab_names, 3)
+            add_tab_navigation(tab_names, tab_index)
+        tab_index += 1
+
+    # Model Evaluations
+    with tabs[tab_index], span("label_page.tab.model_evaluations"):
+        submit_requested = model_evaluation_section(current_question, models)
+        if submit_requested:
+            if are_evaluations_complete(models, has_image_extraction):
+                submit_evaluation(current_question, annotator_name, dataset_option, output_dir, len(dataset))
+                st.rerun()
+            else:
+                st.warning("⚠️ Please complete all evaluation sections before submitting.")
+
+        # Add tab navigation at bottom with correct tab index
+        add_tab_navigation(tab_names, tab_index)
+    tab_index += 1
+
+    # Submit All
+    with tabs[tab_index], span("label_page.tab.submit"):
+        submit_section(current_question, annotator_name, dataset_option, output_dir, dataset, models, has_image_extraction)
+
+        # Add tab navigation at bottom with correct tab index
+        add_tab_navigation(tab_names, tab_index)
+
+    autosave_draft(current_post_id, annotator_name, dataset_option, output_dir)
+    st.session_state.annotation_timer.observe(
+        current_post_id, st.session_state.current_evaluation, annotator_name, dataset_option, output_dir
+    )
@@ -0,0 +1,313 @@
+# modules/utils/annotation_timing.py
+#
+# Records how long annotators spend on each post and on each of its
+# sections, and summarizes it into per-annotator throughput figures.
+#
+# Every session buffers its events in memory and appends them in batches to
+# <output dir>/events/<annotator>_events.jsonl. Events are:
+#   open     the annotator opened a post
+#   section  a section (one model evaluation or the image text extraction)
+#            was changed: first and last change time and number of changes,
+#            written when the annotator leaves or submits the post, or the
+#            session ends
+#   submit   the post was submitted
+#
+# Usage:
+#   python -m modules.utils.annotation_timing --output-dir labeled_data
+#   python -m modules.utils.annotation_timing --output-dir labeled_data --json timing.json
+
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+import numpy as np
+from modules.utils.atomic_file import file_lock
+
+# Event logs live in this subdirectory of the output directory
+EVENTS_DIR = "events"
+
+# Buffered events are written once there are this many, or once the oldest
+# is this many seconds old
+FLUSH_EVENTS = int(os.environ.get("LABELER_EVENT_FLUSH", "50"))
+FLUSH_SECONDS = 60
+
+# Longest time counted for one visit of a post; longer gaps are breaks
+MAX_VISIT_SECONDS = 30 * 60
+
+# Keys of a post evaluation that are timed as sections
+SECTION_SUFFIX = "_evaluation"
+EXTRA_SECTIONS = ("related_text",)
+
+
+def events_file_path(output_dir, annotator_name):
+    """Path of the append-only event log of an annotator"""
+    return os.path.join(output_dir, EVENTS_DIR, f"{annotator_name}_events.jsonl")
+
+
+def _is_section(key):
+    return key.endswith(SECTION_SUFFIX) or key in EXTRA_SECTIONS
+
+
+class _SessionEvents:
+    """Buffered events of one session
+
+    Kept apart from the session's AnnotationTimer, so the events can still
+    be written once the timer is gone with its session.
+    """
+
+    def __init__(self):
+        self.session = uuid.uuid4().hex[:12]
+        self.lock = threading.Lock()
+        self.events = []
+        self.oldest = None
+        self.post = None
+        self.touches = {}
+
+    def emit(self, now, event, **fields):
+        output_dir, annotator_name, dataset_option, post_id = self.post
+        if self.oldest is None:
+            self.oldest = now
+        self.events.append((output_dir, annotator_name, {
+            "t": round(now, 3),
+            "event": event,
+            "session": self.session,
+            "annotator": annotator_name,
+            "dataset": dataset_option,
+            "post_id": post_id,
+            **fields,
+        }))
+
+    def close_post(self, now):
+        """Write the section timings of the post being left"""
+        if self.post is None:
+            return
+        for section, (first, last, changes) in self.touches.items():
+            self.emit(now, "section", section=section, first=round(first, 3), last=round(last, 3), changes=changes)
+        self.touches = {}
+
+    def flush(self):
+        """Append the buffered events to the annotators' event logs"""
+        with self.lock:
+            events, self.events, self.oldest = self.events, [], None
+        if not events:
+            return
+
+        by_path = {}
+        for output_dir, annotator_name, event in events:
+            by_path.setdefault(events_file_path(output_dir, annotator_name), []).append(event)
+
+        for path, path_events in by_path.items():
+            lines = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in path_events)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with file_lock(path), open(path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            except OSError as e:
+                print(f"Error writing annotation events to {path}: {str(e)}")
+
+    def finish(self):
+        """Close the open post and write everything, when the session ends or the process exits"""
+        with self.lock:
+            self.close_post(time.time())
+            self.post = None
+        self.flush()
+
+
+class AnnotationTimer:
+    """Timing events of one session
+
+    observe() is called once per rerun with the current evaluation and
+    compares each section with the previous rerun, so widgets need no
+    callbacks and an interaction costs a dict comparison. When the session
+    ends and the timer is collected, or the process exits, the open post is
+    closed and the buffered events are written.
+    """
+
+    def __init__(self):
+        self._events = _SessionEvents()
+        self._snapshot = {}
+        weakref.finalize(self, self._events.finish)
+
+    @property
+    def session(self):
+        return self._events.session
+
+    def observe(self, post_id, evaluation, annotator_name, dataset_option, output_dir):
+        """Record the state of the current post after a rerun
+
+        Args:
+            post_id: ID of the post being shown
+            evaluation (dict): The post's current evaluation
+            annotator_name (str): Name of the annotator
+            dataset_option (str): Dataset being used
+            output_dir (str): Directory for saving labeled data
+        """
+        now = time.time()
+        post = (output_dir, annotator_name, dataset_option, post_id)
+        events = self._events
+        with events.lock:
+            if post != events.post:
+                events.close_post(now)
+                events.post = post
+                self._snapshot = {key: copy.deepcopy(value) for key, value in evaluation.items() if _is_section(key)}
+                events.emit(now, "open")
+            else:
+                for key, value in evaluation.items():
+                    if not _is_section(key) or self._snapshot.get(key) == value:
+                        continue
+                    self._snapshot[key] = copy.deepcopy(value)
+                    touch = events.touches.get(key)
+                    if touch is None:
+                        events.touches[key] = [now, now, 1]
+                    else:
+                        touch[1] = now
+                        touch[2] += 1
+
+            due = len(events.events) >= FLUSH_EVENTS or (events.oldest is not None and now - events.oldest >= FLUSH_SECONDS)
+        if due:
+            self.flush()
+
+    def submit(self, post_id, annotator_name, dataset_option, output_dir):
+        """Record the submission of a post and write the buffered events"""
+        now = time.time()
+        events = self._events
+        with events.lock:
+            if events.post != (output_dir, annotator_name, dataset_option, post_id):
+                events.close_post(now)
+                events.post = (output_dir, annotator_name, dataset_option, post_id)
+            events.close_post(now)
+            events.emit(now, "submit")
+            # The next render opens a post, even if it is the same one
+            events.post = None
+        self.flush()
+
+    def flush(self):
+        """Append the buffered events to the annotators' event logs"""
+        self._events.flush()
+
+
+def load_events(output_dir):
+    """Read the event logs of every annotator
+
+    Returns:
+        list: The events, in no particular order
+    """
+    events_dir = os.path.join(output_dir, EVENTS_DIR)
+    if not os.path.isdir(events_dir):
+        return []
+
+    events = []
+    for filename in sorted(os.listdir(events_dir)):
+        if not filename.endswith("_events.jsonl"):
+            continue
+        with open(os.path.join(events_dir, filename), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # A line still being written
+    return events
+
+
+def _distribution(seconds):
+    values = np.asarray(seconds, dtype=np.float64)
+    if not len(values):
+        return {"count": 0}
+    median, p90 = np.percentile(values, [50, 90])
+    return {
+        "count": int(len(values)),
+        "mean_s": round(float(values.mean()), 1),
+        "median_s": round(float(median), 1),
+        "p90_s": round(float(p90), 1),
+    }
+
+
+def summarize_events(events, max_visit_seconds=MAX_VISIT_SECONDS):
+    """Time distributions per annotator and per section
+
+    A visit of a post lasts from its open event to the next open or
+    submit of the same session, or to the session's last event for the
+    post, capped at max_visit_seconds. The time spent on a post is the sum
+    of its visits; a section's time is the span from its first to its last
+    change in one visit.
+
+    Args:
+        events (list): Events from load_events
+        max_visit_seconds (float, optional): Cap on one visit. Defaults to MAX_VISIT_SECONDS.
+
+    Returns:
+        dict: annotator -> summary with the submitted posts, hours worked,
+            posts per hour, seconds per submitted post and per section
+    """
+    sessions = {}
+    for event in events:
+        sessions.setdefault(event.get("session"), []).append(event)
+
+    post_seconds = {}
+    submitted = set()
+    section_seconds = {}
+    for session_events in sessions.values():
+        session_events.sort(key=lambda event: event["t"])
+        visit = None
+        for event in session_events:
+            post = (event["annotator"], event["dataset"], event["post_id"])
+            kind = event["event"]
+            if kind == "section":
+                section_seconds.setdefault((event["annotator"], event["section"]), []).append(event["last"] - event["first"])
+
+            if visit is not None and (kind in ("open", "submit") or post != visit[0]):
+                post_seconds[visit[0]] = post_seconds.get(visit[0], 0) + min(event["t"] - visit[1], max_visit_seconds)
+                visit = None
+            elif visit is not None:
+                visit[2] = event["t"]
+
+            if kind == "open":
+                visit = [post, event["t"], event["t"]]
+            elif kind == "submit":
+                submitted.add(post)
+
+        if visit is not None:
+            post_seconds[visit[0]] = post_seconds.get(visit[0], 0) + min(visit[2] - visit[1], max_visit_seconds)
+
+    summary = {}
+    for annotator in sorted({post[0] for post in post_seconds} | {key[0] for key in section_seconds}):
+        worked = sum(seconds for post, seconds in post_seconds.items() if post[0] == annotator)
+        done = [post_seconds.get(post, 0) for post in submitted if post[0] == annotator]
+        summary[annotator] = {
+            "posts_submitted": len(done),
+            "hours": round(worked / 3600, 2),
+            "posts_per_hour": round(len(done) / (worked / 3600), 1) if worked else None,
+            "seconds_per_post": _distribution(done),
+            "sections": {
+                section: _distribution(seconds)
+                for (name, section), seconds in sorted(section_seconds.items()) if name == annotator
+            },
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the annotators' timing events")
+    parser.add_argument("--output-dir", default="labeled_data", help="directory with the labeled data")
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    summary = summarize_events(load_events(args.output_dir))
+    for annotator, stats in summary.items():
+        per_post = stats["seconds_per_post"]
+        print(f"{annotator}: {stats['posts_submitted']} posts in {stats['hours']} h "
+              f"({stats['posts_per_hour']} posts/h), median {per_post.get('median_s')} s per post")
+        for section, section_stats in stats["sections"].items():
+            print(f"    {section}: median {section_stats['median_s']} s over {section_stats['count']} visits")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
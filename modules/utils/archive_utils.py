@@ -0,0 +1,125 @@
+# modules/utils/archive_utils.py
+
+import gzip
+import io
+import json
+import os
+import shutil
+import zipfile
+
+# Size of the chunks copied from disk into the compressed buffers
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def files_signature(file_paths):
+    """Build a cache signature for a set of files
+
+    The signature changes whenever one of the files is added, removed,
+    rewritten or resized, so it can be used as a cache key for archives
+    built from those files.
+
+    Args:
+        file_paths (list): Paths of the files
+
+    Returns:
+        tuple: (path, mtime_ns, size) triples sorted by path
+    """
+    signature = []
+    for file_path in sorted(file_paths):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def iter_label_records(file_paths):
+    """Yield labeled records one at a time from a list of label files
+
+    Only one file is parsed at a time, so memory use is bounded by the
+    largest single file rather than the whole set.
+
+    Args:
+        file_paths (list): Paths of the label files
+
+    Yields:
+        dict: Each labeled record
+    """
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            continue
+
+        # Handle both single items and lists of items
+        if isinstance(data, list):
+            yield from data
+        else:
+            yield data
+
+
+def gzip_file(file_path):
+    """Compress a single file with gzip
+
+    Args:
+        file_path (str): Path of the file to compress
+
+    Returns:
+        bytes: The gzip-compressed file content
+    """
+    buffer = io.BytesIO()
+    with open(file_path, 'rb') as src, gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+    return buffer.getvalue()
+
+
+def zip_files(file_paths):
+    """Bundle several files into a deflate-compressed zip archive
+
+    Args:
+        file_paths (list): Paths of the files to bundle
+
+    Returns:
+        bytes: The zip archive content
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for file_path in file_paths:
+            archive.write(file_path, arcname=os.path.basename(file_path))
+    return buffer.getvalue()
+
+
+def gzip_combined_records(file_paths, jsonl=False):
+    """Combine the records of several label files into one gzip-compressed document
+
+    Records are serialized and compressed one at a time instead of building
+    a single pretty-printed string for the whole set.
+
+    Args:
+        file_paths (list): Paths of the label files
+        jsonl (bool, optional): Write one record per line instead of a JSON array.
+            Defaults to False.
+
+    Returns:
+        bytes: The gzip-compressed JSON or JSONL document
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gz:
+        writer = io.TextIOWrapper(gz, encoding='utf-8')
+        if jsonl:
+            for record in iter_label_records(file_paths):
+                writer.write(json.dumps(record, ensure_ascii=False))
+                writer.write("\n")
+        else:
+            writer.write("[")
+            for i, record in enumerate(iter_label_records(file_paths)):
+                if i:
+                    writer.write(",\n")
+                writer.write(json.dumps(record, ensure_ascii=False))
+            writer.write("]\n")
+        writer.flush()
+        writer.detach()
+    return buffer.getvalue()
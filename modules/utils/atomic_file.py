@@ -0,0 +1,173 @@
+# modules/utils/atomic_file.py
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+# Number of previous versions kept next to each label file (<file>.bak.1 is the newest)
+LABEL_BACKUPS = int(os.environ.get("LABELER_LABEL_BACKUPS", "3"))
+
+# Permissions of new files, as open() would create them; read once, since
+# os.umask can only be read by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+# In-process locks per file; flock() serializes between processes
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.Lock()
+        return lock
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock for a file
+
+    The lock is taken on a separate <path>.lock file, so it survives the
+    file itself being replaced by a rename. Locks are per file, so writers
+    of different label files never wait for each other.
+
+    Args:
+        path (str): Path of the file to lock
+    """
+    path = os.path.abspath(path)
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+
+        with open(f"{path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def backup_paths(path, backups=LABEL_BACKUPS):
+    """Paths of the rolling backups of a file, newest first"""
+    return [f"{path}.bak.{i}" for i in range(1, backups + 1)]
+
+
+def _rotate_backups(path, backups):
+    """Shift the backups by one and keep the current file as the newest
+
+    The current version is hard-linked rather than copied, so keeping a
+    backup costs a few metadata operations whatever the file size.
+    """
+    if backups <= 0 or not os.path.exists(path):
+        return
+
+    paths = backup_paths(path, backups)
+    for older, newer in zip(reversed(paths), reversed(paths[:-1])):
+        if os.path.exists(newer):
+            os.replace(newer, older)
+
+    try:
+        if os.path.exists(paths[0]):
+            os.remove(paths[0])
+        os.link(path, paths[0])
+    except OSError:
+        # File systems without hard links
+        with open(path, 'rb') as src, open(paths[0], 'wb') as dst:
+            dst.write(src.read())
+
+
+def _file_mode(path):
+    """Permissions for a replaced file: those of the file it replaces, else the default"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return NEW_FILE_MODE
+
+
+def _fsync_dir(directory):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, write, mode='w', backups=0):
+    """Replace a file atomically
+
+    The content is written to a temporary file in the same directory,
+    flushed to disk and renamed over the target, so readers see either the
+    old or the new file and a crash never leaves a truncated one. The file
+    keeps the permissions of the one it replaces (mkstemp creates owner-only
+    files), and new files get the umask's defaults. The caller
+    is expected to hold file_lock(path) when several writers may race.
+
+    Args:
+        path (str): Path of the file to write
+        write (callable): Called with the open temporary file to write the content
+        mode (str, optional): 'w' for text or 'wb' for bytes. Defaults to 'w'.
+        backups (int, optional): Number of previous versions to keep. Defaults to 0.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, **({} if 'b' in mode else {"encoding": "utf-8", "newline": ""})) as f:
+            write(f)
+            f.flush()
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), _file_mode(path))
+            os.fsync(f.fileno())
+        _rotate_backups(path, backups)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+def atomic_write_json(path, data, backups=0, **dump_kwargs):
+    """Write JSON data to a file atomically
+
+    Args:
+        path (str): Path of the file to write
+        data: JSON-serializable data
+        backups (int, optional): Number of previous versions to keep. Defaults to 0.
+        **dump_kwargs: Passed to json.dump, defaults to indent=2 and ensure_ascii=False
+    """
+    dump_kwargs.setdefault("indent", 2)
+    dump_kwargs.setdefault("ensure_ascii", False)
+    atomic_write(path, lambda f: json.dump(data, f, **dump_kwargs), backups=backups)
+
+
+def read_json_with_backups(path, backups=LABEL_BACKUPS):
+    """Read a JSON file, falling back to its newest readable backup
+
+    Args:
+        path (str): Path of the file to read
+
+    Returns:
+        tuple: (data, path it was read from), or (None, None) if nothing could be read
+    """
+    for candidate in [path] + backup_paths(path, backups):
+        if not os.path.exists(candidate):
+            continue
+        try:
+            with open(candidate, 'r', encoding='utf-8') as f:
+                return json.load(f), candidate
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError):
+            continue
+    return None, None
@@ -1,9 +1,38 @@
 # ./modules/utils/data_exporter.py
 
+import csv
 import json
 import os
-import pandas as pd
+import threading
 from datetime import datetime
+from modules.utils.data_loader import DataLoader
+from modules.utils.dataset_catalog import load_catalog
+from modules.utils.default_bias import collect_masks
+from modules.utils.gold import GoldScores, load_gold_set
+from modules.utils.render_bundle import _parse_literal
+from modules.utils.rubric import EVALUATION_RUBRIC
+from modules.utils.storage import get_label_store
+from modules.utils.atomic_file import file_lock, atomic_write, atomic_write_json
+from modules.utils.schema import LABEL_SCHEMA, ValidationReport, filter_valid
+
+# Suffix of the per-model evaluation keys in a labeled item
+EVALUATION_SUFFIX = "_evaluation"
+
+# Suffix of the per-annotator label files (see storage.label_file_path)
+LABEL_FILE_SUFFIX = "_labels.json"
+
+# Dataset record fields added to each label by export_joined
+JOINED_DATASET_COLUMNS = ("tags", "score", "creation_date", "month")
+
+# File listings per output directory, as (directory mtime, listing)
+_listings = {}
+_listings_lock = threading.Lock()
+
+
+def _report(progress, fraction):
+    """Pass the completed fraction of an export to its progress callback, if any"""
+    if progress is not None:
+        progress(fraction)
 
 class DataExporter:
     """Utility class for exporting labeled data to various formats"""
@@ -27,15 +56,106 @@ class DataExporter:
         if not os.path.exists(self.output_dir):
             return []
 
+        # Write the label files from the shared database when one is used
+        get_label_store(self.output_dir).materialize()
+
         return [os.path.join(self.output_dir, f) for f in os.listdir(self.output_dir)
                 if f.endswith('.json')]
 
-    def merge_all_files(self, output_filename=None):
+    def list_labeled_files(self):
+        """Get the name, size and modification time of every labeled data file
+
+        Files are only ever created, replaced or removed (see atomic_file),
+        which updates the directory's modification time, so the listing is
+        cached per directory until that time changes. With SQLite storage the
+        label files are first brought up to date with the database, which
+        rewrites only the files with new labels.
+
+        Returns:
+            list: (file name, size in bytes, modification time) per file, by name
+        """
+        get_label_store(self.output_dir).materialize()
+        try:
+            mtime = os.stat(self.output_dir).st_mtime_ns
+        except OSError:
+            return []
+
+        cached = _listings.get(self.output_dir)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with _listings_lock:
+            listing = []
+            for entry in os.scandir(self.output_dir):
+                if entry.name.endswith('.json') and entry.is_file():
+                    stat = entry.stat()
+                    listing.append((entry.name, stat.st_size, stat.st_mtime))
+            listing.sort()
+            _listings[self.output_dir] = (mtime, listing)
+        return listing
+
+    @staticmethod
+    def _read_labels(file_path):
+        """Read the valid labels of one file
+
+        Args:
+            file_path (str): Path of the label file
+
+        Returns:
+            list: The labels matching the label schema
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                file_data = json.load(f)
+
+            # Handle both single items and lists of items
+            if not isinstance(file_data, list):
+                file_data = [file_data]
+
+            # Labels that do not match the label schema are left out
+            report = ValidationReport(os.path.basename(file_path))
+            labels = list(filter_valid(file_data, LABEL_SCHEMA, report))
+            if report.rejected:
+                print(report.summary())
+                for error in report.errors:
+                    print(f"  {error}")
+            return labels
+        except Exception as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            return []
+
+    @staticmethod
+    def _flatten_label(item):
+        """Flatten a label into one export row"""
+        flat_item = {
+            'post_id': item.get('post_id'),
+            'title': item.get('title'),
+            'annotator': item.get('annotator'),
+            'timestamp': item.get('timestamp'),
+            'related_text': item.get('related_text', item.get('part1', {}).get('related_text', ''))
+        }
+
+        # Flatten each model evaluation with the compiled rubric
+        for key, value in item.items():
+            if key.endswith(EVALUATION_SUFFIX) and isinstance(value, dict):
+                EVALUATION_RUBRIC.flatten(value, key[:-len(EVALUATION_SUFFIX)], flat_item)
+
+        # Add part2 questions (older label format)
+        part2 = item.get('part2', {})
+        for q_key, q_value in part2.items():
+            flat_item[q_key] = q_value
+
+        return flat_item
+
+    def merge_all_files(self, output_filename=None, progress=None, include_gold=False):
         """Merge all labeled data files into one
 
         Args:
             output_filename (str, optional): Name for the merged file.
                 If None, a timestamp-based name will be used.
+            progress (callable, optional): Called with the completed fraction
+                of the export. Defaults to None.
+            include_gold (bool, optional): Keep the labels of gold posts. Defaults to False.
 
         Returns:
             str: Path to the merged file
@@ -48,18 +168,9 @@ class DataExporter:
 
         all_data = []
 
-        for file_path in all_files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    file_data = json.load(f)
-
-                    # Handle both single items and lists of items
-                    if isinstance(file_data, list):
-                        all_data.extend(file_data)
-                    else:
-                        all_data.append(file_data)
-            except Exception as e:
-                print(f"Error reading file {file_path}: {str(e)}")
+        for done, file_path in enumerate(all_files, 1):
+            all_data.extend(item for item in self._read_labels(file_path) if include_gold or not item.get('gold'))
+            _report(progress, 0.9 * done / len(all_files))
 
         # Create output filename with timestamp if not provided
         if output_filename is None:
@@ -69,24 +180,28 @@ class DataExporter:
         output_path = os.path.join(self.output_dir, output_filename)
 
         # Save merged data
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(all_data, f, indent=2)
+        with file_lock(output_path):
+            atomic_write_json(output_path, all_data, ensure_ascii=True)
 
         print(f"Merged {len(all_data)} labeled items into {output_path}")
         return output_path
 
-    def export_to_csv(self, output_filename=None):
+    def export_to_csv(self, output_filename=None, progress=None, include_gold=False):
         """Export labeled data to CSV format
 
         Args:
             output_filename (str, optional): Name for the CSV file.
                 If None, a timestamp-based name will be used.
+            progress (callable, optional): Called with the completed fraction
+                of the export. Defaults to None.
+            include_gold (bool, optional): Keep the labels of gold posts. Defaults to False.
 
         Returns:
             str: Path to the CSV file
         """
         # First merge all data
-        merged_file = self.merge_all_files()
+        merged_file = self.merge_all_files(
+            progress=None if progress is None else lambda fraction: progress(0.7 * fraction), include_gold=include_gold)
 
         if not merged_file:
             return None
@@ -96,25 +211,11 @@ class DataExporter:
             all_data = json.load(f)
 
         # Flatten the nested structure for CSV
-        flattened_data = []
-
-        for item in all_data:
-            flat_item = {
-                'post_id': item.get('post_id'),
-                'title': item.get('title'),
-                'annotator': item.get('annotator'),
-                'timestamp': item.get('timestamp'),
-                'related_text': item.get('part1', {}).get('related_text', '')
-            }
-
-            # Add part2 questions
-            part2 = item.get('part2', {})
-            for q_key, q_value in part2.items():
-                flat_item[q_key] = q_value
+        flattened_data = [self._flatten_label(item) for item in all_data]
+        _report(progress, 0.8)
 
-            flattened_data.append(flat_item)
-
-        # Create DataFrame
+        # Create DataFrame (pandas is only loaded when exporting)
+        import pandas as pd
         df = pd.DataFrame(flattened_data)
 
         # Create output filename with timestamp if not provided
@@ -125,11 +226,211 @@ class DataExporter:
         output_path = os.path.join(self.output_dir, output_filename)
 
         # Save to CSV
-        df.to_csv(output_path, index=False, encoding='utf-8')
+        with file_lock(output_path):
+            atomic_write(output_path, lambda f: df.to_csv(f, index=False))
 
         print(f"Exported data to CSV: {output_path}")
         return output_path
 
+    @staticmethod
+    def _label_dataset(item, file_path, datasets):
+        """Dataset of a label, from the label or else from its file name"""
+        if item.get('dataset'):
+            return item['dataset']
+        stem = os.path.basename(file_path)[:-len(LABEL_FILE_SUFFIX)]
+        # Dataset names may contain underscores, so the longest match wins
+        matches = [name for name in datasets if stem.endswith(f"_{name}")]
+        return max(matches, key=len) if matches else None
+
+    def _joined_rows(self, data_dirs, columns, progress=None, include_gold=False):
+        """Labels joined with the dataset records they label
+
+        The labels form the build side of a hash join keyed by (dataset,
+        post_id); each dataset file is then streamed once as the probe
+        side, so the records are never all in memory. Labels whose post is
+        not found keep empty dataset columns.
+
+        Args:
+            data_dirs (list): Directories containing the dataset files
+            columns (list): Filled with the export columns, in order
+            progress (callable, optional): Called with the completed fraction
+                of the join. Defaults to None.
+            include_gold (bool, optional): Keep the labels of gold posts, which
+                have no dataset record. Defaults to False.
+
+        Returns:
+            generator: Export rows, in dataset file order, or None if there are no labels
+        """
+        # Exports run in the background, so they wait for datasets still being scanned
+        datasets = {info.name: info for info in load_catalog(data_dirs, wait=True)}
+
+        # Build side: flattened labels by (dataset, post_id)
+        index = {}
+        label_columns = {}
+        response_fields = {}
+        # Merged exports live in the same directory
+        label_files = [path for path in self.get_all_labeled_files() if path.endswith(LABEL_FILE_SUFFIX)]
+        for done, file_path in enumerate(label_files):
+            _report(progress, 0.3 * done / len(label_files))
+            for item in self._read_labels(file_path):
+                if item.get('gold') and not include_gold:
+                    continue
+                dataset = self._label_dataset(item, file_path, datasets)
+                row = self._flatten_label(item)
+                row['dataset'] = dataset
+                label_columns.update(dict.fromkeys(row))
+                for key in item:
+                    if key.endswith(EVALUATION_SUFFIX):
+                        prefix = key[:-len(EVALUATION_SUFFIX)]
+                        response_fields[f"{prefix}_response_chars"] = f"{prefix}_response"
+                index.setdefault((dataset, item.get('post_id')), []).append(row)
+
+        if not index:
+            return None
+
+        columns.extend(label_columns)
+        columns.extend(column for column in JOINED_DATASET_COLUMNS if column not in label_columns)
+        columns.extend(response_fields)
+
+        def rows():
+            label_datasets = list(dict.fromkeys(key[0] for key in index))
+            for done, dataset in enumerate(label_datasets):
+                _report(progress, 0.3 + 0.6 * done / len(label_datasets))
+                info = datasets.get(dataset)
+                if info is None:
+                    continue
+                # Probe side: one pass over the dataset file
+                for record in DataLoader(data_dir=info.data_dir).iter_records(info.filename):
+                    matches = index.pop((dataset, record['post_id']), None)
+                    if not matches:
+                        continue
+                    joined = {column: record.get(column) for column in JOINED_DATASET_COLUMNS}
+                    tags = _parse_literal(joined.get('tags'))
+                    if isinstance(tags, list):
+                        joined['tags'] = "; ".join(str(tag) for tag in tags)
+                    for column, field in response_fields.items():
+                        joined[column] = len(record.get(field) or "")
+                    for row in matches:
+                        yield {**joined, **row}
+
+            # Labels of posts missing from their dataset
+            for matches in index.values():
+                yield from matches
+
+        return rows()
+
+    def export_joined(self, data_dirs, output_filename=None, file_format="csv", progress=None, include_gold=False):
+        """Export labels joined with the dataset records they label
+
+        Each row is one label with the post's tags, score, creation date,
+        month and the length of every evaluated response, so the export can
+        be analyzed without the source files. See _joined_rows for how the
+        join is done.
+
+        Args:
+            data_dirs (list): Directories containing the dataset files
+            output_filename (str, optional): Name for the file.
+                If None, a timestamp-based name will be used.
+            file_format (str, optional): "csv" or "parquet". Defaults to "csv".
+            progress (callable, optional): Called with the completed fraction
+                of the export. Defaults to None.
+            include_gold (bool, optional): Keep the labels of gold posts. Defaults to False.
+
+        Returns:
+            str: Path to the exported file, or None if there is nothing to export
+        """
+        columns = []
+        rows = self._joined_rows(data_dirs, columns, progress, include_gold)
+        if rows is None:
+            print("No labeled data files found.")
+            return None
+
+        if output_filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_filename = f"labeled_data_joined_{timestamp}.{file_format}"
+
+        output_path = os.path.join(self.output_dir, output_filename)
+
+        if file_format == "parquet":
+            # pyarrow is optional and only loaded for Parquet exports
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                print("Parquet export requires pyarrow (pip install pyarrow)")
+                return None
+            # Rows differ in shape (older labels, unmatched posts), so every
+            # one is given all columns; gold ids are strings, so post ids are too
+            table = pa.Table.from_pylist([
+                {column: str(row[column]) if column == 'post_id' and row.get(column) is not None else row.get(column)
+                 for column in columns}
+                for row in rows
+            ])
+            with file_lock(output_path):
+                atomic_write(output_path, lambda f: pq.write_table(table, f), mode='wb')
+        else:
+            def write_csv(f):
+                writer = csv.DictWriter(f, fieldnames=columns, restval="", extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+
+            with file_lock(output_path):
+                atomic_write(output_path, write_csv)
+
+        print(f"Exported joined data to {file_format.upper()}: {output_path}")
+        return output_path
+
+    def gold_accuracy(self, data_dirs):
+        """Score every label of a gold post against its known answers
+
+        Args:
+            data_dirs (list): Directories containing the dataset files
+
+        Returns:
+            dict: (annotator, dataset) -> accuracy (see GoldScores.accuracy)
+        """
+        datasets = {info.name: info for info in load_catalog(data_dirs)}
+        scores = GoldScores()
+        for name, info in datasets.items():
+            scores.use(name, load_gold_set(info.gold_file) if info.gold_file else None)
+
+        for file_path in self.get_all_labeled_files():
+            if not file_path.endswith(LABEL_FILE_SUFFIX):
+                continue
+            for item in self._read_labels(file_path):
+                if not item.get('gold'):
+                    continue
+                dataset = self._label_dataset(item, file_path, datasets)
+                if dataset is not None and item.get('annotator'):
+                    scores.record(item, item['annotator'], dataset)
+        return scores.summary()
+
+    def touched_masks(self, data_dirs=None, include_gold=False):
+        """Touched-field bitmasks of every saved evaluation
+
+        Args:
+            data_dirs (list, optional): Directories containing the dataset files,
+                used to name the dataset of labels saved without one. Defaults to None.
+            include_gold (bool, optional): Keep the labels of gold posts. Defaults to False.
+
+        Returns:
+            TouchedMasks: The masks, see modules/utils/default_bias.py
+        """
+        datasets = [info.name for info in load_catalog(data_dirs)] if data_dirs else []
+
+        def labels():
+            for file_path in self.get_all_labeled_files():
+                if not file_path.endswith(LABEL_FILE_SUFFIX):
+                    continue
+                for item in self._read_labels(file_path):
+                    if item.get('gold') and not include_gold:
+                        continue
+                    dataset = self._label_dataset(item, file_path, datasets)
+                    if item.get('annotator'):
+                        yield item['annotator'], dataset or os.path.basename(file_path), item
+
+        return collect_masks(labels())
+
 # Example usage
 if __name__ == "__main__":
     exporter = DataExporter()
@@ -2,13 +2,28 @@
 
 import json
 import os
+import threading
+from modules.utils.perf import timed
+from modules.utils.json_stream import iter_json_array
+from modules.utils.render_bundle import RenderBundles, build_render_bundles
+from modules.utils.response_stats import load_response_stats
+from modules.utils.schema import DATASET_SCHEMA, ValidationReport
+
+# Records compiled per batch while a data file is streamed
+STREAM_BATCH_SIZE = 256
+
 
 class DataLoader:
     """Utility class for loading and preprocessing JSON data files"""
 
+    # Render bundles per data file path, as (mtime, bundles)
+    _bundle_cache = {}
+    _bundle_lock = threading.Lock()
+
     def __init__(self, data_dir="data/final_files"):
         self.data_dir = data_dir
 
+    @timed("data_loader.load_file")
     def load_file(self, filename):
         """Load a single JSON file
 
@@ -33,6 +48,110 @@ class DataLoader:
             print(f"Error loading file {file_path}: {str(e)}")
             return []
 
+    def get_render_bundles(self, filename, wait_for=0):
+        """Get the render bundles of a data file
+
+        The file is streamed, validated and compiled once per version in a
+        background thread and shared by every session of the process, so
+        reruns do not read or parse it again. The bundles are returned as
+        soon as the post at `wait_for` is compiled; later posts keep being
+        appended while the page renders, so the first question shows up
+        without waiting for a large file to load. Records that do not match
+        the dataset schema are left out and listed in the bundles'
+        validation report.
+
+        Args:
+            filename (str): Name of the data file
+            wait_for (int, optional): Index of the post needed now. Defaults to 0.
+
+        Returns:
+            RenderBundles: The bundles of the file, empty if it cannot be loaded
+        """
+        file_path = os.path.join(self.data_dir, filename)
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            print(f"Error: File not found - {file_path}")
+            return build_render_bundles([])
+
+        cached = DataLoader._bundle_cache.get(file_path)
+        if cached is None or cached[0] != mtime:
+            # One load per file, even when the warm-up and a session ask together
+            with DataLoader._bundle_lock:
+                cached = DataLoader._bundle_cache.get(file_path)
+                if cached is None or cached[0] != mtime:
+                    bundles = RenderBundles(ValidationReport(filename), load_response_stats(file_path), source=file_path)
+                    threading.Thread(
+                        target=self._stream_bundles, args=(file_path, bundles),
+                        name=f"load-{filename}", daemon=True
+                    ).start()
+                    # Only the latest version of each file is kept
+                    cached = DataLoader._bundle_cache[file_path] = (mtime, bundles)
+
+        bundles = cached[1]
+        bundles.wait_for(wait_for)
+        return bundles
+
+    @staticmethod
+    def _iter_valid(file_path, report):
+        """Stream the records of a data file that match the dataset schema
+
+        Yields:
+            tuple: (byte offset, byte length, record) of each valid record
+        """
+        for index, (offset, length, record) in enumerate(iter_json_array(file_path)):
+            report.checked += 1
+            errors = DATASET_SCHEMA.validate(record)
+            if errors:
+                report.add(index, record, errors)
+            else:
+                yield offset, length, record
+
+    def iter_records(self, filename, report=None, spans=False):
+        """Stream the valid records of a data file without loading it whole
+
+        Args:
+            filename (str): Name of the data file
+            report (ValidationReport, optional): Collects the rejected records
+            spans (bool, optional): Also yield the byte offset and length of each record
+
+        Yields:
+            dict: The records matching the dataset schema, in file order, or
+                (offset, length, record) tuples if spans is set
+        """
+        file_path = os.path.join(self.data_dir, filename)
+        if report is None:
+            report = ValidationReport(filename)
+        for offset, length, record in self._iter_valid(file_path, report):
+            yield (offset, length, record) if spans else record
+
+    @timed("data_loader.stream_bundles")
+    def _stream_bundles(self, file_path, bundles):
+        """Fill render bundles from a data file as its records are parsed"""
+        report = bundles.validation
+        batch, spans = [], []
+        # The first post is published on its own so the page can render it
+        flush_at = 1
+        try:
+            for offset, length, record in self._iter_valid(file_path, report):
+                batch.append(record)
+                spans.append((offset, length))
+                if len(batch) >= flush_at:
+                    bundles.extend(batch, spans)
+                    batch, spans = [], []
+                    flush_at = STREAM_BATCH_SIZE
+            bundles.extend(batch, spans)
+        except json.JSONDecodeError as e:
+            print(f"Error: Invalid JSON format in file - {file_path}: {e}")
+            bundles.finish(f"Invalid JSON format: {e}")
+        except Exception as e:
+            print(f"Error loading file {file_path}: {str(e)}")
+            bundles.finish(str(e))
+        else:
+            bundles.finish()
+        if report.rejected:
+            print(report.summary())
+
     def load_faiz_fj(self):
         """Load the Faiz_FJ.json file"""
         return self.load_file("Faiz_FJ.json")
@@ -0,0 +1,304 @@
+# modules/utils/dataset_catalog.py
+
+import json
+import os
+import threading
+from collections import namedtuple
+from modules.utils.atomic_file import atomic_write_json, file_lock
+from modules.utils.data_loader import DataLoader
+from modules.utils.gold import GOLD_SUFFIX, gold_file_path
+from modules.utils.response_stats import stats_file_path
+from modules.utils.schema import RESPONSE_FIELD_PATTERN, ValidationReport
+
+# Manifest kept in each data directory; hidden so it is not taken for a dataset
+MANIFEST_NAME = ".dataset_catalog.json"
+MANIFEST_VERSION = 1
+
+# Data directories, separated like PATH entries
+DATA_DIRS_ENV = "LABELER_DATA_DIR"
+
+DatasetInfo = namedtuple(
+    "DatasetInfo",
+    "name data_dir filename size mtime records rejected models has_images image_extraction stats_file gold_file",
+)
+DatasetInfo.__doc__ = """Metadata of one dataset file, as recorded in the catalog manifest
+
+image_extraction tells whether annotators transcribe the text of the
+question's image: some posts have an image but no precomputed analysis_result.
+stats_file is the precomputed response statistics file and gold_file the
+gold post file (see modules/utils/gold.py), or None.
+"""
+
+# Catalogs per tuple of data directories, as (signature, datasets)
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+# Dataset files are scanned in background threads, keyed by (data_dir,
+# filename, size, mtime); finished scans are kept per (data_dir, filename) as
+# (size, mtime, entry), the entry being None if the file could not be read
+_scans = {}
+_scanned = {}
+_scans_lock = threading.Lock()
+
+# Number of finished scans, part of the catalog cache key
+_scan_generation = [0]
+
+
+def data_dirs_from_env(default):
+    """Data directories configured with LABELER_DATA_DIR, or the default one"""
+    value = os.environ.get(DATA_DIRS_ENV)
+    if not value:
+        return [default]
+    return [path for path in value.split(os.pathsep) if path]
+
+
+def _dataset_files(data_dir):
+    """(filename, size, mtime) of the dataset and gold post files of a directory
+
+    Gold post files are listed too, so adding or changing one refreshes the
+    catalog.
+    """
+    try:
+        entries = list(os.scandir(data_dir))
+    except OSError:
+        return []
+    files = []
+    for entry in entries:
+        if entry.name.endswith(".json") and not entry.name.startswith(".") and entry.is_file():
+            stat = entry.stat()
+            files.append((entry.name, stat.st_size, stat.st_mtime))
+    return sorted(files, key=lambda file: file[0].lower())
+
+
+def scan_dataset(data_dir, filename):
+    """Read a dataset file once to record its metadata
+
+    Args:
+        data_dir (str): Directory of the file
+        filename (str): Name of the file
+
+    Returns:
+        dict: The manifest entry of the file
+    """
+    report = ValidationReport(filename)
+    models = []
+    canonical = {}
+    records = 0
+    has_images = False
+    unanalyzed_images = False
+
+    for record in DataLoader(data_dir=data_dir).iter_records(filename, report):
+        records += 1
+        if record.get("image_link"):
+            has_images = True
+            unanalyzed_images = unanalyzed_images or not record.get("analysis_result")
+        for key in record:
+            match = RESPONSE_FIELD_PATTERN.match(key)
+            if match:
+                model = canonical.setdefault(match.group("model").lower(), match.group("model"))
+                if model not in models:
+                    models.append(model)
+
+    return {
+        "records": records,
+        "rejected": report.rejected,
+        "models": models,
+        "has_images": has_images,
+        "image_extraction": unanalyzed_images,
+    }
+
+
+def _read_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "datasets": {}, "overrides": {}}
+
+
+def _update_manifest(data_dir, update):
+    """Read, change and write the manifest of a directory under its file lock
+
+    Workers of other processes update the same manifest, and admins may
+    edit its overrides by hand, so it is re-read under the lock rather than
+    written from an older copy.
+
+    Args:
+        data_dir (str): Directory of the manifest
+        update (callable): Changes the manifest in place, returns True if it changed
+    """
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    try:
+        with file_lock(path):
+            manifest = _read_manifest(path)
+            manifest.setdefault("datasets", {})
+            manifest.setdefault("overrides", {})
+            if update(manifest):
+                atomic_write_json(path, manifest)
+    except OSError as e:
+        print(f"Dataset catalog not saved, {data_dir} will be scanned again: {str(e)}")
+
+
+def _is_current(entry, size, mtime):
+    return entry is not None and entry.get("size") == size and entry.get("mtime") == mtime
+
+
+def _scan(data_dir, filename, size, mtime):
+    """Scan a dataset file and record it in the manifest, in a background thread"""
+    entry = _read_manifest(os.path.join(data_dir, MANIFEST_NAME)).get("datasets", {}).get(filename)
+    if not _is_current(entry, size, mtime):
+        # Not already scanned by another worker
+        try:
+            entry = {"size": size, "mtime": mtime, **scan_dataset(data_dir, filename)}
+        except Exception as e:
+            print(f"Error scanning dataset {os.path.join(data_dir, filename)}: {str(e)}")
+            entry = None
+
+        if entry is not None:
+            def record(manifest):
+                manifest["datasets"][filename] = entry
+                return True
+            _update_manifest(data_dir, record)
+
+    with _scans_lock:
+        # Kept in memory too, for directories where the manifest cannot be written
+        _scanned[(data_dir, filename)] = (size, mtime, entry)
+        del _scans[(data_dir, filename, size, mtime)]
+        _scan_generation[0] += 1
+
+
+def _start_scan(data_dir, filename, size, mtime):
+    """Scan a file in the background unless this version is already scanned or being scanned"""
+    with _scans_lock:
+        key = (data_dir, filename, size, mtime)
+        scanned = _scanned.get((data_dir, filename))
+        if key in _scans or (scanned is not None and scanned[:2] == (size, mtime)):
+            return
+        _scans[key] = thread = threading.Thread(
+            target=_scan, args=key, name=f"scan-{filename}", daemon=True
+        )
+    thread.start()
+
+
+def scanning_datasets(data_dirs):
+    """Paths of the dataset files of the directories being scanned"""
+    with _scans_lock:
+        return [os.path.join(data_dir, filename) for data_dir, filename, _, _ in _scans if data_dir in data_dirs]
+
+
+def _load_directory(data_dir, files):
+    """Datasets of one directory, scanning only files new or changed since the manifest
+
+    New and changed files are scanned in the background; a new file is
+    listed once its scan finishes, a changed one keeps its previous entry
+    until then.
+    """
+    manifest = _read_manifest(os.path.join(data_dir, MANIFEST_NAME))
+    entries = manifest.get("datasets", {})
+    overrides = manifest.get("overrides", {})
+
+    present = {file[0] for file in files}
+    if any(filename not in present for filename in entries):
+        def remove_missing(manifest):
+            missing = [filename for filename in manifest["datasets"] if filename not in present]
+            for filename in missing:
+                del manifest["datasets"][filename]
+            return bool(missing)
+        _update_manifest(data_dir, remove_missing)
+
+    gold_files = {filename for filename, _, _ in files if filename.endswith(GOLD_SUFFIX)}
+    datasets = []
+    for filename, size, mtime in files:
+        if filename in gold_files:
+            continue
+        entry = entries.get(filename)
+        if not _is_current(entry, size, mtime):
+            scanned = _scanned.get((data_dir, filename))
+            if scanned is not None and scanned[:2] == (size, mtime):
+                entry = scanned[2]
+            else:
+                _start_scan(data_dir, filename, size, mtime)
+        if entry is None:
+            continue
+        name = filename[:-len(".json")]
+        stats_file = stats_file_path(os.path.join(data_dir, filename))
+        gold_file = gold_file_path(os.path.join(data_dir, filename))
+        gold_file = gold_file if os.path.basename(gold_file) in gold_files else None
+        info = DatasetInfo(
+            name=name,
+            data_dir=data_dir,
+            filename=filename,
+            size=entry["size"],
+            mtime=entry["mtime"],
+            records=entry["records"],
+            rejected=entry["rejected"],
+            models=entry["models"],
+            has_images=entry["has_images"],
+            image_extraction=entry["image_extraction"],
+            stats_file=stats_file if os.path.exists(stats_file) else None,
+            gold_file=gold_file,
+        )
+        # Hand-written settings in the manifest win over the detected ones
+        datasets.append(info._replace(**{
+            key: value for key, value in overrides.get(name, {}).items() if key in DatasetInfo._fields
+        }))
+    return datasets
+
+
+def load_catalog(data_dirs, wait=False):
+    """Get the datasets of one or more data directories
+
+    Each directory keeps a manifest with the metadata of its dataset files,
+    so only files added or changed since the manifest was written are read.
+    They are read in the background, so a new large file never holds up
+    the page; it is listed once read (see scanning_datasets). The catalog
+    is cached per process and refreshed when a dataset file is added,
+    removed or modified, or a scan finishes. A dataset name found in
+    several directories is taken from the first one.
+
+    Args:
+        data_dirs (list): Directories containing dataset files
+        wait (bool, optional): Wait for the scans, for background work that
+            needs every dataset. Defaults to False.
+
+    Returns:
+        list: DatasetInfo of every dataset with at least one valid record and model response
+    """
+    key = tuple(data_dirs)
+    while True:
+        files = [_dataset_files(data_dir) for data_dir in data_dirs]
+        signature = (_scan_generation[0], tuple(tuple(dir_files) for dir_files in files))
+
+        cached = _catalogs.get(key)
+        if cached is None or cached[0] != signature:
+            with _catalogs_lock:
+                cached = _catalogs.get(key)
+                if cached is None or cached[0] != signature:
+                    datasets = {}
+                    for data_dir, dir_files in zip(data_dirs, files):
+                        for info in _load_directory(data_dir, dir_files):
+                            if info.name in datasets:
+                                print(f"Dataset {info.name} in {data_dir} is hidden by {datasets[info.name].data_dir}")
+                            elif info.records and not info.models:
+                                print(f"Dataset {info.name} in {data_dir} has no model responses to evaluate")
+                            elif info.records:
+                                datasets[info.name] = info
+                    cached = _catalogs[key] = (signature, list(datasets.values()))
+
+        with _scans_lock:
+            pending = [thread for (data_dir, _, _, _), thread in _scans.items() if data_dir in data_dirs]
+        if not wait or not pending:
+            return cached[1]
+        for thread in pending:
+            thread.join()
+
+
+def find_dataset(catalog, name):
+    """DatasetInfo of a dataset by name, or None"""
+    for info in catalog:
+        if info.name == name:
+            return info
+    return None
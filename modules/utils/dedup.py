@@ -0,0 +1,381 @@
+# modules/utils/dedup.py
+#
+# Finds posts that would be labeled twice: exact duplicates by post_id and
+# near-duplicate questions or responses, within and across dataset files.
+#
+# Usage:
+#   python -m modules.utils.dedup Faiz_FJ.json FJ_only.json
+#   python -m modules.utils.dedup --data-dir /srv/datasets a.json b.json --json duplicates.json
+
+import argparse
+import json
+import re
+import time
+import numpy as np
+from modules.utils.data_loader import DataLoader
+from modules.utils.schema import RESPONSE_FIELD_PATTERN, ValidationReport
+
+# Bytes per shingle of normalized text
+SHINGLE_BYTES = 8
+
+# MinHash bins per signature, split into LSH bands of equal size
+NUM_BINS = 64
+NUM_BANDS = 16
+
+# Estimated Jaccard similarity above which two texts are near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Records hashed per vectorized batch
+BATCH_SIZE = 4096
+
+# Texts compared between records, by name
+TEXT_KINDS = ("question", "responses")
+
+_TAG_PATTERN = re.compile(rb"<[^>\x00]*>")
+# Lowercases ASCII letters and turns ASCII whitespace into spaces
+_NORMALIZE_TABLE = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZ\t\n\r\x0b\x0c", b"abcdefghijklmnopqrstuvwxyz     "
+)
+
+_EMPTY = np.uint64(0xFFFFFFFFFFFFFFFF)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix64(values):
+    """splitmix64 finalizer, a fast 64-bit hash of each value"""
+    values = values ^ (values >> np.uint64(30))
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def record_text(record, kind):
+    """Text of a record compared for near-duplicates
+
+    Args:
+        record (dict): A dataset record
+        kind (str): "question" for the title and body, "responses" for every model response
+
+    Returns:
+        str: The text, possibly empty
+    """
+    if kind == "question":
+        return f"{record.get('title') or ''} {record.get('body') or ''}"
+    return " ".join(
+        record[key] for key in sorted(record) if RESPONSE_FIELD_PATTERN.match(key) and record[key]
+    )
+
+
+def minhash_signatures(texts, num_bins=NUM_BINS, shingle_bytes=SHINGLE_BYTES):
+    """One-permutation MinHash signatures of a batch of texts
+
+    The texts are normalized (tags stripped, ASCII lowercased, whitespace
+    collapsed) in one UTF-8 byte buffer, so shingling and hashing
+    run as a few numpy operations over the whole batch. Each shingle is
+    hashed once and kept as the minimum of one of `num_bins` bins; empty
+    bins are filled from the next non-empty bin (rotation densification).
+
+    Args:
+        texts (list): The texts
+        num_bins (int, optional): Signature length, a power of two. Defaults to NUM_BINS.
+        shingle_bytes (int, optional): Bytes per shingle, at most 8. Defaults to SHINGLE_BYTES.
+
+    Returns:
+        numpy.ndarray: uint32 signatures, one row per text; texts shorter
+            than a shingle get a row of zeros
+    """
+    count = len(texts)
+    signatures = np.full((count, num_bins), _EMPTY, dtype=np.uint64)
+    if count == 0:
+        return signatures.astype(np.uint32)
+
+    joined = "\x00".join(text.replace("\x00", " ") for text in texts).encode("utf-8")
+    joined = _TAG_PATTERN.sub(b" ", joined).translate(_NORMALIZE_TABLE)
+    data = np.frombuffer(joined, dtype=np.uint8)
+    # Collapse runs of spaces
+    spaces = data == 32
+    data = data[np.concatenate(([True], ~(spaces[1:] & spaces[:-1])))]
+
+    # Text index of every byte; each separator starts the next text
+    is_separator = data == 0
+    text_index = np.cumsum(is_separator)
+
+    windows = len(data) - shingle_bytes + 1
+    if windows > 0:
+        # Every shingle is read as one little-endian integer from the
+        # buffer; each offset view covers every 8th window
+        buffer = data.tobytes() + bytes(8)
+        mask = np.uint64((1 << (8 * shingle_bytes)) - 1)
+        shingles = np.empty(windows, dtype=np.uint64)
+        for offset in range(8):
+            count_at = len(range(offset, windows, 8))
+            shingles[offset::8] = np.frombuffer(buffer, dtype="<u8", count=count_at, offset=offset)
+        shingles &= mask
+
+        # Shingles crossing from one text into the next are dropped
+        valid = ~is_separator[:windows] & (text_index[:windows] == text_index[shingle_bytes - 1:])
+        hashes = _mix64(shingles[valid])
+        rows = text_index[:windows][valid]
+
+        shift = np.uint64(64 - (num_bins.bit_length() - 1))
+        bins = (hashes >> shift).astype(np.int64)
+        np.minimum.at(signatures.reshape(-1), rows * num_bins + bins, hashes)
+
+    signatures = _densify(signatures)
+    return signatures.astype(np.uint32)
+
+
+def _densify(signatures):
+    """Fill the empty bins of each signature from the next non-empty bin"""
+    empty = signatures == _EMPTY
+    if not empty.any():
+        return signatures
+
+    num_bins = signatures.shape[1]
+    filled = ~empty
+    # Index of the next non-empty bin, wrapping around the signature
+    positions = np.where(np.concatenate([filled, filled], axis=1), np.arange(2 * num_bins), 2 * num_bins)
+    following = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1][:, :num_bins]
+    following = np.minimum(following, 2 * num_bins - 1)
+
+    doubled = np.concatenate([signatures, signatures], axis=1)
+    distance = (following - np.arange(num_bins)).astype(np.uint64)
+    rotated = np.take_along_axis(doubled, following, axis=1) + distance * _GOLDEN
+
+    # Texts without any shingle keep a signature of zeros
+    has_shingles = filled.any(axis=1, keepdims=True)
+    return np.where(empty, np.where(has_shingles, rotated, np.uint64(0)), signatures)
+
+
+def estimate_similarity(signatures, first, second):
+    """Estimated Jaccard similarity of pairs of signatures
+
+    Args:
+        signatures (numpy.ndarray): Signatures from minhash_signatures
+        first (numpy.ndarray): Row of the first text of each pair
+        second (numpy.ndarray): Row of the second text of each pair
+
+    Returns:
+        numpy.ndarray: Share of equal bins of each pair
+    """
+    similarity = np.empty(len(first), dtype=np.float32)
+    for start in range(0, len(first), BATCH_SIZE * 16):
+        end = start + BATCH_SIZE * 16
+        similarity[start:end] = (signatures[first[start:end]] == signatures[second[start:end]]).mean(axis=1)
+    return similarity
+
+
+def candidate_pairs(signatures, num_bands=NUM_BANDS):
+    """Pairs of texts sharing at least one LSH band
+
+    Texts with equal band hashes are sorted next to each other and each is
+    paired with its neighbor, so a bucket of n texts yields n - 1 pairs
+    rather than n²; exact duplicates therefore cost no more than distinct
+    texts.
+
+    Args:
+        signatures (numpy.ndarray): Signatures from minhash_signatures
+        num_bands (int, optional): Bands per signature. Defaults to NUM_BANDS.
+
+    Returns:
+        tuple: (first, second) arrays of row indexes, each pair once
+    """
+    count, num_bins = signatures.shape
+    rows_per_band = num_bins // num_bands
+    # Texts without shingles have nothing to compare
+    eligible = np.flatnonzero(signatures.any(axis=1))
+
+    firsts, seconds = [], []
+    for band in range(num_bands):
+        columns = signatures[eligible, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        keys = np.zeros(len(eligible), dtype=np.uint64)
+        for column in columns.T:
+            keys = _mix64(keys * _GOLDEN + column)
+
+        order = np.argsort(keys, kind="stable")
+        same = keys[order[1:]] == keys[order[:-1]]
+        firsts.append(eligible[order[:-1][same]])
+        seconds.append(eligible[order[1:][same]])
+
+    first = np.concatenate(firsts) if firsts else np.empty(0, dtype=np.int64)
+    second = np.concatenate(seconds) if seconds else np.empty(0, dtype=np.int64)
+    low, high = np.minimum(first, second), np.maximum(first, second)
+    pairs = np.unique(low.astype(np.int64) * count + high)
+    return pairs // count, pairs % count
+
+
+def connected_components(count, first, second):
+    """Label the components of a graph given by its edges
+
+    Args:
+        count (int): Number of nodes
+        first (numpy.ndarray): First node of each edge
+        second (numpy.ndarray): Second node of each edge
+
+    Returns:
+        numpy.ndarray: Smallest node index of each node's component
+    """
+    labels = np.arange(count)
+    while True:
+        lowest = np.minimum(labels[first], labels[second])
+        updated = labels.copy()
+        np.minimum.at(updated, first, lowest)
+        np.minimum.at(updated, second, lowest)
+        # Pointer jumping until every node points at its root
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+class DuplicateReport:
+    """Duplicates found across a set of dataset files"""
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self.records = 0
+        self.validation = []
+        self.exact = []
+        self.near = {}
+        self.seconds = 0.0
+
+    def redundant_post_ids(self):
+        """Post IDs that do not need labeling once the first post of their group is
+
+        Returns:
+            list: (source, post_id) of every duplicate after the first of its group
+        """
+        redundant = []
+        for group in self.exact:
+            redundant.extend((member["source"], member["post_id"]) for member in group[1:])
+        for clusters in self.near.values():
+            for cluster in clusters:
+                redundant.extend((member["source"], member["post_id"]) for member in cluster[1:])
+        return list(dict.fromkeys(redundant))
+
+    def summary(self):
+        lines = [f"{self.records} records from {len(self.sources)} files in {self.seconds:.1f}s"]
+        lines.append(f"{len(self.exact)} post IDs appear more than once")
+        for kind, clusters in self.near.items():
+            lines.append(f"{len(clusters)} clusters of near-duplicate {kind} "
+                         f"({sum(len(cluster) for cluster in clusters)} records)")
+        lines.extend(report.summary() for report in self.validation if report.rejected)
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "sources": self.sources,
+            "records": self.records,
+            "seconds": round(self.seconds, 3),
+            "exact": self.exact,
+            "near": self.near,
+            "redundant": [list(item) for item in self.redundant_post_ids()],
+        }
+
+
+def find_duplicates(loader, filenames, kinds=TEXT_KINDS, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Find duplicate posts within and across dataset files
+
+    Records are streamed through the loader and hashed in batches, so only
+    the post IDs and the compact signatures are held in memory.
+
+    Args:
+        loader (DataLoader): Loader of the data directory
+        filenames (list): Names of the data files
+        kinds (tuple, optional): Texts compared, from TEXT_KINDS. Defaults to both.
+        threshold (float, optional): Minimum estimated similarity. Defaults to NEAR_DUPLICATE_THRESHOLD.
+
+    Returns:
+        DuplicateReport: The duplicate groups
+    """
+    started = time.perf_counter()
+    report = DuplicateReport(filenames)
+
+    sources, indexes, post_ids = [], [], []
+    signatures = {kind: [] for kind in kinds}
+    batch = {kind: [] for kind in kinds}
+
+    def flush():
+        for kind in kinds:
+            if batch[kind]:
+                signatures[kind].append(minhash_signatures(batch[kind]))
+                batch[kind] = []
+
+    for source, filename in enumerate(filenames):
+        validation = ValidationReport(filename)
+        report.validation.append(validation)
+        for index, record in enumerate(loader.iter_records(filename, validation)):
+            sources.append(source)
+            indexes.append(index)
+            post_ids.append(record["post_id"])
+            for kind in kinds:
+                batch[kind].append(record_text(record, kind))
+            if len(post_ids) % BATCH_SIZE == 0:
+                flush()
+    flush()
+
+    report.records = len(post_ids)
+
+    def member(row, similarity=None):
+        entry = {"source": filenames[sources[row]], "index": indexes[row], "post_id": post_ids[row]}
+        if similarity is not None:
+            entry["similarity"] = round(float(similarity), 3)
+        return entry
+
+    # Exact duplicates by post ID
+    rows_by_post = {}
+    for row, post_id in enumerate(post_ids):
+        rows_by_post.setdefault(post_id, []).append(row)
+    report.exact = [[member(row) for row in rows] for rows in rows_by_post.values() if len(rows) > 1]
+
+    # Near duplicates between different posts
+    for kind in kinds:
+        kind_signatures = np.concatenate(signatures[kind]) if signatures[kind] else np.empty((0, NUM_BINS), np.uint32)
+        first, second = candidate_pairs(kind_signatures)
+        similar = estimate_similarity(kind_signatures, first, second) >= threshold
+        labels = connected_components(len(post_ids), first[similar], second[similar])
+
+        # Rows of the components with more than one text, grouped by component
+        grouped = np.flatnonzero(np.bincount(labels, minlength=len(labels))[labels] > 1)
+        grouped = grouped[np.argsort(labels[grouped], kind="stable")]
+        boundaries = np.flatnonzero(np.diff(labels[grouped])) + 1
+
+        clusters = []
+        for rows in np.split(grouped, boundaries) if len(grouped) else []:
+            if len({post_ids[row] for row in rows}) < 2:
+                continue  # Copies of one post are reported as exact duplicates
+            similarity = estimate_similarity(kind_signatures, np.full(len(rows), rows[0]), rows)
+            clusters.append([member(row, value) for row, value in zip(rows, similarity)])
+        report.near[kind] = clusters
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate posts in dataset files")
+    parser.add_argument("files", nargs="+", help="data files to compare, e.g. Faiz_FJ.json FJ_only.json")
+    parser.add_argument("--data-dir", default="data/final_files", help="directory with the data files")
+    parser.add_argument("--kinds", nargs="+", choices=TEXT_KINDS, default=list(TEXT_KINDS),
+                        help="texts to compare for near-duplicates")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help="minimum estimated Jaccard similarity of near-duplicates")
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args()
+
+    report = find_duplicates(DataLoader(data_dir=args.data_dir), args.files, tuple(args.kinds), args.threshold)
+    print(report.summary())
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
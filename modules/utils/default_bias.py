@@ -0,0 +1,178 @@
+# modules/utils/default_bias.py
+#
+# Finds annotators and posts whose answers were mostly left at the form's
+# preset values. Every evaluation records which questions the annotator
+# interacted with as a bitmask (see TOUCHED_KEY in modules/utils/rubric.py);
+# the masks of all labels are gathered into flat arrays and the untouched
+# rates are computed with a few numpy passes, whatever the number of labels.
+# Labels saved before the masks were recorded are left out.
+#
+# Usage:
+#   python -m modules.utils.default_bias --output-dir labeled_data
+#   python -m modules.utils.default_bias --output-dir labeled_data --threshold 0.9 --json bias.json
+
+import argparse
+import json
+from array import array
+from collections import namedtuple
+import numpy as np
+from modules.utils.rubric import EVALUATION_RUBRIC, TOUCHED_KEY
+
+# Share of preset answers left untouched above which an annotator or post is flagged
+UNTOUCHED_THRESHOLD = 0.8
+
+# Evaluations needed before an annotator or a post is flagged
+MIN_ANNOTATOR_EVALUATIONS = 20
+MIN_POST_EVALUATIONS = 4
+
+# Suffix of the per-model evaluation keys in a labeled item
+EVALUATION_SUFFIX = "_evaluation"
+
+# Set bits of every byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+TouchedMasks = namedtuple("TouchedMasks", "annotators posts annotator post mask")
+TouchedMasks.__doc__ = """Touched-field bitmasks of many evaluations, one array entry per evaluation
+
+annotators and posts list the names and (dataset, post_id) keys that the
+annotator and post arrays index into; mask holds the bitmasks.
+"""
+
+
+def popcount(masks):
+    """Number of set bits of each 32-bit mask"""
+    masks = np.ascontiguousarray(masks, dtype="<u4")
+    return _POPCOUNT[masks.view(np.uint8)].reshape(-1, 4).sum(axis=1, dtype=np.int64)
+
+
+def collect_masks(labels):
+    """Gather the touched-field bitmasks of labels into flat arrays
+
+    Args:
+        labels (iterable): (annotator, dataset, label) triples
+
+    Returns:
+        TouchedMasks: The masks of every evaluation that has one
+    """
+    annotators = {}
+    posts = {}
+    annotator_ids = array("i")
+    post_ids = array("i")
+    masks = array("I")
+
+    for annotator, dataset, label in labels:
+        for key, evaluation in label.items():
+            if not key.endswith(EVALUATION_SUFFIX) or not isinstance(evaluation, dict):
+                continue
+            mask = evaluation.get(TOUCHED_KEY)
+            if not isinstance(mask, int) or isinstance(mask, bool):
+                continue
+            annotator_ids.append(annotators.setdefault(annotator, len(annotators)))
+            post_ids.append(posts.setdefault((dataset, label.get("post_id")), len(posts)))
+            masks.append(mask)
+
+    return TouchedMasks(
+        annotators=list(annotators),
+        posts=list(posts),
+        annotator=np.frombuffer(annotator_ids, dtype=np.int32),
+        post=np.frombuffer(post_ids, dtype=np.int32),
+        mask=np.frombuffer(masks, dtype=np.uint32),
+    )
+
+
+def _group_rates(groups, size, untouched, all_default, field_untouched, preset_count):
+    evaluations = np.bincount(groups, minlength=size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.bincount(groups, weights=untouched, minlength=size) / (evaluations * preset_count)
+        all_default_rate = np.bincount(groups, weights=all_default, minlength=size) / evaluations
+        field_rates = {
+            name: np.bincount(groups, weights=column, minlength=size) / evaluations
+            for name, column in field_untouched.items()
+        }
+    return evaluations, rate, all_default_rate, field_rates
+
+
+def untouched_summary(masks, threshold=UNTOUCHED_THRESHOLD, min_annotator_evaluations=MIN_ANNOTATOR_EVALUATIONS,
+                      min_post_evaluations=MIN_POST_EVALUATIONS):
+    """Untouched rates of the preset answers per annotator and per post
+
+    Only the always visible questions with a preset answer are counted (see
+    CompiledRubric.preset_mask); follow-up questions appear only after the
+    annotator changed their parent, and an empty note is not an answer.
+
+    Args:
+        masks (TouchedMasks): Masks from collect_masks
+        threshold (float, optional): Untouched rate above which to flag. Defaults to UNTOUCHED_THRESHOLD.
+        min_annotator_evaluations (int, optional): Evaluations needed to flag an annotator.
+        min_post_evaluations (int, optional): Evaluations needed to flag a post.
+
+    Returns:
+        dict: "annotators": name -> rates and flag for every annotator;
+            "posts": [dataset, post_id, rates] of the flagged posts, worst first
+    """
+    preset = EVALUATION_RUBRIC.preset_mask
+    preset_count = bin(preset).count("1")
+    untouched_masks = ~masks.mask & np.uint32(preset)
+    untouched = popcount(untouched_masks)
+    all_default = untouched == preset_count
+    field_untouched = {
+        field.name: (untouched_masks >> np.uint32(field.index)) & np.uint32(1)
+        for field in EVALUATION_RUBRIC.fields if preset >> field.index & 1
+    }
+
+    summary = {"annotators": {}, "posts": []}
+    if not len(masks.mask):
+        return summary
+
+    evaluations, rate, all_default_rate, field_rates = _group_rates(
+        masks.annotator, len(masks.annotators), untouched, all_default, field_untouched, preset_count
+    )
+    for index, name in enumerate(masks.annotators):
+        summary["annotators"][name] = {
+            "evaluations": int(evaluations[index]),
+            "untouched_rate": round(float(rate[index]), 3),
+            "all_default_rate": round(float(all_default_rate[index]), 3),
+            "fields": {field: round(float(rates[index]), 3) for field, rates in field_rates.items()},
+            "flagged": bool(evaluations[index] >= min_annotator_evaluations and rate[index] >= threshold),
+        }
+
+    evaluations, rate, all_default_rate, _ = _group_rates(
+        masks.post, len(masks.posts), untouched, all_default, {}, preset_count
+    )
+    flagged = np.flatnonzero((evaluations >= min_post_evaluations) & (rate >= threshold))
+    for index in flagged[np.argsort(-rate[flagged], kind="stable")]:
+        dataset, post_id = masks.posts[index]
+        summary["posts"].append({
+            "dataset": dataset,
+            "post_id": post_id,
+            "evaluations": int(evaluations[index]),
+            "untouched_rate": round(float(rate[index]), 3),
+            "all_default_rate": round(float(all_default_rate[index]), 3),
+        })
+    return summary
+
+
+def main():
+    from modules.utils.data_exporter import DataExporter
+
+    parser = argparse.ArgumentParser(description="Find annotators and posts with answers left at their preset values")
+    parser.add_argument("--output-dir", default="labeled_data", help="directory with the labeled data")
+    parser.add_argument("--data-dir", action="append", help="dataset directory, to name the dataset of older labels")
+    parser.add_argument("--threshold", type=float, default=UNTOUCHED_THRESHOLD, help="untouched rate to flag")
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    summary = untouched_summary(DataExporter(output_dir=args.output_dir).touched_masks(args.data_dir), args.threshold)
+    for annotator, stats in summary["annotators"].items():
+        flag = "  FLAGGED" if stats["flagged"] else ""
+        print(f"{annotator}: {stats['untouched_rate']:.0%} of preset answers untouched, "
+              f"{stats['all_default_rate']:.0%} of {stats['evaluations']} evaluations all default{flag}")
+    print(f"{len(summary['posts'])} posts flagged")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# modules/utils/export_jobs.py
+#
+# Runs exports of the labeled data as background jobs, so the export page
+# stays responsive while large archives are merged and several admins can
+# export at once. Jobs are tasks of the label store: with SQLite storage
+# every app worker shares the queue and the job history, with file storage
+# they live in the process.
+
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from modules.utils.data_exporter import DataExporter
+from modules.utils.storage import get_label_store
+
+# Task kind of the export jobs
+EXPORT_TASK = "export"
+
+# Exports run at the same time in this process
+EXPORT_WORKERS = int(os.environ.get("LABELER_EXPORT_WORKERS", "2"))
+
+# Progress is written at most this often, as every update is a database write
+PROGRESS_INTERVAL = 0.5
+
+# Running exports touch their task this often, so live jobs never look stale
+HEARTBEAT_SECONDS = 30
+
+# Running tasks not updated for this long belong to a worker that died and are queued again
+STALE_TASK_SECONDS = float(os.environ.get("LABELER_STALE_TASK_SECONDS", "300"))
+
+# Name of this process in the claimed_by column of the tasks
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_executor = None
+_executor_lock = threading.Lock()
+# Pool threads currently draining the queue
+_draining = 0
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+        return _executor
+
+
+def submit_export(output_dir, export, output_filename=None, file_format=None, data_dirs=None):
+    """Queue an export and start it in the background
+
+    Args:
+        output_dir (str): Directory containing the labeled data
+        export (str): "merge" (JSON), "csv" or "joined" (see DataExporter)
+        output_filename (str, optional): Name for the exported file. Defaults to a timestamp-based name.
+        file_format (str, optional): Format of a joined export, "csv" or "parquet". Defaults to None.
+        data_dirs (list, optional): Dataset directories of a joined export. Defaults to None.
+
+    Returns:
+        int: ID of the export job
+    """
+    payload = {
+        "export": export,
+        "output_dir": output_dir,
+        "output_filename": output_filename,
+        "file_format": file_format,
+        "data_dirs": data_dirs,
+    }
+    task_id = get_label_store(output_dir).enqueue_task(EXPORT_TASK, payload)
+    _start_drain(output_dir)
+    return task_id
+
+
+def resume_exports(output_dir):
+    """Run the queued exports left behind by other or dead app workers
+
+    Does nothing while every export worker of this process is busy; their
+    drain loops pick the queued exports up when they are done.
+    """
+    with _executor_lock:
+        if _draining >= EXPORT_WORKERS:
+            return
+    _start_drain(output_dir)
+
+
+def _start_drain(output_dir):
+    global _draining
+    pool = _pool()
+    with _executor_lock:
+        _draining += 1
+    pool.submit(_drain, output_dir)
+
+
+def _drain(output_dir):
+    """Run queued exports until the queue is empty"""
+    global _draining
+    try:
+        while _run_next(output_dir):
+            pass
+    finally:
+        with _executor_lock:
+            _draining -= 1
+
+
+def run_export(exporter, payload, progress=None):
+    """Run one export described by a job payload
+
+    Returns:
+        str: Path to the exported file, or None if there was nothing to export
+    """
+    export = payload["export"]
+    if export == "merge":
+        return exporter.merge_all_files(payload.get("output_filename"), progress=progress)
+    if export == "csv":
+        return exporter.export_to_csv(payload.get("output_filename"), progress=progress)
+    if export == "joined":
+        return exporter.export_joined(
+            payload["data_dirs"], payload.get("output_filename"), payload.get("file_format") or "csv", progress=progress
+        )
+    raise ValueError(f"Unknown export: {export}")
+
+
+def _run_next(output_dir):
+    """Claim the oldest queued export and run it
+
+    Returns:
+        bool: True if an export was claimed, False if the queue was empty
+    """
+    store = get_label_store(output_dir)
+    task = store.claim_task(WORKER_ID, [EXPORT_TASK], stale_after=STALE_TASK_SECONDS)
+    if task is None:
+        return False  # Empty, or claimed by another app worker
+
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(HEARTBEAT_SECONDS):
+            store.update_task(task["id"])
+
+    threading.Thread(target=heartbeat, name=f"export-{task['id']}-heartbeat", daemon=True).start()
+    try:
+        _run_task(store, task)
+    finally:
+        stopped.set()
+    return True
+
+
+def _run_task(store, task):
+    """Run a claimed export and record its outcome"""
+    last_update = [0.0]
+
+    def progress(fraction):
+        now = time.monotonic()
+        if now - last_update[0] >= PROGRESS_INTERVAL:
+            last_update[0] = now
+            store.update_task(task["id"], progress=round(fraction, 3))
+
+    payload = task["payload"]
+    try:
+        path = run_export(DataExporter(output_dir=payload["output_dir"]), payload, progress)
+    except Exception as e:
+        print(f"Export {task['id']} failed: {str(e)}")
+        store.update_task(task["id"], status="failed", result={"error": str(e)})
+        return
+
+    if path is None:
+        store.update_task(task["id"], status="failed", result={"error": "Nothing to export"})
+    else:
+        store.update_task(task["id"], status="done", progress=1.0, result={"path": path, "size": os.path.getsize(path)})
+
+
+def list_exports(output_dir, limit=20):
+    """Most recent export jobs, newest first
+
+    Returns:
+        list: One task dict per job (see SQLiteLabelStore.list_tasks)
+    """
+    return get_label_store(output_dir).list_tasks(kind=EXPORT_TASK, limit=limit)
@@ -0,0 +1,405 @@
+# modules/utils/gold.py
+#
+# Gold posts: posts with known answers, spread through each annotator's
+# navigation order as attention checks and scored on every save.
+#
+# The gold posts of a dataset live next to it in <dataset>.gold.json, a list
+# of dataset records that each carry a "gold" object with the known answers:
+#
+#   "gold": {
+#       "GPT_with_image_evaluation": {"correct": false, "usefulness": [1, 2]},
+#       "*": {"comprehensive": false}
+#   }
+#
+# Answers are keyed by evaluation key ("*" applies to every evaluation of the
+# label) and then by rubric field name (see modules/utils/rubric.py). A list
+# accepts any of its values, except for multiselect fields where it is the
+# exact set of options.
+#
+# Gold posts are shown under their own ids (see gold_post_id), so a gold
+# record copied from a dataset post is labeled and scored apart from it, and
+# their labels carry "gold": true so exports and analyses can leave them out.
+
+import bisect
+import json
+import os
+import random
+import threading
+from modules.utils.data_loader import DataLoader
+from modules.utils.render_bundle import RenderBundle
+from modules.utils.rubric import EVALUATION_RUBRIC
+
+# Suffix of the gold post files, stored next to their dataset
+GOLD_SUFFIX = ".gold.json"
+
+# Prefix of the post ids of gold posts, keeping them apart from dataset posts
+GOLD_ID_PREFIX = "gold:"
+
+# One gold post is placed at a random position in every block of this many posts
+GOLD_INTERVAL = int(os.environ.get("LABELER_GOLD_INTERVAL", "20"))
+
+# Accuracy below which an annotator is reported, once they answered enough gold posts
+GOLD_WARN_ACCURACY = 0.7
+GOLD_MIN_POSTS = 5
+
+# Suffix of the per-model evaluation keys in a labeled item
+EVALUATION_SUFFIX = "_evaluation"
+
+# Gold sets per file path, as (mtime, gold set)
+_gold_sets = {}
+_gold_sets_lock = threading.Lock()
+
+# Navigation views per annotator and dataset, rebuilt when either file changes
+_views = {}
+_views_lock = threading.Lock()
+
+
+def gold_file_path(file_path):
+    """Path of the gold post file stored next to a dataset file"""
+    return os.path.splitext(file_path)[0] + GOLD_SUFFIX
+
+
+def gold_post_id(post_id):
+    """Id under which a gold post is shown, labeled and scored"""
+    return f"{GOLD_ID_PREFIX}{post_id}"
+
+
+def _key(post_id):
+    # Labels may hold post ids as numbers or strings
+    return str(post_id)
+
+
+def _matches(field, expected, actual):
+    if field.widget == "multiselect":
+        return isinstance(actual, list) and set(actual) == set(expected)
+    if isinstance(expected, list):
+        return actual in expected
+    return actual == expected
+
+
+class GoldSet:
+    """Known answers of the gold posts of one dataset
+
+    The answers are compiled into (evaluation key, rubric field, expected
+    value) checks per post, so scoring a label costs one comparison per
+    known answer. Posts are keyed by their gold post ids.
+    """
+
+    def __init__(self, records):
+        self.post_ids = []
+        self._checks = {}
+        for record in records:
+            checks = []
+            for evaluation_key, answers in (record.get("gold") or {}).items():
+                if evaluation_key != "*" and not evaluation_key.endswith(EVALUATION_SUFFIX):
+                    raise ValueError(f"post {record.get('post_id')}: {evaluation_key} is not an evaluation key")
+                for name, expected in answers.items():
+                    field = EVALUATION_RUBRIC.by_name.get(name)
+                    if field is None:
+                        raise ValueError(f"post {record.get('post_id')}: unknown rubric field {name}")
+                    checks.append((evaluation_key, field, expected))
+            if checks:
+                post_id = gold_post_id(record["post_id"])
+                self.post_ids.append(post_id)
+                self._checks[post_id] = checks
+
+    def __len__(self):
+        return len(self._checks)
+
+    def __contains__(self, post_id):
+        return _key(post_id) in self._checks
+
+    def score(self, label):
+        """Score a label against the known answers of its post
+
+        Args:
+            label (dict): A labeled item
+
+        Returns:
+            tuple: (correct answers, checked answers), or None if the post is not a gold post
+        """
+        checks = self._checks.get(_key(label.get("post_id")))
+        if checks is None:
+            return None
+
+        correct = total = 0
+        for evaluation_key, field, expected in checks:
+            if evaluation_key == "*":
+                evaluations = [value for key, value in label.items() if key.endswith(EVALUATION_SUFFIX)]
+            else:
+                evaluations = [label.get(evaluation_key)]
+            for evaluation in evaluations:
+                total += 1
+                if isinstance(evaluation, dict) and _matches(field, expected, field.get_raw(evaluation)):
+                    correct += 1
+        return correct, total
+
+
+def load_gold_set(path):
+    """Load a gold post file
+
+    Args:
+        path (str): Path of the gold post file, see DatasetInfo.gold_file
+
+    Returns:
+        GoldSet: The known answers, or None if the file cannot be read
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _gold_sets.get(path)
+    if cached is None or cached[0] != mtime:
+        with _gold_sets_lock:
+            cached = _gold_sets.get(path)
+            if cached is None or cached[0] != mtime:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        gold = GoldSet(json.load(f))
+                except (OSError, ValueError, AttributeError, KeyError) as e:
+                    print(f"Error loading gold posts {path}: {str(e)}")
+                    gold = None
+                cached = _gold_sets[path] = (mtime, gold)
+    return cached[1]
+
+
+class GoldPost(RenderBundle):
+    """Render bundle of a gold post, shown under its gold post id"""
+
+    __slots__ = ()
+
+    gold = True
+
+    @property
+    def post_id(self):
+        return gold_post_id(self.bundles.post_ids[self.index])
+
+
+class GoldInjectedBundles:
+    """Render bundles of a dataset with its gold posts spread through them
+
+    Every block of `interval` positions holds one gold post at a position
+    drawn from `seed`, so each annotator meets the gold posts in their own
+    order and places, and the order stays the same across sessions. The
+    positions do not depend on the dataset's size, so the order is stable
+    while a large file is still loading. Looking up a position is a binary
+    search over the gold positions. A dataset of n posts shows at most
+    n / (interval - 1) gold posts; the others wait for a larger dataset.
+    """
+
+    def __init__(self, bundles, gold_bundles, seed, interval=GOLD_INTERVAL):
+        self.bundles = bundles
+        self.gold_bundles = gold_bundles
+        rng = random.Random(seed)
+        order = list(range(len(gold_bundles)))
+        rng.shuffle(order)
+        self._gold = [GoldPost(gold_bundles, index) for index in order]
+        self._positions = [block * interval + rng.randrange(1, interval) if interval > 1 else block
+                           for block in range(len(order))]
+        # Dataset posts needed before each gold post, increasing with the position
+        self._needed = [position - block for block, position in enumerate(self._positions)]
+        # Navigation order of the post ids, as (dataset posts covered, ids)
+        self._post_ids = (-1, [])
+
+    @property
+    def models(self):
+        return self.bundles.models
+
+    @property
+    def complete(self):
+        return self.bundles.complete
+
+    @property
+    def error(self):
+        return self.bundles.error
+
+    @property
+    def validation(self):
+        return self.bundles.validation
+
+    @property
+    def post_ids(self):
+        """Post ids in navigation order, rebuilt only when posts were added"""
+        size = len(self.bundles)
+        if self._post_ids[0] == size:
+            return self._post_ids[1]
+        dataset_ids = self.bundles.post_ids[:size]
+        post_ids = []
+        start = 0
+        for block in range(bisect.bisect_right(self._needed, len(dataset_ids))):
+            post_ids.extend(dataset_ids[start:self._needed[block]])
+            post_ids.append(self._gold[block].post_id)
+            start = self._needed[block]
+        post_ids.extend(dataset_ids[start:])
+        self._post_ids = (size, post_ids)
+        return post_ids
+
+    def wait_for(self, index, timeout=None):
+        """Wait until the post at a navigation position is available, see RenderBundles.wait_for"""
+        self.bundles.wait_for(index - bisect.bisect_left(self._positions, index), timeout)
+        return len(self) > index
+
+    def __len__(self):
+        size = len(self.bundles)
+        return size + bisect.bisect_right(self._needed, size)
+
+    def __getitem__(self, index):
+        size = len(self)
+        if not -size <= index < size:
+            raise IndexError(index)
+        index %= size
+        block = bisect.bisect_left(self._positions, index)
+        if block < len(self._positions) and self._positions[block] == index:
+            return self._gold[block]
+        return self.bundles[index - block]
+
+
+class GoldScores:
+    """Accuracy of each annotator on the gold posts, kept up to date on every save
+
+    The score of every (annotator, dataset, post) and the running totals of
+    each (annotator, dataset) are kept in memory. A save replaces the post's
+    previous score in the totals, so scoring costs the same however many
+    labels there are. An annotator's existing labels are scored once, on
+    their first save in the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gold = {}
+        self._posts = {}
+        self._totals = {}
+        self._seeded = set()
+
+    def use(self, dataset_option, gold):
+        """Set the gold posts of a dataset, resetting its scores if they changed"""
+        with self._lock:
+            if self._gold.get(dataset_option) is gold:
+                return
+            self._gold[dataset_option] = gold
+            for key in [key for key in self._totals if key[1] == dataset_option]:
+                del self._totals[key]
+            self._posts = {key: score for key, score in self._posts.items() if key[1] != dataset_option}
+            self._seeded = {key for key in self._seeded if key[1] != dataset_option}
+
+    def _apply(self, gold, label, annotator_name, dataset_option):
+        score = gold.score(label)
+        if score is None:
+            return
+        key = (annotator_name, dataset_option, _key(label.get("post_id")))
+        totals = self._totals.setdefault((annotator_name, dataset_option), [0, 0, 0, 0])
+        previous = self._posts.get(key)
+        if previous is not None:
+            totals[0] -= previous[0]
+            totals[1] -= previous[1]
+            totals[2] -= previous[0] == previous[1]
+            totals[3] -= 1
+        self._posts[key] = score
+        totals[0] += score[0]
+        totals[1] += score[1]
+        totals[2] += score[0] == score[1]
+        totals[3] += 1
+
+    def record(self, label, annotator_name, dataset_option, load_labels=None):
+        """Score a saved label if its post is a gold post
+
+        Args:
+            label (dict): The saved label
+            annotator_name (str): Name of the annotator
+            dataset_option (str): Dataset being used
+            load_labels (callable, optional): Returns the annotator's saved labels
+                of the dataset, scored on their first save. Defaults to None.
+
+        Returns:
+            dict: The annotator's accuracy (see accuracy()), or None if the
+                dataset has no gold posts
+        """
+        gold = self._gold.get(dataset_option)
+        if gold is None:
+            return None
+
+        with self._lock:
+            if (annotator_name, dataset_option) not in self._seeded and load_labels is not None:
+                self._seeded.add((annotator_name, dataset_option))
+                for item in load_labels():
+                    self._apply(gold, item, annotator_name, dataset_option)
+            self._apply(gold, label, annotator_name, dataset_option)
+
+        return self.accuracy(annotator_name, dataset_option)
+
+    def accuracy(self, annotator_name, dataset_option):
+        """Accuracy of an annotator on the gold posts of a dataset
+
+        Returns:
+            dict: posts answered, posts with every answer correct and the
+                share of correct answers, or None before any gold post
+        """
+        totals = self._totals.get((annotator_name, dataset_option))
+        if not totals or not totals[3]:
+            return None
+        correct, checked, passed, posts = totals
+        return {
+            "posts": posts,
+            "passed": passed,
+            "accuracy": correct / checked if checked else 1.0,
+        }
+
+    def summary(self):
+        """Accuracy of every annotator per dataset
+
+        Returns:
+            dict: (annotator, dataset) -> accuracy, see accuracy()
+        """
+        with self._lock:
+            keys = list(self._totals)
+        return {key: self.accuracy(*key) for key in sorted(keys)}
+
+
+# Scores of the labels saved by this process
+GOLD_SCORES = GoldScores()
+
+
+def record_saved_label(label, annotator_name, dataset_option, load_labels):
+    """Score a label saved by this process, reporting annotators who fail the gold posts
+
+    Args:
+        label (dict): The saved label
+        annotator_name (str): Name of the annotator
+        dataset_option (str): Dataset being used
+        load_labels (callable): Returns the annotator's saved labels of the dataset
+    """
+    accuracy = GOLD_SCORES.record(label, annotator_name, dataset_option, load_labels)
+    if accuracy and accuracy["posts"] >= GOLD_MIN_POSTS and accuracy["accuracy"] < GOLD_WARN_ACCURACY:
+        print(f"Annotator {annotator_name} answered {accuracy['accuracy']:.0%} of the gold answers "
+              f"of {dataset_option} correctly over {accuracy['posts']} gold posts")
+
+
+def with_gold_posts(bundles, dataset_info, annotator_name):
+    """Spread the gold posts of a dataset through an annotator's navigation order
+
+    Args:
+        bundles (RenderBundles): Render bundles of the dataset
+        dataset_info (DatasetInfo): Catalog entry of the dataset
+        annotator_name (str): Name of the annotator
+
+    The view is kept per annotator and dataset, so reruns reuse it until
+    the dataset or gold file is reloaded.
+
+    Returns:
+        RenderBundles or GoldInjectedBundles: The bundles in navigation order
+    """
+    gold = load_gold_set(dataset_info.gold_file) if dataset_info.gold_file else None
+    GOLD_SCORES.use(dataset_info.name, gold)
+    if not gold:
+        return bundles
+
+    gold_bundles = DataLoader(data_dir=os.path.dirname(dataset_info.gold_file)).get_render_bundles(
+        os.path.basename(dataset_info.gold_file), wait_for=len(gold) - 1
+    )
+    seed = f"{annotator_name}:{dataset_info.name}"
+    with _views_lock:
+        view = _views.get(seed)
+        if view is None or view.bundles is not bundles or view.gold_bundles is not gold_bundles:
+            view = _views[seed] = GoldInjectedBundles(bundles, gold_bundles, seed=seed)
+    return view
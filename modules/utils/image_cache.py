@@ -0,0 +1,107 @@
+# modules/utils/image_cache.py
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from io import BytesIO
+from modules.utils.perf import timed
+
+# Number of decoded images kept per process
+IMAGE_CACHE_SIZE = int(os.environ.get("LABELER_IMAGE_CACHE", "64"))
+
+# Seconds to wait for an image host before giving up
+IMAGE_TIMEOUT = 15
+
+# Add user-agent header to avoid getting blocked
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+@timed("image_cache.download")
+def download_image(image_url):
+    """Download and decode an image
+
+    Args:
+        image_url (str): URL of the image
+
+    Returns:
+        PIL.Image.Image: The decoded image
+    """
+    # Imported here so processes that never show an image do not load them
+    import requests
+    from PIL import Image
+
+    response = requests.get(image_url, headers=REQUEST_HEADERS, timeout=IMAGE_TIMEOUT)
+    response.raise_for_status()  # Raise exception for HTTP errors
+
+    image = Image.open(BytesIO(response.content))
+    image.load()  # Decode now rather than on first use
+    return image
+
+
+class ImageCache:
+    """Least-recently-used cache of decoded images, shared by every session
+
+    Concurrent requests for the same URL (for example a prefetch and the page
+    itself) share one download.
+    """
+
+    def __init__(self, max_items=IMAGE_CACHE_SIZE):
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._images = OrderedDict()
+        self._pending = {}
+
+    def __contains__(self, image_url):
+        with self._lock:
+            return image_url in self._images
+
+    def get(self, image_url):
+        """Get a decoded image, downloading it if it is not cached
+
+        Args:
+            image_url (str): URL of the image
+
+        Returns:
+            PIL.Image.Image: The decoded image
+
+        Raises:
+            Exception: If the image cannot be downloaded or decoded
+        """
+        with self._lock:
+            if image_url in self._images:
+                self._images.move_to_end(image_url)
+                return self._images[image_url]
+            pending = self._pending.get(image_url)
+            owner = pending is None
+            if owner:
+                pending = self._pending[image_url] = Future()
+
+        if not owner:
+            return pending.result()
+
+        try:
+            image = download_image(image_url)
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(image_url, None)
+
+        with self._lock:
+            self._images[image_url] = image
+            while len(self._images) > self.max_items:
+                self._images.popitem(last=False)
+        pending.set_result(image)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+
+# Images shared by every session of this process
+IMAGE_CACHE = ImageCache()
@@ -0,0 +1,143 @@
+# modules/utils/json_stream.py
+
+import codecs
+import json
+import re
+
+# Bytes read from the file at a time; doubled while a single record does not fit
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Longest partial token (literal, number or escape) that fails to decode only
+# because the buffer ends inside it
+_TRUNCATION_MARGIN = 16
+
+
+def _may_be_truncated(error, buffer):
+    """Whether a decode error can come from the element continuing past the buffer
+
+    Errors well before the end of the buffer mean the element is broken, so
+    the rest of the file is not read to find that out.
+    """
+    return error.msg.startswith("Unterminated string") or error.pos >= len(buffer) - _TRUNCATION_MARGIN
+
+
+def iter_json_array(file_path, chunk_size=CHUNK_SIZE):
+    """Parse the elements of a top-level JSON array one at a time
+
+    Only the current chunk of the file and the element being decoded are
+    held in memory, so the first records are available long before a large
+    file is read to the end. A file holding a single object yields it as
+    the only element.
+
+    Args:
+        file_path (str): Path of the JSON file
+        chunk_size (int, optional): Bytes read at a time. Defaults to CHUNK_SIZE.
+
+    Yields:
+        tuple: (byte offset, byte length, decoded element)
+
+    Raises:
+        json.JSONDecodeError: If the file is not a valid JSON array or object
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    byte_pos = 0
+    eof = False
+    read_size = chunk_size
+    started = False
+    single_object = False
+    # What may come next: "first" element or "]", a "value", a "separator"
+    # ("," or "]"), or only whitespace once the array is "closed"
+    expect = "first"
+
+    with open(file_path, 'rb') as f:
+        while True:
+            # Whitespace and separators are ASCII, one byte per character
+            end = _WHITESPACE.match(buffer, pos).end()
+            byte_pos += end - pos
+            pos = end
+
+            if pos >= len(buffer):
+                if eof:
+                    if started and expect != "closed":
+                        raise json.JSONDecodeError("Unterminated array", buffer, pos)
+                    return
+                data = f.read(read_size)
+                eof = not data
+                buffer = buffer[pos:] + text_decoder.decode(data, final=eof)
+                pos = 0
+                continue
+
+            char = buffer[pos]
+            if not started and char == "\ufeff":
+                # Byte order mark
+                pos += 1
+                byte_pos += 3
+                continue
+            if not started:
+                started = True
+                if char == "[":
+                    pos += 1
+                    byte_pos += 1
+                    continue
+                single_object = True
+                expect = "value"
+            elif expect == "closed":
+                raise json.JSONDecodeError("Extra data", buffer, pos)
+            elif char == "]" and expect in ("first", "separator"):
+                pos += 1
+                byte_pos += 1
+                expect = "closed"
+                continue
+            elif char == "," and expect == "separator":
+                pos += 1
+                byte_pos += 1
+                expect = "value"
+                continue
+            elif expect == "separator":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            elif char in ",]":
+                raise json.JSONDecodeError("Expecting value", buffer, pos)
+
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+                # A number or literal can look complete at the end of the buffer
+                if end == len(buffer) and not eof:
+                    raise json.JSONDecodeError("Element may continue", buffer, end)
+            except json.JSONDecodeError as e:
+                if eof or not _may_be_truncated(e, buffer):
+                    raise
+                # The element continues in the next chunk
+                data = f.read(read_size)
+                eof = not data
+                buffer = buffer[pos:] + text_decoder.decode(data, final=eof)
+                pos = 0
+                read_size *= 2
+                continue
+
+            read_size = chunk_size
+            length = len(buffer[pos:end].encode("utf-8"))
+            yield byte_pos, length, element
+            byte_pos += length
+            pos = end
+            expect = "closed" if single_object else "separator"
+
+
+def read_json_at(file_path, offset, length):
+    """Decode one element of a JSON file from its byte offset and length
+
+    Args:
+        file_path (str): Path of the JSON file
+        offset (int): Byte offset of the element, as yielded by iter_json_array
+        length (int): Byte length of the element
+
+    Returns:
+        The decoded element
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.read(length).decode("utf-8"))
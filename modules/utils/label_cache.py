@@ -0,0 +1,48 @@
+# modules/utils/label_cache.py
+
+import copy
+from modules.utils.perf import span
+from modules.utils.storage import get_label_store
+from modules.utils.schema import LABEL_SCHEMA, ValidationReport, filter_valid
+
+
+class SessionLabelCache:
+    """The session annotator's saved labels, indexed by post id
+
+    Each (annotator, dataset) label set is loaded from the label store once
+    per session and kept up to date by remember() on every save, so looking
+    up a post's label is a dict access instead of re-reading the label file.
+    Labels that do not match the label schema are left out and reported.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self.reports = {}
+
+    def index(self, annotator_name, dataset_option, output_dir):
+        """Saved labels keyed by post id, loaded on first use
+
+        Returns:
+            dict: post_id -> labeled item
+        """
+        key = (output_dir, annotator_name, dataset_option)
+        index = self._indexes.get(key)
+        if index is None:
+            with span("label_cache.load"):
+                labels = get_label_store(output_dir).load_labels(annotator_name, dataset_option)
+                report = self.reports[key] = ValidationReport(f"{annotator_name}/{dataset_option} labels")
+                index = self._indexes[key] = {item["post_id"]: item for item in filter_valid(labels, LABEL_SCHEMA, report)}
+        return index
+
+    def get(self, post_id, annotator_name, dataset_option, output_dir):
+        """Get the saved label of a post, or None if it was not labeled"""
+        return self.index(annotator_name, dataset_option, output_dir).get(post_id)
+
+    def remember(self, labeled_item, annotator_name, dataset_option, output_dir):
+        """Record a copy of a label saved by this session"""
+        self.index(annotator_name, dataset_option, output_dir)[labeled_item.get("post_id")] = copy.deepcopy(labeled_item)
+
+    def labeled_count(self, post_ids, annotator_name, dataset_option, output_dir):
+        """Number of the given posts that have a saved label"""
+        index = self.index(annotator_name, dataset_option, output_dir)
+        return sum(1 for post_id in post_ids if post_id in index)
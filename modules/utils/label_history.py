@@ -0,0 +1,219 @@
+# modules/utils/label_history.py
+
+import copy
+import json
+import os
+import threading
+from datetime import datetime
+
+# Label history files live in this subdirectory of the output directory
+HISTORY_DIR = "history"
+
+
+def diff_records(old, new, path=()):
+    """Field-level delta turning one label record into another
+
+    Nested dicts (such as the per-model evaluations) are compared key by
+    key; any other changed value is stored whole.
+
+    Args:
+        old (dict): The previous record
+        new (dict): The new record
+
+    Returns:
+        list: Operations, [path] to delete a key or [path, value] to set it
+    """
+    ops = []
+    for key in old:
+        if key not in new:
+            ops.append([list(path) + [key]])
+    for key, value in new.items():
+        if key in old:
+            previous = old[key]
+            if previous == value:
+                continue
+            if isinstance(previous, dict) and isinstance(value, dict):
+                ops.extend(diff_records(previous, value, path + (key,)))
+                continue
+        ops.append([list(path) + [key], value])
+    return ops
+
+
+def apply_delta(record, delta):
+    """Apply a delta from diff_records to a record in place
+
+    Args:
+        record (dict): The record to update
+        delta (list): The operations to apply
+
+    Returns:
+        dict: The updated record
+    """
+    for op in delta:
+        path = op[0]
+        parent = record
+        for key in path[:-1]:
+            child = parent.get(key)
+            if not isinstance(child, dict):
+                child = parent[key] = {}
+            parent = child
+        if len(op) == 1:
+            parent.pop(path[-1], None)
+        else:
+            parent[path[-1]] = copy.deepcopy(op[1])
+    return record
+
+
+def history_entries(previous, record, next_version):
+    """Entries to append to a post's history when a label is saved
+
+    The first saved version is stored whole; every later one only as a
+    delta. Posts labeled before history was kept get their previous label
+    as the base version first.
+
+    Args:
+        previous (dict): The label being replaced, or None
+        record (dict): The label being saved
+        next_version (int): Number of versions already in the post's history
+
+    Returns:
+        list: Entries to append, empty if nothing changed
+    """
+    saved_at = datetime.now().isoformat()
+    entries = []
+    if next_version == 0:
+        if previous is None:
+            return [{"version": 0, "saved_at": saved_at, "base": record}]
+        entries.append({"version": 0, "saved_at": previous.get("timestamp", saved_at), "base": previous})
+        next_version = 1
+
+    delta = diff_records(previous or {}, record)
+    if delta:
+        entries.append({"version": next_version, "saved_at": saved_at, "delta": delta})
+    return entries
+
+
+def reconstruct(entries, version=None):
+    """Rebuild a version of a label from its history entries
+
+    Args:
+        entries (list): The post's history entries, in version order
+        version (int, optional): Version to rebuild. Defaults to the latest.
+
+    Returns:
+        dict: The label as it was saved in that version, or None
+    """
+    record = None
+    for entry in entries:
+        if version is not None and entry["version"] > version:
+            break
+        if "base" in entry:
+            record = copy.deepcopy(entry["base"])
+        elif record is not None:
+            apply_delta(record, entry["delta"])
+    return record
+
+
+def describe_delta(delta):
+    """Human-readable lines for the changes of a delta"""
+    lines = []
+    for op in delta:
+        path = ".".join(str(key) for key in op[0])
+        lines.append(f"`{path}` removed" if len(op) == 1 else f"`{path}` → {json.dumps(op[1], ensure_ascii=False)}")
+    return lines
+
+
+def history_file_path(output_dir, annotator_name, dataset_option):
+    """Path of the append-only history file for an annotator and dataset"""
+    return os.path.join(output_dir, HISTORY_DIR, f"{annotator_name}_{dataset_option}_history.jsonl")
+
+
+class LabelHistoryFile:
+    """Append-only JSONL history of the labels in one label file
+
+    Each line is one history entry with the post_id added. The number of
+    versions and the byte span of every line are indexed per post
+    incrementally, reading only the lines appended since the last call, so
+    saves do not re-read the history and a post's history is read back
+    line by line. Appends must happen under the label file's lock.
+    """
+
+    # Indexes per history file, shared by every store of the process
+    _indexes = {}
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+
+    def _index(self):
+        """Versions and line spans per post, brought up to date with the file
+
+        Returns:
+            tuple: (versions, spans) keyed by the JSON-encoded post_id; spans
+                holds the (byte offset, byte length) of each entry line
+        """
+        with LabelHistoryFile._indexes_lock:
+            offset, versions, spans = LabelHistoryFile._indexes.get(self.path, (0, {}, {}))
+            if not os.path.exists(self.path):
+                return versions, spans
+            if os.path.getsize(self.path) < offset:
+                offset, versions, spans = 0, {}, {}
+
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+            # A line without its newline is still being written
+            start = 0
+            while True:
+                end = chunk.find(b"\n", start)
+                if end < 0:
+                    break
+                try:
+                    entry = json.loads(chunk[start:end])
+                except json.JSONDecodeError:
+                    entry = None
+                if isinstance(entry, dict):
+                    key = json.dumps(entry.get("post_id"))
+                    versions[key] = max(versions.get(key, 0), entry.get("version", 0) + 1)
+                    spans.setdefault(key, []).append((offset + start, end - start))
+                start = end + 1
+
+            LabelHistoryFile._indexes[self.path] = (offset + start, versions, spans)
+            return versions, spans
+
+    def append(self, previous, record):
+        """Record a saved label
+
+        Args:
+            previous (dict): The label being replaced, or None
+            record (dict): The label being saved
+        """
+        post_id = record.get("post_id")
+        versions, _ = self._index()
+        entries = history_entries(previous, record, versions.get(json.dumps(post_id), 0))
+        if not entries:
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps({"post_id": post_id, **entry}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def entries(self, post_id):
+        """History entries of one post, in version order"""
+        _, spans = self._index()
+        post_spans = list(spans.get(json.dumps(post_id), ()))
+        if not post_spans:
+            return []
+
+        entries = []
+        with open(self.path, 'rb') as f:
+            for offset, length in post_spans:
+                f.seek(offset)
+                try:
+                    entries.append(json.loads(f.read(length)))
+                except json.JSONDecodeError:
+                    continue
+        return sorted(entries, key=lambda entry: entry["version"])
@@ -0,0 +1,277 @@
+# modules/utils/perf.py
+
+import functools
+import os
+import threading
+import time
+from modules.utils.atomic_file import atomic_write
+
+# Profiling is off unless LABELER_PROFILE=1 is set, so the timing hooks cost
+# a single flag check per call in normal use
+_enabled = os.environ.get("LABELER_PROFILE", "") == "1"
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKET_BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Name of this app worker, added as a label to the exported metrics so the
+# files of several workers can be collected side by side (see deploy/run_workers.py)
+WORKER_NAME = os.environ.get("LABELER_WORKER", "")
+
+# Key used to keep per-session metrics in st.session_state
+SESSION_METRICS_KEY = "perf_metrics"
+
+
+def is_enabled():
+    """Check whether timing spans are being recorded"""
+    return _enabled
+
+
+def set_enabled(enabled):
+    """Turn recording of timing spans on or off for the whole process"""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKET_BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """Record one duration in seconds"""
+        for i, bound in enumerate(BUCKET_BOUNDS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the matching bucket
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: Estimated duration in seconds
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, bucket_count in zip(BUCKET_BOUNDS, self.buckets):
+            if bucket_count and seen + bucket_count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = bound
+        return self.max
+
+    def summary(self):
+        """Summarize the histogram in milliseconds
+
+        Returns:
+            dict: count, mean, p50, p95 and max
+        """
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.quantile(0.5),
+            "p95_ms": 1000 * self.quantile(0.95),
+            "max_ms": 1000 * self.max,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe collection of histograms keyed by span name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def summaries(self):
+        """Summaries of every histogram, sorted by total time spent
+
+        Returns:
+            list: (name, summary dict) pairs
+        """
+        with self._lock:
+            items = sorted(self.histograms.items(), key=lambda item: item[1].total, reverse=True)
+            return [(name, histogram.summary()) for name, histogram in items]
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+
+# Metrics shared by every session of this process
+PROCESS_METRICS = MetricsRegistry()
+
+
+def _session_metrics():
+    """Metrics registry of the current Streamlit session, if there is one"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        return None
+    if ctx is None:
+        return None
+
+    if SESSION_METRICS_KEY not in ctx.session_state:
+        ctx.session_state[SESSION_METRICS_KEY] = MetricsRegistry()
+    return ctx.session_state[SESSION_METRICS_KEY]
+
+
+def get_session_metrics():
+    """Get the metrics registry of the current session
+
+    Returns:
+        MetricsRegistry: The session registry, or an empty one outside a session
+    """
+    return _session_metrics() or MetricsRegistry()
+
+
+def record(name, seconds):
+    """Record a duration for a span in the process and session histograms"""
+    PROCESS_METRICS.observe(name, seconds)
+    session = _session_metrics()
+    if session is not None:
+        session.observe(name, seconds)
+
+
+class _Span:
+    """Context manager timing a block of code"""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    """Context manager that does nothing, used while profiling is off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Time a block of code
+
+    Example:
+        with span("label_page.render_tab"):
+            ...
+
+    Args:
+        name (str): Name of the span
+
+    Returns:
+        A context manager recording the block's duration
+    """
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def timed(name):
+    """Decorator timing every call of a function
+
+    Args:
+        name (str): Name of the span
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def render_prometheus(registry=PROCESS_METRICS):
+    """Render the histograms in the Prometheus text exposition format
+
+    Args:
+        registry (MetricsRegistry, optional): Registry to render. Defaults to the process metrics.
+
+    Returns:
+        str: The metrics text
+    """
+    lines = [
+        "# HELP labeler_span_seconds Duration of instrumented code spans.",
+        "# TYPE labeler_span_seconds histogram",
+    ]
+    worker = f',worker="{WORKER_NAME}"' if WORKER_NAME else ""
+    with registry._lock:
+        for name, histogram in sorted(registry.histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKET_BOUNDS, histogram.buckets):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'labeler_span_seconds_bucket{{span="{name}"{worker},le="{le}"}} {cumulative}')
+            lines.append(f'labeler_span_seconds_sum{{span="{name}"{worker}}} {histogram.total}')
+            lines.append(f'labeler_span_seconds_count{{span="{name}"{worker}}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+
+_last_export = [0.0]
+_export_lock = threading.Lock()
+
+
+def export_prometheus_file(file_path, min_interval=10.0):
+    """Write the process metrics to a file for a Prometheus textfile collector
+
+    The file is replaced atomically and written at most once per interval,
+    by whichever session's rerun gets there first. The metrics are those of
+    this process, so every app worker needs its own file.
+
+    Args:
+        file_path (str): Path of the .prom file
+        min_interval (float, optional): Minimum seconds between writes. Defaults to 10.
+
+    Returns:
+        bool: True if the file was written
+    """
+    with _export_lock:
+        now = time.monotonic()
+        if now - _last_export[0] < min_interval:
+            return False
+        _last_export[0] = now
+
+    text = render_prometheus()
+    atomic_write(file_path, lambda f: f.write(text))
+    return True
@@ -0,0 +1,95 @@
+# modules/utils/prefetch.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules.utils.image_cache import IMAGE_CACHE
+
+# Number of posts prefetched on each side of the current one (0 disables prefetching)
+PREFETCH_NEIGHBORS = int(os.environ.get("LABELER_PREFETCH", "2"))
+
+# Background workers shared by every session of this process
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+
+def neighbor_indexes(index, size, neighbors=PREFETCH_NEIGHBORS):
+    """Indexes of the posts around the current one, nearest first
+
+    The next post comes before the previous one at each distance, matching
+    the usual forward navigation.
+
+    Args:
+        index (int): Index of the current post
+        size (int): Number of posts in the dataset
+        neighbors (int, optional): Posts on each side. Defaults to PREFETCH_NEIGHBORS.
+
+    Returns:
+        list: Indexes inside the dataset
+    """
+    indexes = []
+    for distance in range(1, neighbors + 1):
+        for candidate in (index + distance, index - distance):
+            if 0 <= candidate < size:
+                indexes.append(candidate)
+    return indexes
+
+
+class NeighborPrefetcher:
+    """Prepares the posts around the current one in the background
+
+    Render bundles are already compiled for the whole dataset and saved
+    labels are indexed per session (see modules/utils/label_cache.py), so
+    prefetching covers what is still loaded per post: the decoded image, in
+    the shared image cache. One prefetcher lives in each session.
+    """
+
+    def __init__(self, neighbors=PREFETCH_NEIGHBORS):
+        self.neighbors = neighbors
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = {}
+
+    def schedule(self, bundles, index):
+        """Prefetch the neighbors of a post
+
+        Work for posts that are no longer neighbors is cancelled; posts
+        already prefetched are not fetched again.
+
+        Args:
+            bundles (RenderBundles): Render bundles of the dataset
+            index (int): Index of the current post
+        """
+        if self.neighbors <= 0:
+            return
+
+        # Image URLs of the neighbors, nearest first
+        wanted = [bundles[i].image_url for i in neighbor_indexes(index, len(bundles), self.neighbors)]
+        wanted = [url for url in dict.fromkeys(wanted) if url]
+
+        with self._lock:
+            for url in [url for url in self._futures if url not in wanted]:
+                self._futures.pop(url).cancel()
+
+            generation = self._generation
+            for url in wanted:
+                if url not in self._futures and url not in IMAGE_CACHE:
+                    self._futures[url] = _executor.submit(self._prefetch, generation, url)
+
+    def cancel(self):
+        """Cancel all pending prefetches, e.g. when the annotator jumps elsewhere
+
+        Queued downloads are dropped; a download already running completes.
+        """
+        with self._lock:
+            self._generation += 1
+            for future in self._futures.values():
+                future.cancel()
+            self._futures = {}
+
+    def _prefetch(self, generation, image_url):
+        if generation != self._generation:
+            return
+        try:
+            IMAGE_CACHE.get(image_url)
+        except Exception:
+            pass  # The page shows the error if the image is opened
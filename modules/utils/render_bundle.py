@@ -0,0 +1,330 @@
+# modules/utils/render_bundle.py
+
+import ast
+import threading
+from array import array
+from modules.utils.json_stream import read_json_at
+from modules.utils.perf import timed
+from modules.utils.schema import RESPONSE_FIELD_PATTERN
+
+
+def prepare_html(value):
+    """Turn an HTML fragment into the string passed to st.markdown
+
+    Args:
+        value: HTML content, usually a string
+
+    Returns:
+        str: The display-ready string, or None if there is nothing to show
+    """
+    if value is None:
+        return None
+
+    # If it's not a string (e.g., it's a dictionary or other object), convert to string
+    if not isinstance(value, str):
+        try:
+            value = str(value)
+        except Exception:
+            return None
+
+    if not value.strip():
+        return None
+
+    return value.replace("\n", " ")
+
+
+def _parse_literal(value):
+    """Parse dict and list fields that raw exports store as Python repr strings"""
+    if isinstance(value, str) and value[:1] in ("{", "["):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    return value
+
+
+class RenderBundles:
+    """Display-ready content of every post of a dataset
+
+    Each attribute is one column with an entry per post, so a dataset is a
+    handful of lists and integer arrays rather than one dict per post. The
+    display-ready responses and their raw lengths are kept in one column per
+    (model, with_image) slot, the lengths standing in for the precomputed
+    statistics of datasets without them; the raw text is only needed to
+    compare two responses, so it is
+    read back from the source file by the record's byte offset instead of
+    being kept in memory a second time. Use bundles[i] to get the
+    RenderBundle of a post.
+
+    Bundles can be filled incrementally while a file is streamed (see
+    DataLoader.get_render_bundles): extend() appends posts, discovering new
+    models as their response columns appear, and finish() marks the end.
+    Readers only see posts whose columns are complete. Records are expected
+    to match DATASET_SCHEMA (see modules/utils/schema.py); the ones that
+    did not are listed in `validation`. Precomputed response statistics
+    (see modules/utils/response_stats.py) are matched to the posts by their
+    offset in the file.
+    """
+
+    __slots__ = (
+        "models", "field_map", "post_ids", "titles", "headers", "bodies",
+        "creation_dates", "scores", "tags", "image_urls", "accepted_answers",
+        "response_htmls", "response_sizes", "source",
+        "record_offsets", "record_lengths", "stats", "stats_rows", "validation", "complete", "error",
+        "_slots", "_slot_fields", "_canonical", "_seen_keys", "_changed",
+    )
+
+    def __init__(self, validation=None, stats=None, source=None):
+        self.models = []
+        self.field_map = {}
+        self.validation = validation
+        self.stats = stats
+        # Path of the file the bundles are streamed from
+        self.source = source
+        self.complete = False
+        self.error = None
+
+        self.post_ids = []
+        self.titles = []
+        self.headers = []
+        self.bodies = []
+        self.creation_dates = []
+        self.scores = []
+        self.tags = []
+        self.image_urls = []
+        self.accepted_answers = []
+
+        # One list per response slot, and the raw length of each response
+        self.response_htmls = []
+        self.response_sizes = []
+
+        # Position of each post in its source file, when streamed from one
+        self.record_offsets = array("Q")
+        self.record_lengths = array("Q")
+        # Row of each post in the response statistics, -1 without one
+        self.stats_rows = array("q")
+
+        self._slots = {}
+        self._slot_fields = []
+        self._canonical = {}
+        self._seen_keys = set()
+        self._changed = threading.Condition()
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def __getitem__(self, index):
+        size = len(self)
+        if not -size <= index < size:
+            raise IndexError(index)
+        return RenderBundle(self, index % size)
+
+    def _discover_models(self, item):
+        """Add response slots for model columns seen for the first time"""
+        for key in item:
+            if key in self._seen_keys:
+                continue
+            self._seen_keys.add(key)
+
+            match = RESPONSE_FIELD_PATTERN.match(key)
+            if not match:
+                continue
+            model = self._canonical.setdefault(match.group("model").lower(), match.group("model"))
+            with_image = match.group("modality").lower() == "with"
+            if (model, with_image) in self.field_map:
+                continue
+            self.field_map[(model, with_image)] = key
+            if model not in self.models:
+                self.models.append(model)
+
+            # Earlier posts had no such column; the slot is only published
+            # once its columns cover every post
+            size = len(self.post_ids)
+            placeholder = f"No {model} response available for this question."
+            self.response_htmls.append([placeholder] * size)
+            self.response_sizes.append(array("I", [0]) * size)
+            self._slot_fields.append((model, key))
+            self._slots[(model, with_image)] = len(self._slot_fields) - 1
+
+    def extend(self, records, spans=None):
+        """Append posts
+
+        Args:
+            records (iterable): Validated dataset records
+            spans (iterable, optional): (byte offset, byte length) of each record in its file
+        """
+        spans = iter(spans) if spans is not None else None
+        for item in records:
+            self._discover_models(item)
+
+            if spans is not None:
+                offset, length = next(spans)
+                self.record_offsets.append(offset)
+                self.record_lengths.append(length)
+                self.stats_rows.append(self.stats.row(offset) if self.stats is not None else -1)
+            else:
+                self.stats_rows.append(-1)
+
+            for slot, (model, field_name) in enumerate(self._slot_fields):
+                response = item.get(field_name)
+                self.response_sizes[slot].append(len(response) if isinstance(response, str) else 0)
+                if not response:
+                    response = f"No {model} response available for this question."
+                self.response_htmls[slot].append(prepare_html(response))
+
+            post_id = item["post_id"]
+            self.titles.append(item["title"] or "Untitled Question")
+            self.headers.append(f"Question ID: {post_id}")
+
+            self.bodies.append(prepare_html(item["body"]))
+
+            self.creation_dates.append(f"**Creation Date:** {item.get('creation_date', 'Unknown')}")
+            self.scores.append(f"**Score:** {item.get('score', 'Unknown')}")
+
+            post_tags = _parse_literal(item.get("tags"))
+            if isinstance(post_tags, list) and post_tags:
+                self.tags.append(", ".join(post_tags))
+            else:
+                self.tags.append(post_tags or "No tags")
+
+            self.image_urls.append(item.get("image_link") or "")
+
+            answer = _parse_literal(item.get("accepted_answer"))
+            self.accepted_answers.append(prepare_html(answer.get("body") if isinstance(answer, dict) else None))
+
+            # Appended last: the post becomes visible once every column has it
+            self.post_ids.append(post_id)
+
+        with self._changed:
+            self._changed.notify_all()
+
+    def finish(self, error=None):
+        """Mark the bundles as complete
+
+        Args:
+            error (str, optional): Why loading stopped early. Defaults to None.
+        """
+        self.error = error
+        self.complete = True
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for(self, index, timeout=None):
+        """Wait until a post is available or loading has finished
+
+        Args:
+            index (int): Index of the post
+            timeout (float, optional): Seconds to wait at most. Defaults to None.
+
+        Returns:
+            bool: True if the post is available
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: len(self) > index or self.complete, timeout)
+        return len(self) > index
+
+    def record(self, index):
+        """Read the source record of a post from its file
+
+        Args:
+            index (int): Index of the post
+
+        Returns:
+            dict: The record, or None for bundles built in memory or a file
+                that changed since it was streamed
+        """
+        if self.source is None or index >= len(self.post_ids) or index >= len(self.record_offsets):
+            return None
+        try:
+            record = read_json_at(self.source, self.record_offsets[index], self.record_lengths[index])
+        except (OSError, ValueError):
+            return None
+        return record if isinstance(record, dict) and record.get("post_id") == self.post_ids[index] else None
+
+    def slot(self, model_name, with_image):
+        """Response slot of a (model, with_image) pair, or None if the dataset has none"""
+        return self._slots.get((model_name, bool(with_image)))
+
+
+def _column(name):
+    return property(lambda bundle: getattr(bundle.bundles, name)[bundle.index])
+
+
+class RenderBundle:
+    """Read-only view of one post in RenderBundles"""
+
+    __slots__ = ("bundles", "index")
+
+    # Gold posts (see modules/utils/gold.py) are attention checks, not dataset posts
+    gold = False
+
+    def __init__(self, bundles, index):
+        self.bundles = bundles
+        self.index = index
+
+    post_id = _column("post_ids")
+    title = _column("titles")
+    header = _column("headers")
+    body = _column("bodies")
+    creation_date = _column("creation_dates")
+    score = _column("scores")
+    tags = _column("tags")
+    image_url = _column("image_urls")
+    accepted_answer = _column("accepted_answers")
+
+    def response(self, model_name, with_image=False):
+        """The raw response text of a model, or a placeholder if it is missing
+
+        The text is read from the source file; bundles without one fall back
+        to the display-ready response.
+        """
+        field_name = self.bundles.field_map.get((model_name, bool(with_image)))
+        if field_name is None:
+            return f"No {model_name} response available for this question."
+        record = self.bundles.record(self.index)
+        if record is None:
+            return self.response_html(model_name, with_image)
+        return record.get(field_name) or f"No {model_name} response available for this question."
+
+    def response_html(self, model_name, with_image=False):
+        """The display-ready response of a model"""
+        slot = self.bundles.slot(model_name, with_image)
+        if slot is None:
+            return f"No {model_name} response available for this question."
+        return self.bundles.response_htmls[slot][self.index]
+
+    def response_stats(self, model_name, with_image=False):
+        """Precomputed statistics of a model's response
+
+        Returns:
+            ResponseStats: The statistics, or None if they were not precomputed
+        """
+        bundles = self.bundles
+        field_name = bundles.field_map.get((model_name, bool(with_image)))
+        if bundles.stats is None or field_name is None:
+            return None
+        return bundles.stats.get(bundles.stats_rows[self.index], field_name)
+
+    def response_size(self, model_name, with_image=False):
+        """Length of a model's raw response in characters, 0 if it is missing"""
+        slot = self.bundles.slot(model_name, with_image)
+        if slot is None:
+            return 0
+        return self.bundles.response_sizes[slot][self.index]
+
+
+@timed("render_bundle.build")
+def build_render_bundles(dataset, validation=None):
+    """Compile dataset records into render bundles
+
+    Args:
+        dataset (list): The validated dataset records
+        validation (ValidationReport, optional): Result of validating the records. Defaults to None.
+
+    Returns:
+        RenderBundles: The bundles of every post, in dataset order
+    """
+    bundles = RenderBundles(validation)
+    bundles.extend(dataset or [])
+    bundles.finish()
+    return bundles
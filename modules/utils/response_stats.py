@@ -0,0 +1,277 @@
+# modules/utils/response_stats.py
+#
+# Precomputes text statistics of every model response in a dataset file,
+# shown to annotators beside each response to help judge conciseness.
+# The statistics are computed offline once per dataset version and stored
+# next to it as <dataset>.stats.npz; the app only reads them.
+#
+# Usage:
+#   python -m modules.utils.response_stats Faiz_FJ.json FJ_only.json
+#   python -m modules.utils.response_stats --data-dir /srv/datasets big.json
+
+import argparse
+import hashlib
+import os
+import re
+import time
+from collections import namedtuple
+import numpy as np
+from modules.utils.render_bundle import _parse_literal
+from modules.utils.schema import RESPONSE_FIELD_PATTERN
+
+# Records whose responses are vectorized together
+BATCH_SIZE = 128
+
+# Dimensions of the token hash vectors
+HASH_DIMENSIONS = 4096
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+
+ResponseStats = namedtuple("ResponseStats", "chars words code_blocks answer_overlap image_similarity")
+ResponseStats.__doc__ = """Statistics of one response
+
+chars and words count the raw response; code_blocks counts fenced (```)
+and <pre> blocks; answer_overlap is the share of the response's words
+found in the accepted answer; image_similarity is the cosine similarity of
+the word counts of the model's with- and without-image responses. The two
+ratios are None when there is nothing to compare with.
+"""
+
+
+def stats_file_path(file_path):
+    """Path of the statistics file stored next to a dataset file"""
+    return os.path.splitext(file_path)[0] + ".stats.npz"
+
+
+def source_fingerprint(file_path, sample=1 << 20):
+    """Cheap fingerprint of a dataset file: its size and a hash of its ends
+
+    Modification times change on checkout, so they are not used.
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(sample))
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - sample))
+        digest.update(f.read(sample))
+    return f"{size}:{digest.hexdigest()}"
+
+
+def _tokens(text):
+    return _TOKEN_PATTERN.findall(_TAG_PATTERN.sub(" ", text).lower()) if text else []
+
+
+def _code_blocks(text):
+    return text.count("```") // 2 + text.count("<pre") if text else 0
+
+
+def _hash_vectors(token_lists):
+    """Word count vectors of several texts, hashed into HASH_DIMENSIONS buckets"""
+    vectors = np.zeros((len(token_lists), HASH_DIMENSIONS), dtype=np.float32)
+    sizes = [len(tokens) for tokens in token_lists]
+    if not sum(sizes):
+        return vectors
+
+    # Token IDs over the batch's vocabulary, spread over the buckets
+    _, ids = np.unique(np.array([token for tokens in token_lists for token in tokens]), return_inverse=True)
+    buckets = (ids.astype(np.uint64) * np.uint64(2654435761) % np.uint64(HASH_DIMENSIONS)).astype(np.int64)
+    rows = np.repeat(np.arange(len(token_lists)), sizes)
+    np.add.at(vectors, (rows, buckets), 1)
+    return vectors
+
+
+def compute_batch_stats(records, fields):
+    """Statistics of the responses of a batch of records
+
+    Args:
+        records (list): Dataset records
+        fields (list): Response field names, as matched by RESPONSE_FIELD_PATTERN
+
+    Returns:
+        dict: Arrays of shape (records, fields) named like the ResponseStats fields
+    """
+    count, width = len(records), len(fields)
+    responses = [record.get(field) or "" for record in records for field in fields]
+    answers = []
+    for record in records:
+        answer = _parse_literal(record.get("accepted_answer"))
+        answers.append((answer.get("body") if isinstance(answer, dict) else None) or "")
+
+    # Hashed together so responses and answers share the bucket of each word
+    tokens = [_tokens(text) for text in responses]
+    all_vectors = _hash_vectors(tokens + [_tokens(text) for text in answers])
+    vectors = all_vectors[:len(tokens)].reshape(count, width, HASH_DIMENSIONS)
+    answer_vectors = all_vectors[len(tokens):]
+
+    chars = np.array([len(text) for text in responses], dtype=np.uint32).reshape(count, width)
+    words = np.array([len(words) for words in tokens], dtype=np.uint32).reshape(count, width)
+    code_blocks = np.array([_code_blocks(text) for text in responses], dtype=np.uint16).reshape(count, width)
+
+    # Share of response words also in the accepted answer
+    shared = np.minimum(vectors, answer_vectors[:, None, :]).sum(axis=2)
+    has_answer = answer_vectors.any(axis=1)[:, None] & (words > 0)
+    answer_overlap = np.where(has_answer, shared / np.maximum(words, 1), np.nan).astype(np.float32)
+
+    # Cosine similarity between the with- and without-image response of each model
+    norms = np.linalg.norm(vectors, axis=2)
+    image_similarity = np.full((count, width), np.nan, dtype=np.float32)
+    pairs = {}
+    for column, field in enumerate(fields):
+        match = RESPONSE_FIELD_PATTERN.match(field)
+        pairs.setdefault(match.group("model").lower(), {})[match.group("modality").lower()] = column
+    for columns in pairs.values():
+        if len(columns) != 2:
+            continue
+        with_column, without_column = columns["with"], columns["without"]
+        dot = (vectors[:, with_column] * vectors[:, without_column]).sum(axis=1)
+        norm = norms[:, with_column] * norms[:, without_column]
+        similarity = np.where(norm > 0, dot / np.maximum(norm, 1e-9), np.nan)
+        image_similarity[:, with_column] = similarity
+        image_similarity[:, without_column] = similarity
+
+    return {
+        "chars": chars,
+        "words": words,
+        "code_blocks": code_blocks,
+        "answer_overlap": answer_overlap,
+        "image_similarity": image_similarity,
+    }
+
+
+def precompute_response_stats(loader, filename):
+    """Compute the response statistics of a dataset file and store them next to it
+
+    Args:
+        loader (DataLoader): Loader of the data directory
+        filename (str): Name of the data file
+
+    Returns:
+        str: Path of the statistics file
+    """
+    file_path = os.path.join(loader.data_dir, filename)
+    fingerprint = source_fingerprint(file_path)
+
+    offsets = []
+    batches = []
+    batch = []
+
+    def flush():
+        if batch:
+            fields = sorted({key for record in batch for key in record if RESPONSE_FIELD_PATTERN.match(key)})
+            batches.append((fields, compute_batch_stats(batch, fields)))
+            batch.clear()
+
+    for offset, _, record in loader.iter_records(filename, spans=True):
+        offsets.append(offset)
+        batch.append(record)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    # Batches may have different response columns; align them on their union
+    fields = sorted({field for batch_fields, _ in batches for field in batch_fields})
+    columns = {field: index for index, field in enumerate(fields)}
+    arrays = {}
+    for name in ResponseStats._fields:
+        dtype = batches[0][1][name].dtype if batches else np.float32
+        fill = np.nan if np.issubdtype(dtype, np.floating) else 0
+        arrays[name] = np.full((len(offsets), len(fields)), fill, dtype=dtype)
+
+    row = 0
+    for batch_fields, stats in batches:
+        size = len(next(iter(stats.values())))
+        indexes = [columns[field] for field in batch_fields]
+        for name, values in stats.items():
+            arrays[name][row:row + size, indexes] = values
+        row += size
+
+    path = stats_file_path(file_path)
+    temp_path = path + ".tmp.npz"
+    np.savez_compressed(
+        temp_path,
+        offsets=np.array(offsets, dtype=np.uint64),
+        fields=np.array(fields, dtype=str),
+        source=np.array(fingerprint),
+        **arrays,
+    )
+    os.replace(temp_path, path)
+    return path
+
+
+class ResponseStatsTable:
+    """Precomputed response statistics of one dataset file
+
+    Rows are found by the byte offset of their record in the dataset file,
+    as recorded by the streaming loader.
+    """
+
+    def __init__(self, data):
+        self.offsets = data["offsets"]
+        self.columns = {str(field): index for index, field in enumerate(data["fields"])}
+        self.arrays = [data[name] for name in ResponseStats._fields]
+
+    def row(self, offset):
+        """Row of the record at a byte offset, or -1 if it has no statistics"""
+        row = int(np.searchsorted(self.offsets, offset))
+        if row < len(self.offsets) and self.offsets[row] == offset:
+            return row
+        return -1
+
+    def get(self, row, field):
+        """Statistics of one response, or None if they were not computed
+
+        Args:
+            row (int): Row from row()
+            field (str): Response field name
+        """
+        column = self.columns.get(field)
+        if row < 0 or column is None:
+            return None
+        values = [array[row, column] for array in self.arrays]
+        values = [None if isinstance(value, np.floating) and np.isnan(value) else value.item() for value in values]
+        return ResponseStats(*values)
+
+
+def load_response_stats(file_path):
+    """Load the statistics stored next to a dataset file
+
+    Args:
+        file_path (str): Path of the dataset file
+
+    Returns:
+        ResponseStatsTable: The statistics, or None if there are none for
+            the current version of the file
+    """
+    path = stats_file_path(file_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path) as data:
+            if str(data["source"]) != source_fingerprint(file_path):
+                print(f"Response statistics are outdated, run: python -m modules.utils.response_stats {os.path.basename(file_path)}")
+                return None
+            return ResponseStatsTable({key: data[key] for key in data.files})
+    except Exception as e:
+        print(f"Error loading response statistics {path}: {str(e)}")
+        return None
+
+
+def main():
+    from modules.utils.data_loader import DataLoader
+
+    parser = argparse.ArgumentParser(description="Precompute the response statistics of dataset files")
+    parser.add_argument("files", nargs="+", help="data files, e.g. Faiz_FJ.json FJ_only.json")
+    parser.add_argument("--data-dir", default="data/final_files", help="directory with the data files")
+    args = parser.parse_args()
+
+    loader = DataLoader(data_dir=args.data_dir)
+    for filename in args.files:
+        started = time.perf_counter()
+        path = precompute_response_stats(loader, filename)
+        print(f"{filename}: wrote {path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+# modules/utils/rubric.py
+
+import copy
+
+# Declarative definition of the evaluation rubric used for every model response.
+#
+# Each criterion describes one question of the form:
+#   name       - short name, used in widget keys and export column names
+#   path       - where the answer is stored in the evaluation dict
+#   widget     - "yes_no", "multiselect", "rating" or "text"
+#   default    - value used before the annotator answers
+#   heading    - section heading (top-level criteria only)
+#   prompt     - hint shown above the widget
+#   label      - widget label
+#   options    - choices for multiselect and rating widgets
+#   summary    - preview line, "{value}" is replaced by the formatted answer
+#   show_if    - for follow-up questions: the parent answer (yes_no) or the
+#                parent option (multiselect) that makes the question visible
+#   shown_flag - path that records whether the follow-up question was visible
+#   children   - nested follow-up questions
+#
+# Labels may use "{model}", which is replaced by the evaluated model's name.
+RUBRIC = [
+    {
+        "name": "correct",
+        "path": ("correctness", "is_correct"),
+        "widget": "yes_no",
+        "default": True,
+        "heading": "1. Is the answer generated by {model} correct?",
+        "label": "Is the {model} answer correct?",
+        "summary": "**Correctness**: {value}",
+        "summary_labels": ("Correct", "Incorrect"),
+        "children": [
+            {
+                "name": "correct_issues",
+                "path": ("correctness", "issues"),
+                "widget": "multiselect",
+                "show_if": False,
+                "prompt": "If not, what are its issues?",
+                "label": "Select all issues that apply:",
+                "options": ["Incorrect (Factual)", "Incorrect (Code)", "Incorrect (Concept)", "Incorrect (Terminology)"],
+                "summary": "- Issues: {value}",
+                "children": [
+                    {
+                        "name": "code_issues_types",
+                        "path": ("code_issues", "types"),
+                        "widget": "multiselect",
+                        "show_if": "Incorrect (Code)",
+                        "shown_flag": ("code_issues", "has_issues"),
+                        "prompt": "If any code issues, what are the issues?",
+                        "label": "Select all code issues that apply:",
+                        "options": ["Syntax Error", "Non-Functional", "Runtime Error"],
+                        "summary": "- Code Issues: {value}",
+                        "children": [
+                            {
+                                "name": "non_functional_types",
+                                "path": ("code_issues", "non_functional_types"),
+                                "widget": "multiselect",
+                                "show_if": "Non-Functional",
+                                "prompt": "Select specific non-functional issues:",
+                                "label": "Select all that apply:",
+                                "options": ["Wrong API/Library/Function", "Wrong Logic", "Incomplete"],
+                                "summary": "  - Non-Functional Types: {value}",
+                            },
+                        ],
+                    },
+                ],
+            },
+        ],
+    },
+    {
+        "name": "consistent",
+        "path": ("consistency", "is_consistent"),
+        "widget": "yes_no",
+        "default": True,
+        "heading": "2. Is the answer generated by {model} Consistent?",
+        "label": "Is the {model} answer consistent?",
+        "summary": "**Consistency**: {value}",
+        "summary_labels": ("Consistent", "Inconsistent"),
+        "children": [
+            {
+                "name": "consistency_issues",
+                "path": ("consistency", "issues"),
+                "widget": "multiselect",
+                "show_if": False,
+                "prompt": "If not, what are its issues?",
+                "label": "Select all issues that apply:",
+                "options": ["Inconsistency (Factual)", "Inconsistency (Code)", "Inconsistency (Concept)",
+                            "Inconsistency (Terminology)", "Inconsistency (Number of solutions)"],
+                "summary": "- Issues: {value}",
+            },
+        ],
+    },
+    {
+        "name": "comprehensive",
+        "path": ("is_comprehensive",),
+        "widget": "yes_no",
+        "default": True,
+        "heading": "3. Is the answer generated by {model} comprehensive?",
+        "label": "Select one:",
+        "summary": "**Comprehensiveness**: {value}",
+        "summary_labels": ("Comprehensive", "Not Comprehensive"),
+    },
+    {
+        "name": "concise",
+        "path": ("conciseness", "is_concise"),
+        "widget": "yes_no",
+        "default": True,
+        "heading": "4. Is the answer concise?",
+        "label": "Select one:",
+        "summary": "**Conciseness**: {value}",
+        "summary_labels": ("Concise", "Not Concise"),
+        "children": [
+            {
+                "name": "conciseness_issues",
+                "path": ("conciseness", "issues"),
+                "widget": "multiselect",
+                "show_if": False,
+                "prompt": "If not, what are the issues?",
+                "label": "Select all issues that apply:",
+                "options": ["Not Concise (Redundant)", "Not Concise (Excess)", "Not Concise (Irrelevant)"],
+                "summary": "- Issues: {value}",
+            },
+        ],
+    },
+    {
+        "name": "usefulness",
+        "path": ("usefulness_rating",),
+        "widget": "rating",
+        "default": 3,
+        "heading": "5. Usefulness Rating:",
+        "prompt": "On a scale of 1 to 5, how useful is the answer?",
+        "label": "Select a rating:",
+        "options": [1, 2, 3, 4, 5],
+        "summary": "**Usefulness Rating**: {value}/5",
+    },
+    {
+        "name": "notes",
+        "path": ("notes",),
+        "widget": "text",
+        "default": "",
+        "heading": "Additional Notes",
+        "label": "Any additional comments or observations about {model}'s response:",
+        "summary": "**Notes**: {value}",
+    },
+]
+
+# Value a question holds while it is hidden, per widget type
+EMPTY_VALUES = {
+    "yes_no": True,
+    "multiselect": [],
+    "rating": 3,
+    "text": "",
+}
+
+# Marker for answers that are absent from an evaluation
+_MISSING = object()
+
+# Key of the touched-field bitmask of an evaluation: bit i is set once the
+# annotator explicitly answered field i (in CompiledRubric.fields order).
+# Labels saved before the mask was recorded have no such key.
+TOUCHED_KEY = "touched"
+
+# Widgets whose question starts with a preset answer the annotator can leave as is
+PRESET_WIDGETS = ("yes_no", "rating")
+
+# Python types accepted for each widget type
+VALUE_TYPES = {
+    "yes_no": bool,
+    "multiselect": list,
+    "rating": int,
+    "text": str,
+}
+
+
+def _make_getter(path, default):
+    """Build a function reading a nested value from an evaluation dict"""
+    if len(path) == 1:
+        key = path[0]
+        return lambda data: data.get(key, default)
+
+    outer, inner = path[0], path[1]
+    if len(path) == 2:
+        def getter(data):
+            value = data.get(outer)
+            return value.get(inner, default) if isinstance(value, dict) else default
+        return getter
+
+    def getter(data):
+        for key in path:
+            if not isinstance(data, dict) or key not in data:
+                return default
+            data = data[key]
+        return data
+    return getter
+
+
+class RubricField:
+    """One compiled question of the rubric"""
+
+    def __init__(self, spec, index, depth, parent):
+        self.name = spec["name"]
+        self.path = tuple(spec["path"])
+        self.widget = spec["widget"]
+        self.options = list(spec.get("options", []))
+        self.default = copy.deepcopy(spec.get("default", EMPTY_VALUES[self.widget]))
+        self.empty = EMPTY_VALUES[self.widget]
+        self.heading = spec.get("heading")
+        self.prompt = spec.get("prompt")
+        self.label = spec.get("label", "")
+        self.summary = spec.get("summary")
+        self.summary_labels = spec.get("summary_labels")
+        self.show_if = spec.get("show_if")
+        self.shown_flag = tuple(spec["shown_flag"]) if spec.get("shown_flag") else None
+        self.index = index
+        self.depth = depth
+        self.parent = parent
+        self.children = []
+        self.get = _make_getter(self.path, self.default)
+        self.get_raw = _make_getter(self.path, _MISSING)
+
+    def is_shown(self, parent_value):
+        """Check whether this question is visible given its parent's answer
+
+        Args:
+            parent_value: Current answer of the parent question
+
+        Returns:
+            bool: True if the question should be shown
+        """
+        if self.parent is None:
+            return True
+        if self.parent.widget == "multiselect":
+            return self.show_if in parent_value
+        return parent_value == self.show_if
+
+    def format_value(self, value):
+        """Format an answer for the evaluation preview"""
+        if self.summary_labels:
+            return self.summary_labels[0] if value else self.summary_labels[1]
+        if isinstance(value, list):
+            return ", ".join(value)
+        return value
+
+
+class CompiledRubric:
+    """Rubric compiled into flat field tables for rendering, validation and export
+
+    Fields are stored depth-first in render order, so a single forward pass
+    over `fields` visits every question after its parent. The compact state
+    of an evaluation is the tuple of answers in that same order.
+    """
+
+    def __init__(self, spec):
+        self.fields = []
+        self.roots = []
+        for item in spec:
+            self.roots.append(self._compile(item, depth=0, parent=None))
+        self.fields = tuple(self.fields)
+        self.by_name = {field.name: field for field in self.fields}
+        # Always visible questions with a preset answer, the ones a default-biased
+        # annotator leaves untouched
+        self.preset_mask = sum(1 << field.index for field in self.roots if field.widget in PRESET_WIDGETS)
+        self._template = self._build_template()
+
+    def _compile(self, spec, depth, parent):
+        field = RubricField(spec, len(self.fields), depth, parent)
+        self.fields.append(field)
+        for child in spec.get("children", []):
+            field.children.append(self._compile(child, depth + 1, field))
+        return field
+
+    def _build_template(self):
+        template = {}
+        for field in self.fields:
+            self._set_path(template, field.path, copy.deepcopy(field.default))
+            if field.shown_flag:
+                self._set_path(template, field.shown_flag, False)
+        template[TOUCHED_KEY] = 0
+        return template
+
+    @staticmethod
+    def _set_path(data, path, value):
+        for key in path[:-1]:
+            data = data.setdefault(key, {})
+        data[path[-1]] = value
+
+    def default_evaluation(self):
+        """Create a fresh evaluation with every question at its default
+
+        Returns:
+            dict: The nested evaluation structure
+        """
+        return copy.deepcopy(self._template)
+
+    def read(self, evaluation):
+        """Read the compact state of an evaluation
+
+        Args:
+            evaluation (dict): A nested evaluation
+
+        Returns:
+            tuple: Answers in field order
+        """
+        return tuple(field.get(evaluation) for field in self.fields)
+
+    def visible(self, values):
+        """Compute which questions are visible for a compact state
+
+        Args:
+            values (tuple or list): Answers in field order
+
+        Returns:
+            list: One bool per field
+        """
+        shown = [True] * len(self.fields)
+        for field in self.fields:
+            if field.parent is not None:
+                parent = field.parent.index
+                shown[field.index] = shown[parent] and field.is_shown(values[parent])
+        return shown
+
+    def build(self, values, touched=0):
+        """Build a nested evaluation from a compact state
+
+        Hidden follow-up questions are reset to their empty value, so stale
+        answers do not survive after the parent answer changes.
+
+        Args:
+            values (tuple or list): Answers in field order
+            touched (int, optional): Bitmask of the explicitly answered fields. Defaults to 0.
+
+        Returns:
+            dict: The nested evaluation structure
+        """
+        shown = self.visible(values)
+        evaluation = {TOUCHED_KEY: touched}
+        for field in self.fields:
+            value = values[field.index] if shown[field.index] else copy.copy(field.empty)
+            self._set_path(evaluation, field.path, value)
+            if field.shown_flag:
+                self._set_path(evaluation, field.shown_flag, shown[field.index])
+        return evaluation
+
+    def validate(self, evaluation):
+        """Validate an evaluation against the rubric
+
+        Args:
+            evaluation (dict): A nested evaluation
+
+        Returns:
+            list: Error messages, empty if the evaluation is valid
+        """
+        if not isinstance(evaluation, dict):
+            return [f"expected an object, got {type(evaluation).__name__}"]
+
+        errors = []
+        touched = evaluation.get(TOUCHED_KEY, 0)
+        if not isinstance(touched, int) or isinstance(touched, bool) or not 0 <= touched < 1 << len(self.fields):
+            errors.append(f"{TOUCHED_KEY}: expected a bitmask of {len(self.fields)} fields, got {touched!r}")
+        for field in self.fields:
+            value = field.get_raw(evaluation)
+            location = ".".join(field.path)
+            if value is _MISSING:
+                errors.append(f"{location}: missing")
+                continue
+            expected = VALUE_TYPES[field.widget]
+            # bool is a subclass of int, so ratings need an explicit check
+            if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+                errors.append(f"{location}: expected {expected.__name__}, got {type(value).__name__}")
+                continue
+            if field.widget == "multiselect":
+                unknown = [option for option in value if option not in field.options]
+                if unknown:
+                    errors.append(f"{location}: unknown options {unknown}")
+            elif field.widget == "rating" and value not in field.options:
+                errors.append(f"{location}: rating {value} out of range")
+        return errors
+
+    def summarize(self, evaluation):
+        """Build the preview lines for an evaluation
+
+        Args:
+            evaluation (dict): A nested evaluation
+
+        Returns:
+            list: Markdown lines for the visible, answered questions
+        """
+        values = self.read(evaluation)
+        shown = self.visible(values)
+        lines = []
+        for field in self.fields:
+            value = values[field.index]
+            if not shown[field.index] or not field.summary:
+                continue
+            if field.widget == "text" and not value:
+                continue
+            lines.append(field.summary.format(value=field.format_value(value)))
+        return lines
+
+    def columns(self, prefix):
+        """Export column names for one evaluation section
+
+        Args:
+            prefix (str): Column prefix, e.g. "GPT_with_image"
+
+        Returns:
+            list: Column names in field order
+        """
+        return [f"{prefix}_{field.name}" for field in self.fields]
+
+    def flatten(self, evaluation, prefix, out=None):
+        """Flatten an evaluation into export columns
+
+        Args:
+            evaluation (dict): A nested evaluation
+            prefix (str): Column prefix, e.g. "GPT_with_image"
+            out (dict, optional): Row to add the columns to
+
+        Returns:
+            dict: The row with one column per field
+        """
+        row = {} if out is None else out
+        for field in self.fields:
+            value = field.get(evaluation)
+            if isinstance(value, list):
+                value = "; ".join(str(item) for item in value)
+            row[f"{prefix}_{field.name}"] = value
+        if TOUCHED_KEY in evaluation:
+            row[f"{prefix}_{TOUCHED_KEY}"] = evaluation[TOUCHED_KEY]
+        return row
+
+
+# Compiled once at import time and shared by every session
+EVALUATION_RUBRIC = CompiledRubric(RUBRIC)
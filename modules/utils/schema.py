@@ -0,0 +1,169 @@
+# modules/utils/schema.py
+
+import re
+from modules.utils.rubric import EVALUATION_RUBRIC
+
+# Matches model response columns such as "Gemini_with_image_response"
+RESPONSE_FIELD_PATTERN = re.compile(r"^(?P<model>.+)_(?P<modality>with|without)_image_response$", re.IGNORECASE)
+
+# Matches per-model evaluation keys such as "GPT_with_image_evaluation"
+EVALUATION_KEY_PATTERN = re.compile(r"^.+_evaluation$")
+
+# Errors kept per report; the counts cover every record
+MAX_REPORTED_ERRORS = 50
+
+NoneType = type(None)
+
+
+def _check_tags(value):
+    if isinstance(value, list) and not all(isinstance(tag, str) for tag in value):
+        return "expected a list of strings"
+    return None
+
+
+def _check_answer(value):
+    if isinstance(value, dict) and not isinstance(value.get("body", ""), (str, NoneType)):
+        return f"body: expected str, got {type(value['body']).__name__}"
+    return None
+
+
+def _check_evaluation(value):
+    errors = EVALUATION_RUBRIC.validate(value)
+    return "; ".join(errors) if errors else None
+
+
+class CompiledSchema:
+    """Record schema compiled into flat lookup tables
+
+    Each field is (name, accepted types, required, optional check returning
+    an error message). Keys not listed are matched against the pattern
+    fields, and any other key is allowed.
+    """
+
+    def __init__(self, name, fields, pattern_fields=()):
+        self.name = name
+        self._required = tuple((field[0], field[1]) for field in fields if field[2])
+        self._fields = {field[0]: (field[1], field[3] if len(field) > 3 else None) for field in fields}
+        self._patterns = tuple(
+            (pattern, types, check[0] if check else None) for pattern, types, *check in pattern_fields
+        )
+
+    @staticmethod
+    def _type_error(key, value, types):
+        # bool is a subclass of int, so it is rejected explicitly for numbers
+        if isinstance(value, types) and not (isinstance(value, bool) and bool not in types):
+            return None
+        expected = " or ".join("null" if t is NoneType else t.__name__ for t in types)
+        return f"{key}: expected {expected}, got {type(value).__name__}"
+
+    def validate(self, record):
+        """Validate one record
+
+        Args:
+            record: The decoded JSON record
+
+        Returns:
+            list: Error messages, empty if the record is valid
+        """
+        if not isinstance(record, dict):
+            return [f"expected an object, got {type(record).__name__}"]
+
+        errors = [f"{key}: missing" for key, _ in self._required if key not in record]
+
+        for key, value in record.items():
+            spec = self._fields.get(key)
+            if spec is None:
+                for pattern, types, check in self._patterns:
+                    if pattern.match(key):
+                        spec = (types, check)
+                        break
+                else:
+                    continue
+
+            types, check = spec
+            error = self._type_error(key, value, types)
+            if error is None and check is not None:
+                message = check(value)
+                error = f"{key}: {message}" if message else None
+            if error:
+                errors.append(error)
+
+        return errors
+
+
+class ValidationReport:
+    """Outcome of validating the records of one source"""
+
+    def __init__(self, source):
+        self.source = source
+        self.checked = 0
+        self.rejected = 0
+        self.errors = []
+
+    def add(self, index, record, errors):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            post_id = record.get("post_id") if isinstance(record, dict) else None
+            self.errors.append(f"record {index} (post_id {post_id}): " + "; ".join(errors))
+
+    def summary(self):
+        return f"{self.source}: {self.rejected} of {self.checked} records rejected"
+
+
+def filter_valid(records, schema, report):
+    """Yield the records that match a schema, reporting the others
+
+    Validation happens while the records are consumed, in a single pass.
+
+    Args:
+        records (iterable): The decoded records
+        schema (CompiledSchema): The schema to check against
+        report (ValidationReport): Collects the counts and error messages
+
+    Yields:
+        dict: The valid records
+    """
+    for index, record in enumerate(records):
+        report.checked += 1
+        errors = schema.validate(record)
+        if errors:
+            report.add(index, record, errors)
+        else:
+            yield record
+
+
+# Records of the dataset files in data/final_files
+DATASET_SCHEMA = CompiledSchema(
+    "dataset record",
+    [
+        ("post_id", (int, str), True),
+        ("title", (str,), True),
+        ("body", (str,), True),
+        ("image_link", (str, NoneType), False),
+        ("creation_date", (str, NoneType), False),
+        ("score", (int, NoneType), False),
+        # Raw exports store tags and the accepted answer as Python repr strings
+        ("tags", (list, str, NoneType), False, _check_tags),
+        ("accepted_answer", (dict, str, NoneType), False, _check_answer),
+    ],
+    pattern_fields=[(RESPONSE_FIELD_PATTERN, (str, NoneType))],
+)
+
+# Labels saved by the labeling page (see ensure_post_evaluation)
+LABEL_SCHEMA = CompiledSchema(
+    "label",
+    [
+        ("post_id", (int, str), True),
+        ("timestamp", (str,), False),
+        ("annotator", (str,), False),
+        ("dataset", (str,), False),
+        ("title", (str, NoneType), False),
+        ("related_text", (str,), False),
+        # Set on the labels of gold posts, see modules/utils/gold.py
+        ("gold", (bool,), False),
+        # Older label format
+        ("part1", (dict,), False),
+        ("part2", (dict,), False),
+    ],
+    pattern_fields=[(EVALUATION_KEY_PATTERN, (dict,), _check_evaluation)],
+)
@@ -0,0 +1,491 @@
+# modules/utils/storage.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import streamlit as st
+from modules.utils.atomic_file import file_lock, atomic_write_json, read_json_with_backups, LABEL_BACKUPS
+from modules.utils.label_history import LabelHistoryFile, history_file_path, history_entries
+
+# Label storage backend: "json" (one file per annotator and dataset) or
+# "sqlite" (one database shared by every app process)
+STORAGE_BACKEND = os.environ.get("LABELER_STORAGE", "json").lower()
+
+# Location of the SQLite database, defaults to <output_dir>/labels.sqlite3
+DB_PATH = os.environ.get("LABELER_DB_PATH")
+
+# Label stores per (backend, location), shared by the sessions of a process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def label_file_path(output_dir, annotator_name, dataset_option):
+    """Path of the JSON label file for an annotator and dataset"""
+    return f"{output_dir}/{annotator_name}_{dataset_option}_labels.json"
+
+
+class JsonLabelStore:
+    """Labels stored in one JSON file per annotator and dataset"""
+
+    backend = "json"
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        # Background tasks only live in the process with file storage
+        self._tasks = []
+        self._tasks_lock = threading.Lock()
+
+    def load_labels(self, annotator_name, dataset_option):
+        """Load every label of an annotator for a dataset
+
+        Returns:
+            list: The labeled items
+        """
+        filename = label_file_path(self.output_dir, annotator_name, dataset_option)
+        if not os.path.exists(filename):
+            return []
+
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return []
+        return data if isinstance(data, list) else [data]
+
+    def save_label(self, labeled_item, annotator_name, dataset_option):
+        """Save a label, replacing any previous label of the same post
+
+        Returns:
+            str: Path of the label file
+        """
+        filename = label_file_path(self.output_dir, annotator_name, dataset_option)
+
+        # Read-modify-write under the file's lock so concurrent saves do not
+        # drop each other's labels
+        with file_lock(filename):
+            # Initialize data array
+            data = []
+
+            # If file exists, load existing data (from a backup if it is unreadable)
+            if os.path.exists(filename):
+                data, source = read_json_with_backups(filename)
+                if source is None:
+                    st.error(f"Error loading existing data from {filename}. Creating new file.")
+                    data = []
+                elif source != filename:
+                    st.warning(f"{filename} could not be read, continuing from backup {source}.")
+                if not isinstance(data, list):
+                    data = [data]  # Convert to list if it's not already
+
+            # Check if post_id already exists and replace if it does
+            post_id = labeled_item.get("post_id")
+            previous = next((item for item in data if item.get("post_id") == post_id), None)
+            data = [item for item in data if item.get("post_id") != post_id]
+
+            # Add the new labeled item
+            data.append(labeled_item)
+
+            # Save the updated data, keeping the previous versions as backups
+            atomic_write_json(filename, data, backups=LABEL_BACKUPS)
+
+            # Record what changed in the post's history
+            self._history(annotator_name, dataset_option).append(previous, labeled_item)
+
+        return filename
+
+    def _history(self, annotator_name, dataset_option):
+        return LabelHistoryFile(history_file_path(self.output_dir, annotator_name, dataset_option))
+
+    def label_history(self, post_id, annotator_name, dataset_option):
+        """Saved versions of a post's label
+
+        Returns:
+            list: History entries in version order (see modules/utils/label_history.py)
+        """
+        return self._history(annotator_name, dataset_option).entries(post_id)
+
+    def save_draft(self, annotator_name, dataset_option, post_id, evaluation):
+        """Drafts only live in the session with file storage"""
+
+    def load_draft(self, annotator_name, dataset_option, post_id):
+        return None
+
+    def materialize(self, annotator_name=None):
+        """Label files already live in the output directory"""
+
+    def enqueue_task(self, kind, payload):
+        """Add a task to the process's queue
+
+        Returns:
+            int: ID of the task
+        """
+        now = time.time()
+        with self._tasks_lock:
+            task = {
+                "id": len(self._tasks) + 1,
+                "kind": kind,
+                "payload": payload,
+                "status": "queued",
+                "progress": 0,
+                "result": None,
+                "claimed_by": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            self._tasks.append(task)
+        return task["id"]
+
+    def claim_task(self, worker_id, kinds=None, stale_after=None):
+        """Claim the oldest queued task, see SQLiteLabelStore.claim_task"""
+        now = time.time()
+        with self._tasks_lock:
+            if stale_after is not None:
+                for task in self._tasks:
+                    if task["status"] == "running" and task["updated_at"] < now - stale_after:
+                        task.update(status="queued", claimed_by=None)
+            for task in self._tasks:
+                if task["status"] == "queued" and (not kinds or task["kind"] in kinds):
+                    task.update(status="running", claimed_by=worker_id, updated_at=now)
+                    return {"id": task["id"], "kind": task["kind"], "payload": task["payload"]}
+        return None
+
+    def update_task(self, task_id, status=None, progress=None, result=None):
+        """Update the status, progress or result of a task"""
+        with self._tasks_lock:
+            task = self._tasks[task_id - 1]
+            task["updated_at"] = time.time()
+            if status is not None:
+                task["status"] = status
+            if progress is not None:
+                task["progress"] = progress
+            if result is not None:
+                task["result"] = result
+
+    def list_tasks(self, kind=None, limit=50):
+        """Most recent tasks, newest first
+
+        Returns:
+            list: One dict per task
+        """
+        with self._tasks_lock:
+            tasks = [dict(task) for task in reversed(self._tasks) if kind is None or task["kind"] == kind]
+        return tasks[:limit]
+
+
+class SQLiteLabelStore:
+    """Labels, drafts and background tasks in a SQLite database
+
+    The database runs in WAL mode, so several app processes can read while
+    one writes. This is the storage used by the multi-worker deployment
+    (see deploy/run_workers.py).
+    """
+
+    backend = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS labels (
+        annotator TEXT NOT NULL,
+        dataset TEXT NOT NULL,
+        post_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (annotator, dataset, post_id)
+    );
+    CREATE TABLE IF NOT EXISTS drafts (
+        annotator TEXT NOT NULL,
+        dataset TEXT NOT NULL,
+        post_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (annotator, dataset, post_id)
+    );
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        progress REAL NOT NULL DEFAULT 0,
+        result TEXT,
+        claimed_by TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+    CREATE TABLE IF NOT EXISTS label_history (
+        annotator TEXT NOT NULL,
+        dataset TEXT NOT NULL,
+        post_id TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        entry TEXT NOT NULL,
+        PRIMARY KEY (annotator, dataset, post_id, version)
+    );
+    """
+
+    def __init__(self, db_path, output_dir):
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self._local = threading.local()
+        # Newest label time written to each (annotator, dataset) label file by materialize
+        self._materialized = {}
+        # executescript manages its own transaction
+        self._connect().conn.executescript(self.SCHEMA)
+
+    def _connect(self, write=False):
+        """Transaction on the connection of the current thread
+
+        Write transactions take the database lock up front (BEGIN IMMEDIATE),
+        so concurrent writers wait on the busy timeout instead of failing.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return _Transaction(conn, write)
+
+    # Post ids are stored as text so int and str ids from different datasets
+    # share one column; the original value is kept inside the JSON data
+    @staticmethod
+    def _key(post_id):
+        return str(post_id)
+
+    def load_labels(self, annotator_name, dataset_option):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM labels WHERE annotator = ? AND dataset = ? ORDER BY updated_at",
+                (annotator_name, dataset_option)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_label(self, labeled_item, annotator_name, dataset_option):
+        key = (annotator_name, dataset_option, self._key(labeled_item.get("post_id")))
+        with self._connect(write=True) as conn:
+            # Record what changed in the post's history
+            row = conn.execute(
+                "SELECT data FROM labels WHERE annotator = ? AND dataset = ? AND post_id = ?", key
+            ).fetchone()
+            next_version = conn.execute(
+                "SELECT COALESCE(MAX(version) + 1, 0) FROM label_history WHERE annotator = ? AND dataset = ? AND post_id = ?",
+                key
+            ).fetchone()[0]
+            for entry in history_entries(json.loads(row[0]) if row else None, labeled_item, next_version):
+                conn.execute(
+                    "INSERT INTO label_history (annotator, dataset, post_id, version, entry) VALUES (?, ?, ?, ?, ?)",
+                    key + (entry["version"], json.dumps(entry, ensure_ascii=False))
+                )
+
+            conn.execute(
+                "INSERT OR REPLACE INTO labels (annotator, dataset, post_id, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (annotator_name, dataset_option, self._key(labeled_item.get("post_id")),
+                 json.dumps(labeled_item, ensure_ascii=False), time.time())
+            )
+            conn.execute(
+                "DELETE FROM drafts WHERE annotator = ? AND dataset = ? AND post_id = ?",
+                (annotator_name, dataset_option, self._key(labeled_item.get("post_id")))
+            )
+        return f"{self.db_path} ({annotator_name}/{dataset_option})"
+
+    def label_history(self, post_id, annotator_name, dataset_option):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT entry FROM label_history WHERE annotator = ? AND dataset = ? AND post_id = ? ORDER BY version",
+                (annotator_name, dataset_option, self._key(post_id))
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_draft(self, annotator_name, dataset_option, post_id, evaluation):
+        """Autosave an unsubmitted evaluation"""
+        with self._connect(write=True) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO drafts (annotator, dataset, post_id, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (annotator_name, dataset_option, self._key(post_id),
+                 json.dumps(evaluation, ensure_ascii=False), time.time())
+            )
+
+    def load_draft(self, annotator_name, dataset_option, post_id):
+        """Get the autosaved evaluation of a post, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM drafts WHERE annotator = ? AND dataset = ? AND post_id = ?",
+                (annotator_name, dataset_option, self._key(post_id))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def materialize(self, annotator_name=None):
+        """Write the stored labels to JSON label files in the output directory
+
+        Downloads and exports read label files, so they are regenerated from
+        the database before use. Only files with labels saved since this
+        process last wrote them are rewritten, so calling this on every
+        rerun costs one grouped query when nothing changed.
+
+        Args:
+            annotator_name (str, optional): Only write this annotator's files. Defaults to None.
+        """
+        query = "SELECT annotator, dataset, MAX(updated_at), COUNT(*) FROM labels"
+        params = ()
+        if annotator_name is not None:
+            query += " WHERE annotator = ?"
+            params = (annotator_name,)
+        query += " GROUP BY annotator, dataset"
+
+        with self._connect() as conn:
+            versions = conn.execute(query, params).fetchall()
+
+        for annotator, dataset, updated_at, count in versions:
+            path = label_file_path(self.output_dir, annotator, dataset)
+            if self._materialized.get((annotator, dataset)) == (updated_at, count) and os.path.exists(path):
+                continue
+            with file_lock(path):
+                atomic_write_json(path, self.load_labels(annotator, dataset))
+            self._materialized[(annotator, dataset)] = (updated_at, count)
+
+    def enqueue_task(self, kind, payload):
+        """Add a task to the shared queue
+
+        Returns:
+            int: ID of the task
+        """
+        now = time.time()
+        with self._connect(write=True) as conn:
+            cursor = conn.execute(
+                "INSERT INTO tasks (kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload), now, now)
+            )
+            return cursor.lastrowid
+
+    def claim_task(self, worker_id, kinds=None, stale_after=None):
+        """Atomically claim the oldest queued task
+
+        Args:
+            worker_id (str): Name of the claiming worker
+            kinds (list, optional): Only claim tasks of these kinds. Defaults to None.
+            stale_after (float, optional): Seconds after which a running task
+                that was not updated is queued again, as its worker died.
+                Defaults to None, never.
+
+        Returns:
+            dict: The claimed task, or None if the queue is empty
+        """
+        query = "SELECT id, kind, payload FROM tasks WHERE status = 'queued'"
+        params = []
+        if kinds:
+            query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        query += " ORDER BY id LIMIT 1"
+
+        now = time.time()
+        with self._connect(write=True) as conn:
+            if stale_after is not None:
+                conn.execute(
+                    "UPDATE tasks SET status = 'queued', claimed_by = NULL WHERE status = 'running' AND updated_at < ?",
+                    (now - stale_after,)
+                )
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'running', claimed_by = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now, row[0])
+            )
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2])}
+
+    def update_task(self, task_id, status=None, progress=None, result=None):
+        """Update the status, progress or result of a task"""
+        fields = ["updated_at = ?"]
+        params = [time.time()]
+        if status is not None:
+            fields.append("status = ?")
+            params.append(status)
+        if progress is not None:
+            fields.append("progress = ?")
+            params.append(progress)
+        if result is not None:
+            fields.append("result = ?")
+            params.append(json.dumps(result))
+        params.append(task_id)
+
+        with self._connect(write=True) as conn:
+            conn.execute(f"UPDATE tasks SET {', '.join(fields)} WHERE id = ?", params)
+
+    def list_tasks(self, kind=None, limit=50):
+        """Most recent tasks, newest first
+
+        Returns:
+            list: One dict per task
+        """
+        query = "SELECT id, kind, payload, status, progress, result, claimed_by, created_at, updated_at FROM tasks"
+        params = []
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params.append(kind)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        columns = ("id", "kind", "payload", "status", "progress", "result", "claimed_by", "created_at", "updated_at")
+        tasks = []
+        for row in rows:
+            task = dict(zip(columns, row))
+            task["payload"] = json.loads(task["payload"])
+            task["result"] = json.loads(task["result"]) if task["result"] else None
+            tasks.append(task)
+        return tasks
+
+
+class _Transaction:
+    """Runs a block of statements in one transaction on an autocommit connection
+
+    A block nested in another one joins the outer transaction, which is
+    committed or rolled back only by the block that began it.
+    """
+
+    def __init__(self, conn, write=False):
+        self.conn = conn
+        self.write = write
+        self.began = False
+
+    def __enter__(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE" if self.write else "BEGIN")
+            self.began = True
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.began and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def get_label_store(output_dir):
+    """Get the label store configured for this process
+
+    The backend is selected with LABELER_STORAGE ("json" or "sqlite").
+
+    Args:
+        output_dir (str): Directory for labeled data
+
+    Returns:
+        JsonLabelStore or SQLiteLabelStore: The shared store
+    """
+    if STORAGE_BACKEND == "sqlite":
+        db_path = DB_PATH or os.path.join(output_dir, "labels.sqlite3")
+        key = ("sqlite", db_path)
+    else:
+        key = ("json", output_dir)
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if key[0] == "sqlite":
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                store = SQLiteLabelStore(db_path, output_dir)
+            else:
+                store = JsonLabelStore(output_dir)
+            _stores[key] = store
+    return store
@@ -0,0 +1,61 @@
+# modules/utils/text_diff.py
+
+import difflib
+import html
+import re
+
+# Splits text into words while keeping the whitespace between them
+TOKEN_PATTERN = re.compile(r"\s+|[^\s]+")
+
+# Markup wrapped around the words that differ between the two texts
+HIGHLIGHT_OPEN = '<mark style="background-color: #fff3b0;">'
+HIGHLIGHT_CLOSE = "</mark>"
+
+
+def _tokenize(text):
+    """Split text into word and whitespace tokens"""
+    return TOKEN_PATTERN.findall(text or "")
+
+
+def _render_tokens(tokens, changed_ranges):
+    """Escape tokens and wrap the changed ranges in highlight markup"""
+    parts = []
+    position = 0
+    for start, end in changed_ranges:
+        parts.append(html.escape("".join(tokens[position:start])))
+        changed = "".join(tokens[start:end])
+        if changed.strip():
+            parts.append(f"{HIGHLIGHT_OPEN}{html.escape(changed)}{HIGHLIGHT_CLOSE}")
+        else:
+            parts.append(html.escape(changed))
+        position = end
+    parts.append(html.escape("".join(tokens[position:])))
+    return "".join(parts)
+
+
+def highlight_word_diff(text_a, text_b):
+    """Highlight the words that differ between two texts
+
+    Args:
+        text_a (str): The first text
+        text_b (str): The second text
+
+    Returns:
+        tuple: (html_a, html_b) escaped HTML with the differing words marked
+    """
+    tokens_a = _tokenize(text_a)
+    tokens_b = _tokenize(text_b)
+
+    matcher = difflib.SequenceMatcher(None, tokens_a, tokens_b, autojunk=False)
+    changed_a = []
+    changed_b = []
+    for tag, a_start, a_end, b_start, b_end in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if a_end > a_start:
+            changed_a.append((a_start, a_end))
+        if b_end > b_start:
+            changed_b.append((b_start, b_end))
+
+    return _render_tokens(tokens_a, changed_a), _render_tokens(tokens_b, changed_b)
+
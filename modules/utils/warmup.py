@@ -0,0 +1,73 @@
+# modules/utils/warmup.py
+
+import os
+import threading
+from modules.utils.perf import span
+
+# Images of the first posts of each dataset fetched by the warm-up
+WARMUP_IMAGES = int(os.environ.get("LABELER_WARMUP_IMAGES", "2"))
+
+# Datasets loaded by the warm-up, first ones of the catalog
+WARMUP_DATASETS = int(os.environ.get("LABELER_WARMUP_DATASETS", "2"))
+
+_start_lock = threading.Lock()
+_started = threading.Event()
+_done = threading.Event()
+
+
+def warm_up(data_dirs, output_dir, datasets=WARMUP_DATASETS, images=WARMUP_IMAGES):
+    """Load what the first render of every session needs
+
+    Loads the dataset catalog, compiles the render bundles of the first
+    datasets, opens the label store and fills the image cache with the
+    first images of each of them, so the first annotator after a process
+    start does not pay for them.
+
+    Args:
+        data_dirs (list): Directories containing the data files
+        output_dir (str): Directory for labeled data
+        datasets (int, optional): Datasets to load. Defaults to WARMUP_DATASETS.
+        images (int, optional): Images to fetch per dataset. Defaults to WARMUP_IMAGES.
+    """
+    from modules.utils.data_loader import DataLoader
+    from modules.utils.dataset_catalog import load_catalog
+    from modules.utils.storage import get_label_store
+    from modules.utils.image_cache import IMAGE_CACHE
+
+    with span("startup.warm_up"):
+        bundles = [
+            DataLoader(data_dir=info.data_dir).get_render_bundles(info.filename, wait_for=images)
+            for info in load_catalog(data_dirs, wait=True)[:datasets]
+        ]
+
+        get_label_store(output_dir)
+
+        for dataset in bundles:
+            for url in [url for url in dataset.image_urls if url][:images]:
+                try:
+                    IMAGE_CACHE.get(url)
+                except Exception:
+                    pass  # Shown to the annotator when the post is opened
+
+
+def start_warm_up(data_dirs, output_dir):
+    """Run warm_up once per process in a background thread
+
+    Later calls (every rerun of every session) return immediately.
+
+    Returns:
+        threading.Event: Set once the warm-up has finished
+    """
+    with _start_lock:
+        if _started.is_set():
+            return _done
+        _started.set()
+
+    def run():
+        try:
+            warm_up(data_dirs, output_dir)
+        finally:
+            _done.set()
+
+    threading.Thread(target=run, name="warm-up", daemon=True).start()
+    return _done